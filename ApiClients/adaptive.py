@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+LATENCY_ALPHA = 0.3
+# Key of the paths that match none of the routes of a client
+OTHER_ROUTE = "other"
+
+
+@lru_cache(maxsize=None)
+def route_pattern(template: str) -> "re.Pattern":
+    """
+    '/orders/{id}' -> pattern of the paths ending with the template, any segment in place of {id}.
+    """
+    parts = re.split(r"(\{[^/}]+\})", template)
+    return re.compile("".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts) + "$")
+
+
+def endpoint_key(provider: str, path: str, routes: Optional[Iterable[str]] = None) -> str:
+    """
+    Tuning key of a request path, shared by all ids of the same endpoint.
+
+    routes are the endpoint templates of the client, e.g. '/orders/{id}'; the key is the first
+    template the path matches and OTHER_ROUTE if none does, so ids never get a key of their own.
+    Without routes the path itself is the key, for APIs that only take ids as parameters.
+    """
+    path = "/" + path.lstrip("/")
+    if routes is None:
+        return f"{provider}:{path}"
+    for template in routes:
+        if route_pattern(template).search(path):
+            return f"{provider}:{template}"
+    return f"{provider}:{OTHER_ROUTE}"
+
+
+def count_items(data: Any) -> Optional[int]:
+    """
+    Number of records in a response: the list itself or the first list of a page dict.
+    """
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        items = next((value for value in data.values() if isinstance(value, list)), None)
+        return len(items) if items is not None else None
+    return None
+
+
+class AdaptiveController:
+    """
+    AIMD tuning of one endpoint's page size and number of requests in flight.
+
+    Every successful round of requests under target_latency adds one request in flight
+    and, if the pages came back full, grows the page by page_step. A 429, a 5xx or a
+    network error halves the requests in flight; slow responses and network errors
+    shrink the page. slot() holds a request until the current limit allows it.
+    """
+
+    def __init__(self,
+                 endpoint: str,
+                 page_size: int,
+                 concurrency: int,
+                 min_page_size: int,
+                 max_page_size: int,
+                 max_concurrency: int,
+                 target_latency: float,
+                 state: Optional[Dict[str, Any]] = None):
+        self.endpoint = endpoint
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.page_step = max(1, page_size // 2)
+
+        state = state or {}
+        self.page_size = min(max(int(state.get("page_size", page_size)), min_page_size), max_page_size)
+        self.concurrency = min(max(int(state.get("concurrency", concurrency)), 1), max_concurrency)
+        self.latency: Optional[float] = state.get("latency")
+        self.throughput: Optional[float] = state.get("throughput")
+        self.requests = 0
+        self.throttled = 0
+
+        self._in_flight = 0
+        self._streak = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def observe(self,
+                latency: float,
+                status: Optional[int],
+                items: Optional[int] = None,
+                page_size: Optional[int] = None) -> None:
+        """
+        Feeds back one response. status is None for network errors and timeouts;
+        page_size is the requested page, if the request was a page.
+        """
+        with self._cond:
+            self.requests += 1
+            if status is None or status == 429 or status >= 500:
+                if status == 429:
+                    self.throttled += 1
+                if status is None:
+                    self.page_size = max(self.min_page_size, self.page_size // 2)
+                self.concurrency = max(1, self.concurrency // 2)
+                self._streak = 0
+                return
+
+            self.latency = latency if self.latency is None else \
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+            if items is not None and latency > 0:
+                rate = items / latency
+                self.throughput = rate if self.throughput is None else \
+                    LATENCY_ALPHA * rate + (1 - LATENCY_ALPHA) * self.throughput
+
+            if self.latency > self.target_latency:
+                self.page_size = max(self.min_page_size, int(self.page_size * 0.75))
+                self._streak = 0
+                return
+
+            self._streak += 1
+            if self._streak < self.concurrency:
+                return
+            self._streak = 0
+            if self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._cond.notify_all()
+            if page_size is not None and items is not None and items >= page_size:
+                self.page_size = min(self.max_page_size, self.page_size + self.page_step)
+
+    def state(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "page_size": self.page_size,
+                "concurrency": self.concurrency,
+                "latency": round(self.latency, 4) if self.latency is not None else None,
+                "throughput": round(self.throughput, 2) if self.throughput is not None else None,
+                "requests": self.requests,
+                "throttled": self.throttled,
+            }
+
+
+class AdaptiveTuner:
+    """
+    Controllers of all endpoints of a process, persisted in a JSON file between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("ADAPTIVE_TUNING_PATH", "data/tuning.json")
+        self._lock = threading.Lock()
+        self._controllers: Dict[str, AdaptiveController] = {}
+        self._saved = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def controller(self,
+                   endpoint: str,
+                   page_size: int = 100,
+                   concurrency: int = 1,
+                   min_page_size: int = 10,
+                   max_page_size: int = 1000,
+                   max_concurrency: int = 8,
+                   target_latency: float = 2.0) -> AdaptiveController:
+        """
+        Controller of an endpoint; the first call sets its bounds, saved settings are applied within them.
+        """
+        with self._lock:
+            if endpoint not in self._controllers:
+                self._controllers[endpoint] = AdaptiveController(
+                    endpoint, page_size, concurrency, min_page_size, max_page_size, max_concurrency,
+                    target_latency, state=self._saved.get(endpoint))
+            return self._controllers[endpoint]
+
+    def save(self) -> None:
+        """
+        Merges the settings of the endpoints used by this process into the file.
+        Every shard process saves its own endpoints, the last write of an endpoint wins.
+        """
+        with self._lock:
+            if not self._controllers:
+                return
+            settings = self._load()
+            for endpoint, controller in self._controllers.items():
+                settings[endpoint] = {**controller.state(), "updated_at": int(time.time())}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(settings, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logging.error(f"Adaptive tuning was not saved to {self.path}: {exc}")
+
+
+_tuner: Optional[AdaptiveTuner] = None
+
+
+def get_tuner() -> Optional[AdaptiveTuner]:
+    """
+    Process-wide tuner, None if ADAPTIVE_TUNING=0.
+    """
+    global _tuner
+    if os.getenv("ADAPTIVE_TUNING", "1") == "0":
+        return None
+    if _tuner is None:
+        _tuner = AdaptiveTuner()
+    return _tuner
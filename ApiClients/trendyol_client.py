@@ -1,10 +1,15 @@
 import time
 import logging
+from contextlib import nullcontext
 from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import RequestException, HTTPError, ConnectionError, Timeout
 
+from ApiClients.adaptive import AdaptiveController, AdaptiveTuner, count_items, endpoint_key
+from json_codec import decode_response
+
 
 class TrendyolAPIError(Exception):
     """Base exception for Trendyol API errors."""
@@ -23,6 +28,13 @@ class TrendyolServerError(TrendyolAPIError):
 
 class TrendyolClient:
 
+    BASE_URL = "https://api.tgoapis.com"
+    # Endpoint templates, every one is tuned separately
+    ROUTES = (
+        "/integrator/review/meal/suppliers/{id}/stores/{id}/reviews/filter",
+        "/integrator/claim/meal/suppliers/{id}/claims",
+        "/integrator/order/meal/suppliers/{id}/packages",
+    )
     DEFAULT_TIMEOUT = 10
     MAX_RETRIES = 3
     BACKOFF_FACTOR = 2
@@ -34,11 +46,18 @@ class TrendyolClient:
         agent_name: str,
         agent_mail: str,
         default_page_size: int = 50,
-        logger: Optional[logging.Logger] = None
+        logger: Optional[logging.Logger] = None,
+        tuner: Optional[AdaptiveTuner] = None,
+        max_concurrency: int = 8,
+        base_url: Optional[str] = None
     ):
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
         self.auth = HTTPBasicAuth(api_key, api_secret)
         self.session = requests.Session()
         self.default_page_size = default_page_size
+        # With a tuner page size and requests in flight are learned per endpoint
+        self.tuner = tuner
+        self.max_concurrency = max_concurrency
         self.headers = {
             'Authorization': f'Basic {api_key}:{api_secret}',
             'Content-Type': 'application/json',
@@ -49,6 +68,19 @@ class TrendyolClient:
         self.logger = logger or logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
+    def _controller(self, url: str) -> Optional[AdaptiveController]:
+        if self.tuner is None:
+            return None
+        return self.tuner.controller(
+            endpoint_key("trendyol", urlsplit(url).path, self.ROUTES),
+            page_size=self.default_page_size,
+            concurrency=self.max_concurrency,
+            min_page_size=10,
+            max_page_size=200,
+            max_concurrency=self.max_concurrency,
+            target_latency=self.DEFAULT_TIMEOUT / 4,
+        )
+
     def _request(
         self,
         method: str,
@@ -62,20 +94,25 @@ class TrendyolClient:
         """
         retries = 0
         delay = 1
+        controller = self._controller(url)
 
         while retries <= self.MAX_RETRIES:
+            started = time.monotonic()
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    auth=self.auth,
-                    headers=self.headers,
-                    params=params,
-                    json=json,
-                    data=data,
-                    timeout=self.DEFAULT_TIMEOUT,
-                )
+                with controller.slot() if controller else nullcontext():
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        auth=self.auth,
+                        headers=self.headers,
+                        params=params,
+                        json=json,
+                        data=data,
+                        timeout=self.DEFAULT_TIMEOUT,
+                    )
                 status = response.status_code
+                if controller and (status == 429 or 500 <= status < 600):
+                    controller.observe(time.monotonic() - started, status)
 
                 if status == 429:
                     self.logger.warning(
@@ -90,7 +127,11 @@ class TrendyolClient:
                     raise TrendyolServerError(f"Server error {status}: {response.text}")
 
                 response.raise_for_status()
-                return response.json()
+                result = decode_response(response)
+                if controller:
+                    controller.observe(time.monotonic() - started, status, count_items(result),
+                                       (params or {}).get("size"))
+                return result
 
             except (TrendyolRateLimitError, TrendyolServerError):
                 time.sleep(delay)
@@ -99,6 +140,8 @@ class TrendyolClient:
                 continue
 
             except (ConnectionError, Timeout) as exc:
+                if controller:
+                    controller.observe(time.monotonic() - started, None)
                 self.logger.error(
                     f"Network error on {url}: {exc}. Retry {retries}/{self.MAX_RETRIES} after {delay}s."
                 )
@@ -115,6 +158,11 @@ class TrendyolClient:
                 self.logger.error(f"Request failed for {url}: {req_err}")
                 raise TrendyolAPIError(f"Request failed: {req_err}")
 
+            except ValueError as decode_err:
+                # A 200 response with a body that is not JSON
+                self.logger.error(f"Invalid JSON from {url}: {decode_err}")
+                raise TrendyolAPIError(f"Invalid JSON: {decode_err}")
+
         raise TrendyolAPIError(f"Max retries exceeded for URL: {url}")
 
     def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
@@ -157,13 +205,15 @@ class TrendyolClient:
 
         :param url: Endpoint URL.
         :param params: Additional query parameters.
-        :param page_size: Number of items per page (default: self.default_page_size).
+        :param page_size: Number of items per page (default: the tuned size, or self.default_page_size).
         :param item_key: Key in response dict where items list is stored.
         :return: List of all items across pages.
         """
         results: List[Any] = []
         page = 0
-        page_size = page_size or self.default_page_size
+        # The page size is fixed for the whole walk, page numbers depend on it
+        controller = self._controller(url)
+        page_size = page_size or (controller.page_size if controller else self.default_page_size)
         base_params = params.copy() if params else {}
 
         while True:
@@ -179,15 +229,12 @@ class TrendyolClient:
                 self.logger.warning(f"Expected dict from paginated endpoint, got {type(data)}")
                 break
 
-            # Extract items
-            items: List[Any] = []
+            # Extract items: the known key first, otherwise the first list value
             if item_key and item_key in data:
                 items = data[item_key]
             else:
-                lists = [v for v in data.values() if isinstance(v, list)]
-                if lists:
-                    items = lists[0]
-                else:
+                items = next((value for value in data.values() if isinstance(value, list)), None)
+                if items is None:
                     self.logger.warning("No list found in response dict for pagination, got keys: %s", data.keys())
                     break
 
@@ -1,10 +1,17 @@
 import time
 import logging
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from requests import Response, Session
 from requests.exceptions import RequestException
 
+from ApiClients.adaptive import AdaptiveController, AdaptiveTuner, endpoint_key
+from json_codec import decode_response
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,13 +29,21 @@ class AuthError(POSMiddlewareError):
     """Ошибка аутентификации (HTTP 401/403)."""
 
 class POSMiddlewareClient:
+    LOGIN_URL = "https://integration-middleware-tr.me.restaurant-partners.com/v2/login"
+    # Шаблоны эндпоинтов для подбора лимитов: каждый настраивается отдельно
+    ROUTES = ("/orders/ids", "/orders/{id}")
+
     def __init__(
         self,
         base_url: str,
         username: str,
         password: str,
         max_retries: int = 3,
-        timeout: int = 10
+        timeout: int = 10,
+        max_workers: int = 8,
+        tuner: Optional[AdaptiveTuner] = None,
+        login_url: Optional[str] = None,
+        server_error_wait: float = 1800
     ):
         """
         :param base_url: Базовый URL, например https://integration-middleware.stg.restaurant-partners.com
@@ -36,20 +51,32 @@ class POSMiddlewareClient:
         :param password: Пароль для /Auth/Login
         :param max_retries: Число попыток для каждого запроса
         :param timeout: Таймаут на соединение (сек)
+        :param max_workers: Число параллельных запросов в get_order_details
+        :param tuner: Подбирает число запросов в полёте по задержкам и 429, без него лимит max_workers
+        :param login_url: URL авторизации, по умолчанию LOGIN_URL
+        :param server_error_wait: Пауза после ответа 5xx (сек)
         """
         self.base_url = base_url
         self.username = username
         self.password = password
         self.max_retries = max_retries
         self.timeout = timeout
+        self.max_workers = max_workers
+        self.tuner = tuner
+        self.login_url = login_url or self.LOGIN_URL
+        self.server_error_wait = server_error_wait
 
         self.session: Session = requests.Session()
+        # Пул соединений не меньше числа потоков, иначе соединения будут отбрасываться
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self._token: Optional[str] = None
         self._token_expires_at: float = 0
+        self._token_lock = threading.Lock()
     def login(self) -> None:
         """Авторизуемся и сохраняем Bearer‑токен."""
-        url = f"https://integration-middleware-tr.me.restaurant-partners.com/v2/login"
-        print(url)
+        url = self.login_url
         payload = {"username": self.username, "password": self.password, "grant_type" : "client_credentials"}
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
         logger.info("Авторизация в POS Middleware API...")
@@ -62,7 +89,7 @@ class POSMiddlewareClient:
         if resp.status_code != 200:
             raise AuthError(f"Не удалось авторизоваться: {resp.status_code} {resp.text}")
 
-        data = resp.json()
+        data = decode_response(resp)
         token = data.get("access_token") or data.get("token")
         expires_in = data.get("expiresIn") or data.get("expires") or 3600
         if not token:
@@ -72,10 +99,35 @@ class POSMiddlewareClient:
         self._token_expires_at = time.time() + int(expires_in) - 30  # за 30 сек до реального истечения
         logger.info("Успешная авторизация, токен получен.")
 
+    def _token_valid(self) -> bool:
+        return self._token is not None and time.time() < self._token_expires_at
+
     def _ensure_token(self) -> None:
-        """Проверяем и обновляем токен, если нужно."""
-        if self._token is None or time.time() >= self._token_expires_at:
-            self.login()
+        """Проверяем и обновляем токен, если нужно. Логин выполняет только один поток, остальные ждут его."""
+        if self._token_valid():
+            return
+        with self._token_lock:
+            if not self._token_valid():
+                self.login()
+
+    def _invalidate_token(self, token: Optional[str]) -> None:
+        """Сбрасываем токен, только если его ещё не обновил другой поток."""
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+
+    def _controller(self, path: str) -> Optional[AdaptiveController]:
+        if self.tuner is None:
+            return None
+        return self.tuner.controller(
+            endpoint_key("yemeksepeti", path, self.ROUTES),
+            page_size=1,
+            concurrency=self.max_workers,
+            min_page_size=1,
+            max_page_size=1,
+            max_concurrency=self.max_workers,
+            target_latency=self.timeout / 2,
+        )
 
     def _request(
         self,
@@ -91,20 +143,26 @@ class POSMiddlewareClient:
         """
         url = f"{self.base_url}{path}"
         last_exc: Optional[Exception] = None
+        controller = self._controller(path)
 
         for attempt in range(1, self.max_retries + 1):
             self._ensure_token()
-            headers = {"Authorization": f"Bearer {self._token}"}
+            token = self._token
+            headers = {"Authorization": f"Bearer {token}"}
+            started = time.monotonic()
             try:
-                resp: Response = self.session.request(
-                    method,
-                    url,
-                    params=params,
-                    json=json,
-                    headers=headers,
-                    timeout=self.timeout
-                )
+                with controller.slot() if controller else nullcontext():
+                    resp: Response = self.session.request(
+                        method,
+                        url,
+                        params=params,
+                        json=json,
+                        headers=headers,
+                        timeout=self.timeout
+                    )
             except RequestException as e:
+                if controller:
+                    controller.observe(time.monotonic() - started, None)
                 logger.warning(f"[{attempt}] Сетевая ошибка: {e}, повтор через 5 сек.")
                 last_exc = e
                 time.sleep(5)
@@ -112,6 +170,8 @@ class POSMiddlewareClient:
 
             # Логирование ответов
             logger.debug(f"{method} {url} -> {resp.status_code}")
+            if controller and resp.status_code != 204:
+                controller.observe(time.monotonic() - started, resp.status_code)
 
             # Ожидаем ответ
             if resp.status_code == 204:
@@ -132,14 +192,14 @@ class POSMiddlewareClient:
 
             if 500 <= resp.status_code < 600:
                 # Серверные ошибки
-                logger.error(f"{resp.status_code} Server Error, ждем 1800 сек (30 мин).")
+                logger.error(f"{resp.status_code} Server Error, ждем {self.server_error_wait} сек.")
                 last_exc = ServerError(resp.text)
-                time.sleep(1800)
+                time.sleep(self.server_error_wait)
                 continue
 
             if resp.status_code in (401, 403):
                 logger.warning(f"{resp.status_code} Аутентификация не прошла, обновляем токен.")
-                self._token = None
+                self._invalidate_token(token)
                 last_exc = AuthError(resp.text)
                 continue
 
@@ -149,7 +209,7 @@ class POSMiddlewareClient:
 
             # Успешные коды 2xx
             try:
-                return resp.json()
+                return decode_response(resp)
             except ValueError:
                 return resp.text
 
@@ -163,3 +223,33 @@ class POSMiddlewareClient:
 
     def put(self, path: str, data: Dict[str, Any] = None) -> Any:
         return self._request("PUT", path, json=data)
+
+    def get_order_details(
+        self,
+        order_ids: Iterable[str],
+        max_workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Параллельно запрашивает /orders/{id} и отдаёт пары (id, order) по мере готовности.
+        Потоки используют общую сессию и токен; с tuner число запросов в полёте ограничивает его контроллер.
+        С одним потоком запросы выполняются в вызывающем потоке, без пула.
+        """
+        order_ids = list(order_ids)
+        if not order_ids:
+            return
+        workers = min(max_workers or self.max_workers, len(order_ids))
+        if workers == 1:
+            for order_id in order_ids:
+                yield order_id, self.get(f"/orders/{order_id}")['order']
+            return
+        # Логинимся до запуска потоков, чтобы они не ждали друг друга на первом запросе
+        self._ensure_token()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(self.get, f"/orders/{order_id}"): order_id for order_id in order_ids}
+            for future in as_completed(futures):
+                yield futures[future], future.result()['order']
+        finally:
+            # При ошибке или досрочном выходе не ждём оставшиеся запросы: очередь отменяется,
+            # уже отправленные запросы завершаются в фоне
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,13 +1,26 @@
 import logging
 import requests
 from requests import Response, Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, ConnectionError, Timeout, RequestException
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
-from dotenv import load_dotenv, set_key
+from dotenv import dotenv_values, load_dotenv, set_key
 import os
+import threading
 import time
 
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only serialized within the process
+    fcntl = None
+
+from ApiClients.adaptive import AdaptiveController, AdaptiveTuner, count_items, endpoint_key
+from json_codec import decode_response
+
 
 class AuthError(Exception):
     """Custom exception for authentication-related errors."""
@@ -17,18 +30,30 @@ class AuthError(Exception):
 class DodoISAuth:
     """
     Manages OAuth token retrieval and refresh for DodoIS API.
+
+    Every refresh rotates the refresh token, so all processes sharing the .env file
+    (shard workers, boxes on a shared volume) refresh under one file lock. The access
+    token and its expiry are stored next to the refresh token; a process that gets the
+    lock after another one refreshed reuses that access token instead of refreshing again,
+    if it stays valid for min_token_lifetime seconds (the run's budget, TOKEN_MIN_LIFETIME at least).
+    A token the API rejects is renewed the same way (see renew_access_token).
     """
 
     TOKEN_URL = "https://auth.dodois.com/connect/token"
+    TOKEN_MIN_LIFETIME = 600
 
     def __init__(
         self,
         env_path: str,
         client_id: Optional[str] = None,
         client_secret: Optional[str] = None,
-        refresh_token: Optional[str] = None
+        refresh_token: Optional[str] = None,
+        token_url: Optional[str] = None,
+        min_token_lifetime: Optional[float] = None
     ):
         self.env_path = env_path
+        self.token_url = token_url or self.TOKEN_URL
+        self.min_token_lifetime = max(self.TOKEN_MIN_LIFETIME, min_token_lifetime or 0)
         load_dotenv(dotenv_path=self.env_path)
 
         self.client_id = client_id or os.getenv("CLIENT_ID")
@@ -39,8 +64,10 @@ class DodoISAuth:
             raise AuthError("Missing CLIENT_ID, CLIENT_SECRET or REFRESH_TOKEN in environment.")
 
         self.access_token: Optional[str] = None
+        self._rejected_token: Optional[str] = None
         self.session: Session = requests.Session()
-        self.refresh_access_token()
+        # The token is fetched on the first authenticated request, not here
+        self._token_lock = threading.Lock()
 
     def refresh_access_token(self) -> None:
         """
@@ -55,7 +82,7 @@ class DodoISAuth:
         }
 
         try:
-            resp = self.session.post(self.TOKEN_URL, data=payload, timeout=10)
+            resp = self.session.post(self.token_url, data=payload, timeout=10)
             resp.raise_for_status()
 
             token_data = resp.json()
@@ -65,8 +92,11 @@ class DodoISAuth:
             if not self.access_token or not new_refresh:
                 raise AuthError("Token response missing required fields.")
 
-            # Persist new refresh token
+            # Persist new refresh token, and the access token for the other processes
             set_key(self.env_path, "REFRESH_TOKEN", new_refresh)
+            set_key(self.env_path, "ACCESS_TOKEN", self.access_token)
+            set_key(self.env_path, "ACCESS_TOKEN_EXPIRES_AT",
+                    str(int(time.time() + int(token_data.get("expires_in") or 3600))))
             self.refresh_token = new_refresh
             logging.info("Access token refreshed successfully.")
 
@@ -80,10 +110,68 @@ class DodoISAuth:
             logging.error("Unexpected error during token refresh: %s", exc)
             raise AuthError("Unexpected error when refreshing token.")
 
+    @contextmanager
+    def _refresh_lock(self) -> Iterator[None]:
+        """
+        Exclusive lock on <env_path>.lock, held by one process at a time.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.env_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_shared_token(self) -> bool:
+        """
+        Re-reads the tokens from the .env file. Returns True if the stored access token can be used.
+        """
+        values = dotenv_values(self.env_path)
+        if values.get("REFRESH_TOKEN"):
+            self.refresh_token = values["REFRESH_TOKEN"]
+        try:
+            expires_at = float(values.get("ACCESS_TOKEN_EXPIRES_AT") or 0)
+        except ValueError:
+            expires_at = 0
+        if values.get("ACCESS_TOKEN") and values["ACCESS_TOKEN"] != self._rejected_token \
+                and expires_at > time.time() + self.min_token_lifetime:
+            self.access_token = values["ACCESS_TOKEN"]
+            logging.info("Using access token refreshed by another process.")
+            return True
+        return False
+
+    def ensure_access_token(self) -> None:
+        """
+        Gets an access token on first use: the one another process stored, or a refreshed one.
+        """
+        if self.access_token:
+            return
+        with self._token_lock:
+            if self.access_token:
+                return
+            with self._refresh_lock():
+                if not self._load_shared_token():
+                    self.refresh_access_token()
+
+    def renew_access_token(self, rejected_token: Optional[str]) -> None:
+        """
+        Replaces an access token the API rejected. If another thread already replaced it, its token is kept;
+        the rejected token is never taken from the .env file again.
+        """
+        with self._token_lock:
+            if self.access_token == rejected_token:
+                self.access_token = None
+                self._rejected_token = rejected_token
+        self.ensure_access_token()
+
     def get_headers(self) -> Dict[str, str]:
         """
-        Returns authorization headers for authenticated requests.
+        Returns authorization headers for authenticated requests, getting the token on first use.
         """
+        self.ensure_access_token()
         if not self.access_token:
             raise AuthError("Access token is not available.")
 
@@ -105,16 +193,39 @@ class DodoISClient:
 
     BASE_URL = "https://api.dodois.com/dodopizza/tr/"
 
-    def __init__(self, auth: DodoISAuth, default_page_size: int = 1000):
+    REQUEST_TIMEOUT = 15
+
+    def __init__(self, auth: DodoISAuth, default_page_size: int = 1000, max_parallelism: int = 8,
+                 tuner: Optional[AdaptiveTuner] = None, base_url: Optional[str] = None):
         self.auth = auth
+        self.base_url = base_url or self.BASE_URL
         self.session = auth.session
         self.page_size = default_page_size
+        self.max_parallelism = max_parallelism
+        # With a tuner page size and requests in flight are learned per endpoint
+        self.tuner = tuner
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max(max_parallelism, 10)))
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
         self.RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
         self.MAX_RETRIES = 3
         self.RETRY_BACKOFF = 10
+
+    def _controller(self, endpoint: str) -> Optional[AdaptiveController]:
+        if self.tuner is None:
+            return None
+        return self.tuner.controller(
+            # DodoIS endpoints take ids as parameters only, the path is the key
+            endpoint_key("dodois", endpoint),
+            page_size=self.page_size,
+            concurrency=self.max_parallelism,
+            min_page_size=100,
+            max_page_size=self.page_size,
+            max_concurrency=self.max_parallelism,
+            target_latency=self.REQUEST_TIMEOUT / 3,
+        )
+
     def _request(
             self,
             endpoint: str,
@@ -123,19 +234,37 @@ class DodoISClient:
         """
         Sends a GET request to the specified endpoint with retry on certain errors.
         """
-        url = f"{self.BASE_URL}{endpoint}"
+        url = f"{self.base_url}{endpoint}"
         headers = self.auth.get_headers()
+        controller = self._controller(endpoint)
+        renewed = False
 
         for attempt in range(1, self.MAX_RETRIES + 1):
+            started = time.monotonic()
             try:
-                response: Response = self.session.get(url, headers=headers, params=params, timeout=15)
+                with controller.slot() if controller else nullcontext():
+                    response: Response = self.session.get(url, headers=headers, params=params,
+                                                          timeout=self.REQUEST_TIMEOUT)
                 response.raise_for_status()
-                return response.json()
+                result = decode_response(response)
+                if controller:
+                    controller.observe(time.monotonic() - started, response.status_code, count_items(result),
+                                       params.get("take"))
+                return result
 
             except HTTPError as exc:
                 status_code = response.status_code
+                if controller and (status_code == 429 or status_code >= 500):
+                    controller.observe(time.monotonic() - started, status_code)
                 self.logger.warning("HTTP error (attempt %d): %s", attempt, exc)
 
+                if status_code == 401 and not renewed and attempt < self.MAX_RETRIES:
+                    # The token expired or was revoked during the run: renew it once and retry at once
+                    self.auth.renew_access_token(headers["Authorization"].split(" ", 1)[1])
+                    headers = self.auth.get_headers()
+                    renewed = True
+                    continue
+
                 if status_code in self.RETRYABLE_STATUS_CODES and attempt < self.MAX_RETRIES:
                     self.logger.info("Retrying after %d seconds due to status %d...", self.RETRY_BACKOFF, status_code)
                     time.sleep(self.RETRY_BACKOFF * attempt)
@@ -145,6 +274,8 @@ class DodoISClient:
                     raise APIError(f"API returned status {status_code}")
 
             except (ConnectionError, Timeout) as exc:
+                if controller:
+                    controller.observe(time.monotonic() - started, None)
                 self.logger.warning("Network error (attempt %d): %s", attempt, exc)
                 if attempt < self.MAX_RETRIES:
                     self.logger.info("Retrying after %d seconds due to network error...", self.RETRY_BACKOFF)
@@ -156,31 +287,22 @@ class DodoISClient:
                 self.logger.error("Unexpected API error: %s", exc)
                 raise APIError("Unexpected error during API request.")
 
-    def fetch_paginated(
-        self,
-        endpoint: str,
-        units: List[int],
-        from_date: str,
-        to_date: str,
-        date_param_keys: Dict[str, str] = None
-    ) -> List[Dict[str, Any]]:
-        """
-        Generator to fetch all records for given units between dates using skip/take pagination.
-        """
-        date_param_keys = date_param_keys or {"from": "fromDate", "to": "toDate", "units": "units"}
+            except ValueError as exc:
+                # A 200 response with a body that is not JSON
+                self.logger.error("Invalid JSON in API response: %s", exc)
+                raise APIError("API returned invalid JSON.")
+
+    def _fetch_page(self, endpoint: str, base_params: Dict[str, Any], skip: int, take: int) -> Dict[str, Any]:
+        params = {**base_params, "skip": skip, "take": take}
+        self.logger.info("Fetching %s records with %s, skip=%d", endpoint, base_params, skip)
+        return self._request(endpoint, params)
+
+    def _fetch_sequential(self, endpoint: str, base_params: Dict[str, Any], take: int) -> List[Dict[str, Any]]:
         all_records: List[Dict[str, Any]] = []
         skip = 0
 
         while True:
-            params = {
-                date_param_keys['from']: from_date,
-                date_param_keys['to']: to_date,
-                date_param_keys['units']: ",".join(map(str, units)),
-                "skip": skip,
-                "take": self.page_size
-            }
-            self.logger.info("Fetching %s records from %s to %s, skip=%d", endpoint, from_date, to_date, skip)
-            data = self._request(endpoint, params)
+            data = self._fetch_page(endpoint, base_params, skip, take)
 
             # Expecting 'items' and 'isEndOfListReached' in response
             items = data.get('items') or []
@@ -189,7 +311,106 @@ class DodoISClient:
             if data.get('isEndOfListReached', True):
                 break
 
-            skip += self.page_size
+            skip += take
 
         return all_records
 
+    def _fetch_skip_windows(self, endpoint: str, base_params: Dict[str, Any], take: int,
+                            parallelism: int) -> List[Dict[str, Any]]:
+        """
+        Speculatively requests `parallelism` consecutive skip offsets at once, wave after wave,
+        until a page reports the end of the list. Pages after the end are discarded.
+        """
+        all_records: List[Dict[str, Any]] = []
+        skip = 0
+
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            while True:
+                offsets = [skip + i * take for i in range(parallelism)]
+                pages = list(executor.map(lambda offset: self._fetch_page(endpoint, base_params, offset, take),
+                                          offsets))
+                for data in pages:
+                    all_records.extend(data.get('items') or [])
+                    if data.get('isEndOfListReached', True):
+                        return all_records
+                skip += parallelism * take
+
+    @staticmethod
+    def split_date_range(from_date: str, to_date: str, parts: int) -> List[Tuple[str, str]]:
+        """
+        Splits [from_date, to_date] into up to `parts` consecutive sub-intervals of equal length.
+        Sub-interval bounds are sent with time of day; records on a shared bound are deduplicated.
+        """
+        start = datetime.fromisoformat(from_date)
+        end = datetime.fromisoformat(to_date)
+        if parts <= 1 or end <= start:
+            return [(from_date, to_date)]
+
+        step = (end - start) / parts
+        bounds = [start + step * i for i in range(parts)] + [end]
+        fmt = "%Y-%m-%dT%H:%M:%S"
+        return [(bounds[i].strftime(fmt), bounds[i + 1].strftime(fmt)) for i in range(parts)
+                if bounds[i].strftime(fmt) != bounds[i + 1].strftime(fmt)]
+
+    def fetch_paginated(
+        self,
+        endpoint: str,
+        units: List[int],
+        from_date: str,
+        to_date: str,
+        date_param_keys: Dict[str, str] = None,
+        parallelism: int = 1,
+        mode: str = "interval",
+        dedupe_key: Optional[str] = "id"
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetches all records for given units between dates using skip/take pagination.
+
+        With parallelism > 1 (capped by max_parallelism) pages are fetched concurrently:
+        mode='interval' splits the date range into sub-intervals paged independently,
+        mode='skip' requests several skip offsets at once. Results are merged in order and
+        deduplicated by `dedupe_key` (records without the key are kept as is).
+        With a tuner the page size and the parallelism are capped by the learned settings.
+        """
+        date_param_keys = date_param_keys or {"from": "fromDate", "to": "toDate", "units": "units"}
+        parallelism = max(1, min(parallelism, self.max_parallelism))
+        # Page size is fixed for the whole call, skip offsets depend on it
+        take = self.page_size
+        controller = self._controller(endpoint)
+        if controller:
+            take = controller.page_size
+            parallelism = min(parallelism, controller.concurrency)
+
+        def base_params(start: str, end: str) -> Dict[str, Any]:
+            return {
+                date_param_keys['from']: start,
+                date_param_keys['to']: end,
+                date_param_keys['units']: ",".join(map(str, units)),
+            }
+
+        if parallelism == 1:
+            return self._fetch_sequential(endpoint, base_params(from_date, to_date), take)
+
+        if mode == "interval":
+            intervals = self.split_date_range(from_date, to_date, parallelism)
+            with ThreadPoolExecutor(max_workers=len(intervals)) as executor:
+                chunks = executor.map(lambda interval: self._fetch_sequential(endpoint, base_params(*interval), take),
+                                      intervals)
+                records = list(chain.from_iterable(chunks))
+        elif mode == "skip":
+            records = self._fetch_skip_windows(endpoint, base_params(from_date, to_date), take, parallelism)
+        else:
+            raise ValueError(f"Unknown pagination mode: {mode}")
+
+        if not dedupe_key:
+            return records
+        seen = set()
+        unique_records = []
+        for record in records:
+            key = record.get(dedupe_key) if isinstance(record, dict) else None
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            unique_records.append(record)
+        return unique_records
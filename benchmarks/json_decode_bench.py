@@ -0,0 +1,107 @@
+"""
+JSON decoding microbenchmark over recorded provider payloads.
+
+Payloads come from the raw response archive (see db/raw_archive.py); without an archive,
+synthetic Trendyol package pages of the real shape are used. Compares the available
+decoders and the old/new way of finding the items list of a paged response.
+
+    python benchmarks/json_decode_bench.py --archive-dir data/archive --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_codec import BACKENDS  # noqa: E402
+from db.raw_archive import RawArchive  # noqa: E402
+
+
+def recorded_payloads(archive_dir: str, limit: int) -> List[bytes]:
+    archive = RawArchive(archive_dir)
+    payloads = []
+    for date in archive.dates():
+        for unit in archive.units(date):
+            for records in archive.records(date, unit).values():
+                for record in records:
+                    payloads.append(json.dumps(record["payload"], ensure_ascii=False).encode("utf-8"))
+                    if len(payloads) >= limit:
+                        return payloads
+    return payloads
+
+
+def synthetic_package_page(size: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    content = []
+    for i in range(size):
+        created = 1_750_000_000_000 + rng.randint(0, 86_400_000)
+        content.append({
+            "id": f"{seed}-{i}",
+            "orderId": rng.randint(10 ** 9, 10 ** 10),
+            "orderNumber": str(rng.randint(10 ** 9, 10 ** 10)),
+            "packageCreationDate": created,
+            "packageModificationDate": created + rng.randint(0, 7_200_000),
+            "packageStatus": rng.choice(["Delivered", "Cancelled", "UnSupplied", "Picking"]),
+            "totalPrice": round(rng.uniform(100, 900), 2),
+            "storePickupSelected": rng.random() < 0.1,
+            "cancelInfo": None,
+            "address": {"latitude": str(rng.uniform(36, 38)), "longitude": str(rng.uniform(27, 36)),
+                        "address1": "Mah. Cad. No:1", "city": "Adana", "district": "Seyhan"},
+            "lines": [{"name": "Pizza", "price": 250.0, "quantity": 1, "modifierProducts": []}
+                      for _ in range(rng.randint(1, 4))],
+        })
+    page = {"page": seed, "size": size, "totalPages": 10, "totalCount": size * 10, "content": content}
+    return json.dumps(page, ensure_ascii=False).encode("utf-8")
+
+
+def extract_old(data):
+    lists = [v for v in data.values() if isinstance(v, list)]
+    return lists[0] if lists else None
+
+
+def extract_new(data, item_key="content"):
+    if item_key in data:
+        return data[item_key]
+    return next((value for value in data.values() if isinstance(value, list)), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-dir", default=os.getenv("RAW_ARCHIVE_DIR", "data/archive"))
+    parser.add_argument("--limit", type=int, default=500, help="Recorded payloads to load")
+    parser.add_argument("--pages", type=int, default=20, help="Synthetic pages when there is no archive")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    payloads = recorded_payloads(args.archive_dir, args.limit)
+    source = f"{len(payloads)} recorded payloads from {args.archive_dir}"
+    if not payloads:
+        payloads = [synthetic_package_page(args.page_size, seed) for seed in range(args.pages)]
+        source = f"{len(payloads)} synthetic package pages of {args.page_size} items"
+    total_mb = sum(len(payload) for payload in payloads) / 1024 / 1024
+    print(f"{source}, {total_mb:.2f} MB")
+
+    for name, factory in BACKENDS.items():
+        try:
+            loads = factory()
+        except ImportError:
+            print(f"  {name:8s} not installed")
+            continue
+        seconds = min(timeit.repeat(lambda: [loads(payload) for payload in payloads], number=1, repeat=args.repeat))
+        print(f"  {name:8s} {seconds * 1000:8.2f} ms  {total_mb / seconds:8.1f} MB/s")
+
+    decoded = [json.loads(payload) for payload in payloads]
+    dicts = [data for data in decoded if isinstance(data, dict)]
+    if dicts:
+        for label, extract in (("scan all lists", extract_old), ("known item key", extract_new)):
+            seconds = min(timeit.repeat(lambda: [extract(data) for data in dicts], number=100, repeat=args.repeat))
+            print(f"  items: {label:15s} {seconds * 10:8.3f} ms per pass over {len(dicts)} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Startup benchmark for the collector entry point.
+
+Measures, in fresh interpreters, how long it takes to import the entry point and to
+build the clients for a provider set, plus the slowest imports reported by -X importtime.
+Nothing here talks to the network: clients are lazy until their first request.
+
+    python benchmarks/startup_bench.py --runs 10 --providers trendyol
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_CODE = """
+import time
+started = time.perf_counter()
+import main
+from initialization import initialization
+initialization({providers!r})
+print((time.perf_counter() - started) * 1000)
+"""
+
+# Placeholder credentials, only so that initialization() finds its settings
+BENCH_ENV = {
+    "REGIONS": "BENCH",
+    "TRENDYOL_SUPPLIER_ID_BENCH": "1",
+}
+
+
+def run_python(args, extra_env=None) -> subprocess.CompletedProcess:
+    env = {**os.environ, **BENCH_ENV, **(extra_env or {})}
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def measure_startup(providers, runs: int):
+    code = STARTUP_CODE.format(providers=providers)
+    return [float(run_python(["-c", code]).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+
+
+def slowest_imports(providers, top: int, depth: int):
+    code = STARTUP_CODE.format(providers=providers)
+    stderr = run_python(["-X", "importtime", "-c", code]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level below their parent
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level < depth:
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Imports to list")
+    parser.add_argument("--depth", type=int, default=3, help="Import nesting levels to consider")
+    parser.add_argument("--providers", default="dodois,trendyol,yemeksepeti",
+                        help="Comma separated providers passed to initialization()")
+    args = parser.parse_args()
+    providers = tuple(item for item in args.providers.split(",") if item)
+
+    timings = measure_startup(providers, args.runs)
+    print(f"startup, providers={providers}: median {statistics.median(timings):.1f} ms, "
+          f"min {min(timings):.1f} ms, max {max(timings):.1f} ms over {args.runs} runs")
+
+    print("slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(providers, args.top, args.depth):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
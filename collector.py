@@ -0,0 +1,305 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import time as time_module
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from ApiClients.adaptive import get_tuner
+from db.mongo import MongoAPI
+from db.raw_archive import RawArchive
+from db.rollups import RollupEngine, unit_metrics
+from db.spool import WriteSpool
+from get_data import active_sections, dodois_snapshot, parse_sections, section_task, set_section, unit_document
+from initialization import initialization
+from profiling import Profiler
+from read_service import notify_run_completed
+from scheduler import PriorityScheduler, RunState, Task, task_priority
+from unit_registry import get_registry
+
+GMT_TIMEZONE = timezone(timedelta(hours=3))
+PROVIDERS = ("dodois", "trendyol", "yemeksepeti")
+
+
+def _get_path(doc: Optional[Dict[str, Any]], path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def content_hash(value: Any) -> str:
+    """
+    Stable hash of a section: key order and float/str formatting of the source JSON do not matter.
+    """
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def section_update(data: Dict[str, Any],
+                   sections: Iterable[str],
+                   old_doc: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Splits a freshly collected unit document into per-section $set paths and the
+    refreshed sections that came back empty and have to be $unset.
+
+    Every section is stored with its content hash under content_hash.<section>. Sections
+    whose hash matches the stored document are not sent; if nothing changed, the update
+    only touches last_checked. Sections that were not refreshed are left untouched in Mongo.
+    """
+    checked_at = data.get("update_date")
+    set_fields = {key: value for key, value in data.items()
+                  if key not in PROVIDERS and key != "update_date"
+                  and (old_doc is None or _get_path(old_doc, key) != value)}
+    unset_fields = []
+    for section in sections:
+        value = _get_path(data, section)
+        if value is None:
+            if old_doc is not None and _get_path(old_doc, section) is not None:
+                unset_fields.extend([section, f"content_hash.{section}"])
+            continue
+        value_hash = content_hash(value)
+        if value_hash != _get_path(old_doc, f"content_hash.{section}"):
+            set_fields[section] = value
+            set_fields[f"content_hash.{section}"] = value_hash
+
+    if set_fields or unset_fields:
+        set_fields["update_date"] = checked_at
+    set_fields["last_checked"] = checked_at
+    return set_fields, unset_fields
+
+
+def is_touch_only(set_fields: Dict[str, Any], unset_fields: List[str]) -> bool:
+    return not unset_fields and list(set_fields) == ["last_checked"]
+
+
+def merge_update(doc: Optional[Dict[str, Any]], set_fields: Dict[str, Any], unset_fields: List[str]) -> Dict[str, Any]:
+    """
+    Applies a section update to a copy of the stored document, the same way Mongo will.
+    """
+    merged = copy.deepcopy(doc) if doc else {}
+    merged.pop("_id", None)
+    for path, value in set_fields.items():
+        *parents, leaf = path.split(".")
+        target = merged
+        for key in parents:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[leaf] = value
+    for path in unset_fields:
+        *parents, leaf = path.split(".")
+        target = _get_path(merged, ".".join(parents)) if parents else merged
+        if isinstance(target, dict):
+            target.pop(leaf, None)
+    return merged
+
+
+def _preload(mongo: MongoAPI, spool: WriteSpool, run_units: List[Dict[str, Any]], file_date: str, week_ago_date: str,
+             sections: Tuple[str, ...]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], Tuple[str, ...]]:
+    """
+    Stored documents of the day and of a week ago for every unit, and the sections that can run with them.
+    Updates of the day still waiting in the spool are applied on top of the stored documents.
+    The documents of the day are None if Mongo could not be read.
+    """
+    unit_ids = [unit['dodois_unit_id'] for unit in run_units]
+    try:
+        # None is a Mongo error, never taken for missing documents
+        documents = mongo.find_many({"date": {"$in": [file_date, week_ago_date]}, "unit": {"$in": unit_ids}})
+    except PyMongoError as exc:
+        logging.error(f"Stored documents of {file_date} were not read: {exc}")
+        documents = None
+    if documents is None:
+        # Collect anyway; Yemeksepeti only adds to the stored orders, so it waits for Mongo
+        logging.error(f"Mongo is unavailable, collecting {file_date} without stored documents")
+        return None, {}, tuple(section for section in sections if section != "yemeksepeti")
+
+    old_data_by_unit = {}
+    week_ago_data_by_unit = {}
+    for document in documents:
+        by_unit = old_data_by_unit if document["date"] == file_date else week_ago_data_by_unit
+        by_unit[document["unit"]] = document
+    for unit_id, updates in spool.pending_updates(file_date).items():
+        for set_fields, unset_fields in updates:
+            old_data_by_unit[unit_id] = merge_update(old_data_by_unit.get(unit_id), set_fields, unset_fields)
+    return old_data_by_unit, week_ago_data_by_unit, sections
+
+
+def run_collection(start_date_range: int = 0,
+                   end_date_range: int = 2,
+                   units: Optional[List[Dict[str, Any]]] = None,
+                   sections: Optional[Iterable[str]] = None,
+                   archive: bool = False,
+                   spool_path: Optional[str] = None,
+                   budget_seconds: Optional[float] = None,
+                   task_workers: int = 8,
+                   run_state_path: Optional[str] = None,
+                   profiler: Optional[Profiler] = None) -> Dict[str, Any]:
+    """
+    Collects and stores Daily_Stats for the given day offsets (0 - today) and units.
+    All registry units are used if units is None, all sections if sections is None
+    (see get_data.SECTIONS). With archive=True raw responses are kept in the RawArchive
+    for offline reprocessing. Returns the run metrics.
+
+    Every (day, unit, section) is a task of the PriorityScheduler: today before older days,
+    orders before reviews, weighted by the unit's 'priority_weight'. Once budget_seconds
+    are spent no new task starts; the rest is deferred, recorded in the run state and
+    boosted in the next run. A unit is written as soon as all its sections are done.
+
+    Updates go through the local WriteSpool, so a slow or unavailable Mongo never blocks
+    the collection; what could not be flushed by the end of the run stays in the spool.
+    Updates left by the previous run are flushed before the stored documents are read,
+    and applied on top of them if Mongo still does not take them.
+
+    With a profiler the stages and section tasks are profiled and its report is written
+    at the end; tasks then run one at a time and every client sends its requests from the
+    task's own thread, since cProfile only sees the thread that enabled it.
+    """
+    started = time_module.monotonic()
+    started_at = datetime.now(GMT_TIMEZONE)
+    sections = parse_sections(sections)
+    if start_date_range > 2:
+        sections = tuple(section for section in sections if section != "yemeksepeti")
+
+    stage = profiler.stage if profiler else (lambda name: nullcontext())
+    if profiler:
+        task_workers = 1
+
+    with stage("setup"):
+        # Only the providers of the selected sections get a client, built on first request
+        Yemeksepeti, trendyol_clients, DodoIS = initialization({section.split(".")[0] for section in sections},
+                                                                max_workers=1 if profiler else None,
+                                                                run_seconds=budget_seconds)
+        registry = get_registry()
+        mongo = MongoAPI(collection_name="Daily_Stats")
+        rollups = RollupEngine(MongoAPI(collection_name="Rollup_Stats"))
+        # Shard processes share the spool, each one flushes the updates of its own units
+        spool = WriteSpool(mongo, rollups, path=spool_path,
+                           units=None if units is None else [unit['dodois_unit_id'] for unit in units])
+        spool.drain()
+        raw_archive = RawArchive() if archive else None
+        run_state = RunState(run_state_path)
+
+        sections = active_sections(sections, Yemeksepeti, trendyol_clients, DodoIS)
+        now = started_at
+        update_date = now.strftime("%Y-%m-%d:%H:%M:%S")
+        metrics = {"dates": [], "units": 0, "written": 0, "unchanged": 0}
+
+        if units is None:
+            registry.reload_if_changed()
+        run_units = units if units is not None else registry.units
+        previously_deferred = run_state.deferred_keys()
+
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    tasks: List[Task] = []
+    with stage("preload"):
+        for i in range(start_date_range, end_date_range):
+            now_date = now - timedelta(days=i)
+            file_date = now_date.date().strftime("%Y-%m-%d")
+            week_ago_date = (now_date - timedelta(days=7)).date().strftime("%Y-%m-%d")
+            old_data_by_unit, week_ago_data_by_unit, date_sections = _preload(mongo, spool, run_units, file_date,
+                                                                              week_ago_date, sections)
+            stored = old_data_by_unit is not None
+            old_data_by_unit = old_data_by_unit or {}
+
+            for unit in run_units:
+                unit_id = unit['dodois_unit_id']
+                record = raw_archive.recorder(file_date, unit_id) if raw_archive else None
+                groups[(file_date, unit_id)] = {"unit": unit, "now": now_date, "today": i == 0,
+                                                "stored": stored, "old_doc": old_data_by_unit.get(unit_id),
+                                                "pending": len(date_sections), "values": {}}
+                for section in date_sections:
+                    key = (file_date, unit_id, section)
+                    run = section_task(section, unit, now_date, GMT_TIMEZONE, Yemeksepeti, trendyol_clients, DodoIS,
+                                       old_data_by_unit.get(unit_id), week_ago_data_by_unit.get(unit_id), record)
+                    priority = task_priority(i, section, unit.get("priority_weight", 1.0), key in previously_deferred)
+                    if profiler:
+                        run = profiler.task(section, unit_id, run)
+                    tasks.append(Task(key, priority, run))
+
+            metrics["dates"].append(file_date)
+        spool.start()
+
+    def write_group(file_date: str, unit_id: str, group: Dict[str, Any]) -> None:
+        data = unit_document(group["unit"], group["now"])
+        for section, value in group["values"].items():
+            set_section(data, section, value)
+        if group["today"] and "dodois" in group["values"]:
+            data.update(dodois_snapshot(group["values"]["dodois"], group["now"]))
+        data.update({
+            "date": file_date,
+            "update_date": update_date,
+            "unit": unit_id})
+
+        old_doc = group["old_doc"]
+        set_fields, unset_fields = section_update(data, list(group["values"]), old_doc)
+        metrics["units"] += 1
+        if is_touch_only(set_fields, unset_fields):
+            spool.append(file_date, unit_id, set_fields, unset_fields)
+            metrics["unchanged"] += 1
+            return
+
+        if not group["stored"]:
+            # The update holds only the collected sections; the rollups follow the document once written
+            spool.append(file_date, unit_id, set_fields, unset_fields, rollup_stored=True)
+        else:
+            new_doc = merge_update(old_doc, set_fields, unset_fields)
+            rollup_doc = new_doc if old_doc is None or unit_metrics(old_doc) != unit_metrics(new_doc) else None
+            spool.append(file_date, unit_id, set_fields, unset_fields, rollup_doc)
+        metrics["written"] += 1
+
+    def on_done(task: Task, value: Any, error: Optional[BaseException]) -> None:
+        file_date, unit_id, section = task.key
+        group = groups[(file_date, unit_id)]
+        group["pending"] -= 1
+        if error is None:
+            group["values"][section] = value
+        if not group["pending"] and group["values"]:
+            write_group(file_date, unit_id, group)
+
+    with stage("collect"):
+        result = PriorityScheduler(budget_seconds, task_workers).run(tasks, on_done)
+        # Page sizes and request limits learned by the clients are kept for the next run,
+        # unless profiling held the clients to one request at a time
+        tuner = get_tuner()
+        if tuner and not profiler:
+            tuner.save()
+
+        # Units with deferred sections are written with the sections that did run
+        for (file_date, unit_id), group in groups.items():
+            if group["pending"] and group["values"]:
+                write_group(file_date, unit_id, group)
+
+    metrics["tasks"] = len(tasks)
+    metrics["failed_tasks"] = len(result["failed"])
+    metrics["deferred"] = len(result["deferred"])
+    with stage("flush"):
+        metrics["spool_pending"] = spool.close(timeout=float(os.getenv("WRITE_SPOOL_DRAIN_TIMEOUT", 120)))
+    metrics["elapsed"] = round(time_module.monotonic() - started, 3)
+
+    run = {
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.now(GMT_TIMEZONE).isoformat(),
+        "budget_seconds": budget_seconds,
+        "metrics": metrics,
+        "deferred": [list(key) for key in result["deferred"]],
+        "failed": [list(key) for key in result["failed"]],
+    }
+    run_state.save(run)
+    try:
+        MongoAPI(collection_name="Collector_Runs").insert_document(run)
+    except PyMongoError as exc:
+        logging.error(f"Run record was not stored in Mongo: {exc}")
+    # Cached dashboard reads of these dates are stale now
+    notify_run_completed(metrics["dates"])
+
+    logging.info(f"Collection finished: {metrics}")
+    if profiler:
+        logging.info(f"Profile report written to {profiler.write_report(metrics)}")
+    return metrics
@@ -1,32 +1,59 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
 import os
 from dotenv import load_dotenv
 import logging
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, List, Tuple
 
 load_dotenv("data/.env")
 
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(uri: str) -> MongoClient:
+    """Один MongoClient (и один ping) на процесс для каждого URI."""
+    with _clients_lock:
+        if uri not in _clients:
+            client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+            try:
+                client.admin.command('ping')
+                logging.info("Connected to MongoDB")
+            except ConnectionFailure as e:
+                logging.error(f"Error to connect MongoDB: {e}")
+                client.close()
+                raise
+            _clients[uri] = client
+        return _clients[uri]
+
+
 class MongoAPI:
     def __init__(self, uri=None, db_name=None, collection_name=None):
         self.uri = uri or os.getenv("MONGO_URI")
         self.db_name = db_name or os.getenv("MONGO_DB_NAME")
         self.collection_name = collection_name
+        self._collection = None
 
-        try:
-            self.client = MongoClient(self.uri, serverSelectionTimeoutMS=5000)
-            self.client.admin.command('ping')
-            logging.info("Connected to MongoDB")
-        except ConnectionFailure as e:
-            logging.error(f"Error to connect MongoDB: {e}")
-            raise
+    @property
+    def client(self) -> MongoClient:
+        return _get_client(self.uri)
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
 
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.collection_name]
+    @property
+    def collection(self):
+        # Подключение откладывается до первого обращения к коллекции
+        if self._collection is None:
+            self._collection = self.db[self.collection_name]
+        return self._collection
 
     def find_by_date_and_unit(self, date, unit) -> Optional[Dict[str, Any]]:
+        collection = self.collection
         try:
-            result = self.collection.find_one({"date": date, "unit": unit})
+            result = collection.find_one({"date": date, "unit": unit})
             if result:
                 logging.debug(f"Документ найден: {date}, unit: {unit}")
             else:
@@ -36,9 +63,33 @@ class MongoAPI:
             logging.error(f"Ошибка при поиске документа: {e}")
             return None
 
+    def find_many(self,
+                  query: Dict[str, Any],
+                  projection: Optional[Dict[str, Any]] = None,
+                  sort: Optional[List[Tuple[str, int]]] = None,
+                  limit: int = 0) -> Optional[List[Dict[str, Any]]]:
+        """Список документов по запросу; None при ошибке Mongo, чтобы её не путали с пустым результатом."""
+        collection = self.collection
+        try:
+            cursor = collection.find(query, projection, sort=sort, limit=limit)
+            return list(cursor)
+        except PyMongoError as e:
+            logging.error(f"Ошибка при поиске документов {query}: {e}")
+            return None
+
+    def ensure_index(self, keys: List[Tuple[str, int]]) -> bool:
+        collection = self.collection
+        try:
+            collection.create_index(keys)
+            return True
+        except PyMongoError as e:
+            logging.error(f"Ошибка при создании индекса {keys}: {e}")
+            return False
+
     def update_by_date_and_unit(self, date, unit, data: Dict[str, Any]) -> bool:
+        collection = self.collection
         try:
-            result = self.collection.update_one(
+            result = collection.update_one(
                 {"date": date, "unit": unit},
                 {"$set": data}
             )
@@ -52,6 +103,44 @@ class MongoAPI:
             logging.error(f"Ошибка при обновлении документа: {e}")
             return False
 
+    def upsert_by_date_and_unit(self, date, unit, set_data: Dict[str, Any], unset_fields: List[str] = None) -> bool:
+        update: Dict[str, Any] = {"$set": set_data}
+        if unset_fields:
+            update["$unset"] = {field: "" for field in unset_fields}
+        collection = self.collection
+        try:
+            collection.update_one({"date": date, "unit": unit}, update, upsert=True)
+            logging.debug(f"Документ записан: {date}, unit: {unit}, поля: {list(set_data)}")
+            return True
+        except PyMongoError as e:
+            logging.error(f"Ошибка при записи документа: {e}")
+            return False
+
+    def bulk_upsert_by_date_and_unit(self, operations: List[Tuple[str, str, Dict[str, Any], List[str]]]) -> bool:
+        """
+        Упорядоченный bulk upsert списка (date, unit, set_data, unset_fields).
+        BulkWriteError пробрасывается: операции до ошибочной уже записаны, вызывающий решает, что делать с остальными.
+        """
+        requests = []
+        for date, unit, set_data, unset_fields in operations:
+            update: Dict[str, Any] = {"$set": set_data}
+            if unset_fields:
+                update["$unset"] = {field: "" for field in unset_fields}
+            requests.append(UpdateOne({"date": date, "unit": unit}, update, upsert=True))
+        if not requests:
+            return True
+        collection = self.collection
+        try:
+            collection.bulk_write(requests, ordered=True)
+            logging.debug(f"Записано документов: {len(requests)}")
+            return True
+        except BulkWriteError as e:
+            logging.error(f"Ошибка записи в пакете документов: {e.details.get('writeErrors')}")
+            raise
+        except PyMongoError as e:
+            logging.error(f"Ошибка при пакетной записи документов: {e}")
+            return False
+
     def create_json(self, data: Dict[str, Any]) -> bool:
         if "date" not in data or "unit" not in data:
             logging.error("Документ должен содержать поля 'date' и 'unit'.")
@@ -61,10 +150,31 @@ class MongoAPI:
             logging.warning(f"⚠Документ уже существует: {data['date']}, unit: {data['unit']}")
             return False
 
+        collection = self.collection
         try:
-            self.collection.insert_one(data)
+            collection.insert_one(data)
             logging.debug(f"Документ создан: {data['date']}, unit: {data['unit']}")
             return True
         except PyMongoError as e:
             logging.error(f"Ошибка при создании документа: {e}")
             return False
+
+    def insert_document(self, data: Dict[str, Any]) -> bool:
+        collection = self.collection
+        try:
+            collection.insert_one(dict(data))
+            logging.debug(f"Документ создан в {self.collection_name}")
+            return True
+        except PyMongoError as e:
+            logging.error(f"Ошибка при создании документа: {e}")
+            return False
+
+    def upsert_pipeline(self, query: Dict[str, Any], pipeline: List[Dict[str, Any]]) -> bool:
+        collection = self.collection
+        try:
+            collection.update_one(query, pipeline, upsert=True)
+            logging.debug(f"Документ обновлён: {query}")
+            return True
+        except PyMongoError as e:
+            logging.error(f"Ошибка при обновлении документа {query}: {e}")
+            return False
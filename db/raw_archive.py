@@ -0,0 +1,129 @@
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+COMPRESSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+class RawArchiveError(Exception):
+    """Raised on archive misconfiguration."""
+    pass
+
+
+class RawArchive:
+    """
+    Append-only archive of raw provider responses.
+
+    Every (date, provider, unit) gets one compressed JSONL segment:
+        <base_dir>/<date>/<provider>/<unit>.jsonl.gz
+    Each collector run appends one compressed frame with a record per section:
+        {"fetched_at": ..., "section": "trendyol.orders", "payload": <raw response>}
+    Appended gzip members / zstd frames are read back as one stream.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None, compression: Optional[str] = None):
+        self.base_dir = base_dir or os.getenv("RAW_ARCHIVE_DIR", "data/archive")
+        self.compression = compression or os.getenv("RAW_ARCHIVE_COMPRESSION", "gzip")
+        if self.compression not in COMPRESSIONS:
+            raise RawArchiveError(f"Unknown compression '{self.compression}', expected one of {list(COMPRESSIONS)}")
+        if self.compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise RawArchiveError("zstd compression requires the 'zstandard' package")
+            self._zstd = zstandard
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, date: str, provider: str, unit: str) -> str:
+        return os.path.join(self.base_dir, date, provider, f"{unit}{COMPRESSIONS[self.compression]}")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return self._zstd.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    def _open_read(self, path: str):
+        if self.compression == "zstd":
+            raw = open(path, "rb")
+            return io.TextIOWrapper(self._zstd.ZstdDecompressor().stream_reader(raw, read_across_frames=True,
+                                                                                 closefd=True),
+                                    encoding="utf-8")
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    def append(self, date: str, unit: str, section: str, payload: Any) -> None:
+        """
+        Appends one raw response of a section (e.g. 'trendyol.orders') to its segment.
+        """
+        provider = section.split(".")[0]
+        path = self._path(date, provider, unit)
+        record = {
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "section": section,
+            "payload": payload,
+        }
+        frame = self._compress((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        with self._lock(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f:
+                f.write(frame)
+
+    def recorder(self, date: str, unit: str) -> Callable[[str, Any], None]:
+        """
+        record(section, payload) bound to a date and unit. Archive errors never stop the collection.
+        """
+        def record(section: str, payload: Any) -> None:
+            try:
+                self.append(date, unit, section, payload)
+            except (OSError, TypeError, ValueError) as exc:
+                logging.error(f"Raw archive write failed for {date} {unit} {section}: {exc}")
+        return record
+
+    def read(self, date: str, provider: str, unit: str) -> Iterator[Dict[str, Any]]:
+        path = self._path(date, provider, unit)
+        if not os.path.exists(path):
+            return
+        with self._open_read(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def records(self, date: str, unit: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        All archived records of a unit for a date grouped by section, oldest first.
+        """
+        by_section: Dict[str, List[Dict[str, Any]]] = {}
+        date_dir = os.path.join(self.base_dir, date)
+        if not os.path.isdir(date_dir):
+            return by_section
+        for provider in sorted(os.listdir(date_dir)):
+            for record in self.read(date, provider, unit):
+                by_section.setdefault(record["section"], []).append(record)
+        for records in by_section.values():
+            records.sort(key=lambda record: record["fetched_at"])
+        return by_section
+
+    def dates(self) -> List[str]:
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(name for name in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, name)))
+
+    def units(self, date: str) -> List[str]:
+        suffix = COMPRESSIONS[self.compression]
+        date_dir = os.path.join(self.base_dir, date)
+        units = set()
+        if os.path.isdir(date_dir):
+            for provider in os.listdir(date_dir):
+                for name in os.listdir(os.path.join(date_dir, provider)):
+                    if name.endswith(suffix):
+                        units.add(name[:-len(suffix)])
+        return sorted(units)
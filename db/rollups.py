@@ -0,0 +1,105 @@
+import logging
+from datetime import date as date_cls
+from typing import Any, Dict, Optional
+
+from db.mongo import MongoAPI
+
+
+def iso_week(date: str) -> str:
+    """'2025-07-21' -> '2025-W30'"""
+    year, week, _ = date_cls.fromisoformat(date).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def unit_metrics(doc: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Flattens the numeric figures of a Daily_Stats unit document into the metrics that are rolled up.
+    """
+    metrics: Dict[str, float] = {}
+    if not doc:
+        return metrics
+
+    for item in (doc.get("dodois") or {}).get("salesStatistics") or []:
+        if not isinstance(item, dict):
+            continue
+        for field, value in item.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metrics[f"dodois_{field}"] = metrics.get(f"dodois_{field}", 0) + value
+
+    trendyol_orders = (doc.get("trendyol") or {}).get("orders") or {}
+    if trendyol_orders:
+        metrics["trendyol_total_order"] = trendyol_orders.get("total_order", 0)
+        metrics["trendyol_total_price"] = trendyol_orders.get("total_price", 0)
+        metrics["trendyol_store_pickup_order"] = trendyol_orders.get("store_pickup_order", 0)
+        metrics["trendyol_late_orders"] = len(trendyol_orders.get("late_orders", []))
+        metrics["trendyol_cancelled_orders"] = len(trendyol_orders.get("cancelled_orders", []))
+
+    yemeksepeti_orders = (doc.get("yemeksepeti") or {}).get("orders") or {}
+    if yemeksepeti_orders:
+        metrics["yemeksepeti_total_order"] = len(yemeksepeti_orders.get("orders_id", []))
+        metrics["yemeksepeti_total_price"] = yemeksepeti_orders.get("total_price", 0)
+        metrics["yemeksepeti_cancelled_orders"] = len(yemeksepeti_orders.get("cancelled_orders", []))
+
+    return metrics
+
+
+class RollupEngine:
+    """
+    Maintains materialized region/franchise totals per day and per ISO week.
+
+    Every rollup document keeps the contribution of each unit (per day for weekly rollups)
+    and the totals over those contributions. Applying a unit document replaces only its own
+    contribution and recomputes the touched totals inside a single update, so re-applying
+    the same document is a no-op and no Daily_Stats scan is needed.
+    """
+
+    SCOPES = ("region_name", "franchise")
+
+    def __init__(self, mongo: MongoAPI):
+        self.mongo = mongo
+
+    def apply(self, old_doc: Optional[Dict[str, Any]], new_doc: Dict[str, Any]) -> bool:
+        """
+        Propagates a changed unit document to its rollups. Returns False if nothing had to change.
+        """
+        new_metrics = unit_metrics(new_doc)
+        old_metrics = unit_metrics(old_doc)
+        if old_doc and new_metrics == old_metrics:
+            return False
+
+        date, unit = new_doc["date"], new_doc["unit"]
+        names = set(new_metrics) | set(old_metrics)
+        week = iso_week(date)
+
+        ok = True
+        for scope in self.SCOPES:
+            key = new_doc.get(scope)
+            if not key:
+                continue
+            ok &= self._apply_contribution(date, scope, key, unit, new_metrics, names)
+            ok &= self._apply_contribution(week, scope, key, f"{date}:{unit}", new_metrics, names)
+        ok &= self._apply_contribution(week, "unit", unit, date, new_metrics, names)
+        return ok
+
+    def rebuild(self, date: str, source: MongoAPI) -> int:
+        """
+        Re-applies every unit document of a date, e.g. after a backfill. Returns the number of units.
+        """
+        count = 0
+        for doc in source.collection.find({"date": date}):
+            self.apply(None, doc)
+            count += 1
+        logging.info(f"Rollups rebuilt for {date}: {count} units")
+        return count
+
+    def _apply_contribution(self, period, scope, key, contribution_key, metrics, names) -> bool:
+        contributions = {"$objectToArray": "$contributions"}
+        totals = {
+            f"totals.{name}": {"$sum": {"$map": {"input": contributions, "as": "c", "in": f"$$c.v.{name}"}}}
+            for name in names
+        }
+        pipeline = [
+            {"$set": {f"contributions.{contribution_key}": {"$literal": metrics}}},
+            {"$set": {**totals, "contributors": {"$size": contributions}}},
+        ]
+        return self.mongo.upsert_pipeline({"period": period, "scope": scope, "key": key}, pipeline)
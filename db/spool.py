@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db.mongo import MongoAPI
+from db.rollups import RollupEngine
+
+
+class SpoolFlushError(Exception):
+    """Raised when Mongo did not accept a spooled batch."""
+    pass
+
+
+# rollup_doc of a row whose rollups follow the document Mongo holds once the update is written
+ROLLUP_STORED = "stored"
+# Write error codes that go away on retry: a concurrent upsert of the same (date, unit)
+RETRYABLE_WRITE_ERRORS = {11000}
+
+
+class WriteSpool:
+    """
+    Durable local queue of Daily_Stats updates in front of Mongo.
+
+    The collector appends every unit update to an SQLite file and goes on; a background
+    flusher drains the file to Mongo in ordered bulk upserts on (date, unit) and applies
+    the rollups afterwards. Rows are deleted only after Mongo accepted them, so updates
+    that could not be written survive the run and are flushed by the next one.
+    Replaying a row is harmless: updates are $set/$unset and rollups are idempotent.
+    A row Mongo can never apply (e.g. $set below a null field) is moved to the dead_letter
+    table with its error, so it does not hold up the rows behind it.
+
+    All collector processes of a box share one spool file, whatever the shard layout.
+    With units a spool flushes and counts only the rows of these units, so every unit
+    is flushed by the one process that collects it and its updates stay in order.
+    """
+
+    def __init__(self,
+                 mongo: MongoAPI,
+                 rollups: Optional[RollupEngine] = None,
+                 path: Optional[str] = None,
+                 batch_size: int = 200,
+                 max_backoff: float = 60,
+                 units: Optional[Iterable[str]] = None):
+        self.mongo = mongo
+        self.rollups = rollups
+        self.path = path or os.getenv("WRITE_SPOOL_PATH", "data/spool.sqlite3")
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " date TEXT NOT NULL,"
+            " unit TEXT NOT NULL,"
+            " update_spec TEXT NOT NULL,"
+            " rollup_doc TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            " id INTEGER PRIMARY KEY,"
+            " date TEXT NOT NULL,"
+            " unit TEXT NOT NULL,"
+            " update_spec TEXT NOT NULL,"
+            " rollup_doc TEXT,"
+            " created_at REAL NOT NULL,"
+            " error TEXT NOT NULL,"
+            " failed_at REAL NOT NULL)"
+        )
+        self._owned = "1"
+        if units is not None:
+            self._db.execute("CREATE TEMP TABLE owned_units (unit TEXT PRIMARY KEY)")
+            self._db.executemany("INSERT OR IGNORE INTO owned_units (unit) VALUES (?)", [(unit,) for unit in units])
+            self._owned = "unit IN (SELECT unit FROM owned_units)"
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def append(self,
+               date: str,
+               unit: str,
+               set_fields: Dict[str, Any],
+               unset_fields: List[str],
+               rollup_doc: Optional[Dict[str, Any]] = None,
+               rollup_stored: bool = False) -> None:
+        """
+        Records one unit update. rollup_doc is the resulting document if the rollups have to follow;
+        with rollup_stored they follow the stored document read back after the update is written,
+        for updates built without the stored document.
+        """
+        update_spec = json.dumps({"set": set_fields, "unset": unset_fields}, ensure_ascii=False, default=str)
+        if rollup_stored:
+            rollup = ROLLUP_STORED
+        else:
+            rollup = json.dumps(rollup_doc, ensure_ascii=False, default=str) if rollup_doc is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO spool (date, unit, update_spec, rollup_doc, created_at) VALUES (?, ?, ?, ?, ?)",
+                (date, unit, update_spec, rollup, time.time()))
+            self._db.commit()
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM spool WHERE {self._owned}").fetchone()[0]
+
+    def pending_updates(self, date: str) -> Dict[str, List[Tuple[Dict[str, Any], List[str]]]]:
+        """
+        Updates of a date not flushed yet, as (set_fields, unset_fields) per unit in append order.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT unit, update_spec FROM spool WHERE date = ? AND {self._owned} ORDER BY id",
+                (date,)).fetchall()
+        updates: Dict[str, List[Tuple[Dict[str, Any], List[str]]]] = {}
+        for unit, update_spec in rows:
+            update = json.loads(update_spec)
+            updates.setdefault(unit, []).append((update["set"], update["unset"]))
+        return updates
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """
+        Updates Mongo refused to apply, oldest first.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT date, unit, update_spec, error FROM dead_letter WHERE {self._owned} ORDER BY id").fetchall()
+        return [{"date": date, "unit": unit, "update": json.loads(update_spec), "error": error}
+                for date, unit, update_spec, error in rows]
+
+    def flush_batch(self) -> int:
+        """
+        Sends the oldest batch to Mongo. Returns the number of rows removed from the spool, raises on failure.
+        A row with a permanent write error is moved to the dead_letter table after the rows before it.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, date, unit, update_spec, rollup_doc, created_at FROM spool WHERE {self._owned}"
+                f" ORDER BY id LIMIT ?",
+                (self.batch_size,)).fetchall()
+        if not rows:
+            return 0
+
+        operations = []
+        for _, date, unit, update_spec, _, _ in rows:
+            update = json.loads(update_spec)
+            operations.append((date, unit, update["set"], update["unset"]))
+        dead = None
+        try:
+            if not self.mongo.bulk_upsert_by_date_and_unit(operations):
+                raise SpoolFlushError(f"Mongo rejected a batch of {len(rows)} updates")
+        except BulkWriteError as exc:
+            write_errors = exc.details.get("writeErrors") or []
+            if not write_errors or write_errors[0].get("code") in RETRYABLE_WRITE_ERRORS:
+                raise SpoolFlushError(f"Mongo rejected a batch of {len(rows)} updates: {exc}") from exc
+            # The batch is ordered: the rows before the failing one are written, the rest was not sent
+            index = write_errors[0]["index"]
+            dead = (rows[index], write_errors[0].get("errmsg", str(exc)))
+            rows = rows[:index]
+
+        if self.rollups:
+            for _, date, unit, _, rollup_doc, _ in rows:
+                if rollup_doc is None:
+                    continue
+                if rollup_doc == ROLLUP_STORED:
+                    document = self.mongo.find_by_date_and_unit(date, unit)
+                    if document is None:
+                        raise SpoolFlushError(f"Stored document {date} {unit} was not read back for the rollups")
+                else:
+                    document = json.loads(rollup_doc)
+                if not self.rollups.apply(None, document):
+                    # The batch stays in the spool; replaying the upserts is harmless
+                    raise SpoolFlushError("Rollup update failed")
+
+        with self._lock:
+            self._db.executemany("DELETE FROM spool WHERE id = ?", [(row[0],) for row in rows])
+            if dead:
+                (row_id, date, unit, update_spec, rollup_doc, created_at), error = dead
+                self._db.execute(
+                    "INSERT OR REPLACE INTO dead_letter"
+                    " (id, date, unit, update_spec, rollup_doc, created_at, error, failed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row_id, date, unit, update_spec, rollup_doc, created_at, error, time.time()))
+                self._db.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+            self._db.commit()
+        if dead:
+            logging.error(f"Spool: update {date} {unit} moved to dead_letter: {error}")
+        logging.debug(f"Spool: flushed {len(rows)} updates")
+        return len(rows) + (1 if dead else 0)
+
+    def flush(self) -> int:
+        """
+        Drains the spool until it is empty. Raises if Mongo rejects a batch.
+        """
+        total = 0
+        while True:
+            flushed = self.flush_batch()
+            if not flushed:
+                return total
+            total += flushed
+
+    def drain(self) -> int:
+        """
+        One flush attempt without the background flusher, e.g. before the stored documents are read.
+        Failures are logged; returns the number of updates left.
+        """
+        try:
+            self.flush()
+        except (SpoolFlushError, PyMongoError, ValueError) as exc:
+            logging.warning(f"Spool flush failed: {exc}")
+        return self.pending()
+
+    def _run(self) -> None:
+        backoff = 1
+        # One batch at a time, so a stop request is seen between batches
+        while not self._stop.is_set():
+            try:
+                flushed = self.flush_batch()
+                backoff = 1
+            except (SpoolFlushError, PyMongoError, ValueError) as exc:
+                logging.warning(f"Spool flush failed, retrying in {backoff}s: {exc}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if not flushed:
+                self._wakeup.wait(1)
+                self._wakeup.clear()
+
+    def start(self) -> "WriteSpool":
+        """
+        Starts the background flusher; updates left from previous runs are drained first.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-spool-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: Optional[float] = None) -> int:
+        """
+        Stops the flusher after a last drain attempt and returns the number of updates left in the spool.
+        With a timeout close returns once it is spent, even if a batch is still in flight.
+        """
+        if self._thread is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self.pending() and self._thread.is_alive():
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                self._wakeup.set()
+                time.sleep(0.1)
+            self._stop.set()
+            self._wakeup.set()
+            # The flusher stops after the batch in flight
+            self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if self._thread.is_alive():
+                logging.warning("Spool: the flusher did not stop in time, a batch is still in flight")
+            else:
+                self._thread = None
+        left = self.pending()
+        if left:
+            logging.warning(f"Spool: {left} updates are kept in {self.path} for the next run")
+        # A flusher still running keeps the connection; the daemon thread ends with the process
+        if self._thread is None:
+            with self._lock:
+                self._db.close()
+        return left
@@ -1,64 +1,177 @@
 import logging
-from json import loads
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from unit_registry import get_registry
+
+# Document paths refreshed independently of each other
+SECTIONS = ("dodois", "trendyol.reviews", "trendyol.claims", "trendyol.orders", "yemeksepeti")
+TRENDYOL_PARTS = ("reviews", "claims", "orders")
+# Items list of the paged Trendyol meal responses; get_all_paginated falls back to the first list
+TRENDYOL_ITEM_KEY = "content"
+
+
+def parse_sections(value: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    None -> all sections. A provider name selects all of its sections ("trendyol" -> trendyol.*).
+    """
+    if value is None:
+        return SECTIONS
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",") if item.strip()]
+
+    selected = []
+    for item in value:
+        matches = [section for section in SECTIONS if section == item or section.startswith(f"{item}.")]
+        if not matches:
+            raise ValueError(f"Unknown section '{item}', expected one of {SECTIONS}")
+        selected.extend(section for section in matches if section not in selected)
+    return tuple(section for section in SECTIONS if section in selected)
+
+
+def active_sections(sections: Optional[Iterable[str]], Yemeksepeti = None, trendyol_clients = None, DodoIS = None) -> Tuple[str, ...]:
+    """
+    Selected sections that have a client to refresh them.
+    """
+    available = {"dodois": DodoIS, "trendyol": trendyol_clients, "yemeksepeti": Yemeksepeti}
+    return tuple(section for section in parse_sections(sections) if available[section.split(".")[0]])
+
+
+def unit_document(unit: Dict[str, Any], now) -> Dict[str, Any]:
+    """
+    Document skeleton of a unit, without provider sections.
+    """
+    return {
+        "name": unit['dodois_name'],
+        "date" : now.strftime("%Y-%m-%d"),
+        "unit" : unit['dodois_unit_id'],
+        "update_date" : now.strftime("%Y-%m-%d %H:%M:%S"),
+        "region_name": unit['region_name'],
+        "franchise": unit['franchise'],
+        "trendyol_id": unit['trendyol_id'],
+        "yemeksepeti_id": unit['yemeksepeti_pos_id'],
+    }
+
+
+def section_task(section: str, unit: Dict[str, Any], now, gmt_timezone, Yemeksepeti = None, trendyol_clients = None, DodoIS = None, old_unit_data: Dict[str, Any] = None, week_ago_unit_data: Dict[str, Any] = None, record = None) -> Callable[[], Any]:
+    """
+    Returns a callable fetching one section of a unit; it returns the section value or None.
+    """
+    unit_id = unit['dodois_unit_id']
+
+    #DodoIS
+    if section == "dodois":
+        return lambda: get_dodois_data(DodoIS, unit_id, now, week_ago_unit_data, record)
+
+    #Trendyol
+    if section.startswith("trendyol."):
+        part = section.split(".")[1]
+
+        def trendyol_task():
+            trendyol_data = get_trendyol_data(trendyol_clients, unit['trendyol_supplier_id'], unit['trendyol_id'], now, gmt_timezone, (part,), record)
+            return (trendyol_data or {}).get(part)
+        return trendyol_task
+
+    # Yemeksepeti
+    if section == "yemeksepeti":
+        old_yemeksepeti_order_data = (old_unit_data or {}).get("yemeksepeti") or {}
+        return lambda: get_yemeksepeti_data(Yemeksepeti, unit['yemeksepeti_pos_id'], now, gmt_timezone, old_yemeksepeti_order_data, record)
+
+    raise ValueError(f"Unknown section '{section}'")
+
+
+def set_section(result: Dict[str, Any], section: str, value: Any) -> None:
+    if section.startswith("trendyol."):
+        if value is not None:
+            result.setdefault("trendyol", {})[section.split(".")[1]] = value
+        return
+    result[section] = value
+
+
+def get_updated_data(now, gmt_timezone, Yemeksepeti = None, trendyol_clients = None, DodoIS = None, old_data = None, week_ago_data = None, units: List[Dict[str, Any]] = None, sections: Optional[Iterable[str]] = None, archive = None):
+    result_data = {}
+    sections = active_sections(sections, Yemeksepeti, trendyol_clients, DodoIS)
+
+    with ThreadPoolExecutor(max_workers=max(len(sections), 1)) as executor:
+        for unit in units if units is not None else get_registry().units:
+            unit_id = unit['dodois_unit_id']
+            result = unit_document(unit, now)
+            record = archive.recorder(result["date"], unit_id) if archive else None
+
+            # Every provider section of the unit runs as its own task
+            tasks = {
+                section: executor.submit(section_task(section, unit, now, gmt_timezone, Yemeksepeti, trendyol_clients, DodoIS,
+                                                      (old_data or {}).get(unit_id), (week_ago_data or {}).get(unit_id), record))
+                for section in sections
+            }
+            for section, task in tasks.items():
+                set_section(result, section, task.result())
 
-with open("data/regions.json", encoding="utf-8") as f:
-    data = loads(f.read())
+            result_data[unit_id] = result
 
 
-def get_updated_data(now, gmt_timezone, Yemeksepeti = None, trendyol_clients = None, DodoIS = None, old_data = None):
-    result_data = {}
+    return result_data
 
-    for division in data['divisions']:
-        trendyol_supplier_id = division['trendyol_supplier_id']
-        region_name = division['region_name']
-        franchise_name = division['franchise']
 
-        for unit in division['units']:
 
-            unit_id = unit['dodois_unit_id']
-            trendyol_unit_id = unit['trendyol_id']
-            yemeksepeti_unit_id = unit['yemeksepeti_pos_id']
-
-            result = {
-                "name": unit['dodois_name'],
-                "date" : now.strftime("%Y-%m-%d"),
-                "unit" : unit['dodois_unit_id'],
-                "update_date" : now.strftime("%Y-%m-%d %H:%M:%S"),
-                "region_name": region_name,
-                "franchise": franchise_name,
-                "trendyol_id": trendyol_unit_id,
-                "yemeksepeti_id": yemeksepeti_unit_id,
-            }
+def new_yemeksepeti_order_data(old_yemeksepeti_order_data: Dict[str, Any] = None) -> Dict[str, Any]:
+    # Lists are copied: orders are folded into the result, the stored document stays as it was
+    oysd = (old_yemeksepeti_order_data or {}).get("orders", {})
+    return {
+        "cancelled_orders": list(oysd.get('cancelled_orders', [])),
+        "total_price": oysd.get('total_price', 0),
+        "order_price_coordinate": list(oysd.get('order_price_coordinate', [])),
+        "orders_id": list(oysd.get('orders_id', []))
 
-            #DodoIS
-            if DodoIS:
-                dodois_data = get_dodois_data(DodoIS, unit_id, now)
-                result["dodois"] = dodois_data
+    }
 
-            #Trendyol
-            if trendyol_clients:
-                trendyol_data = get_trendyol_data(trendyol_clients,trendyol_supplier_id, trendyol_unit_id, now, gmt_timezone)
-                result['trendyol'] = trendyol_data
 
+def fold_yemeksepeti_order(yemeksepeti_order_data: Dict[str, Any], order_detail: Dict[str, Any], now_time, gmt_timezone) -> None:
+    """
+    Adds one /orders/{id} detail to the order aggregate; already counted orders and other days are skipped.
+    """
+    if order_detail['code'] in yemeksepeti_order_data['orders_id']:
+        return
 
-            # Yemeksepeti
-            if Yemeksepeti:
-                old_yemeksepeti_order_data = (old_data or {}).get(unit_id, {}).get("yemeksepeti", {})
-                yemeksepeti_data = get_yemeksepeti_data(Yemeksepeti, yemeksepeti_unit_id, now, gmt_timezone, old_yemeksepeti_order_data)
-                result['yemeksepeti'] = yemeksepeti_data
+    created_at_str = order_detail['createdAt']
+    created_at_utc = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
+    created_at_local = created_at_utc.astimezone(gmt_timezone)
 
-            result_data[unit_id] = result
+    if created_at_local.date() != now_time.date():
+        return
 
+    if order_detail['status'] == "cancelled":
+        for cancelled_order in yemeksepeti_order_data['cancelled_orders']:
+            if order_detail['code'] == cancelled_order['orderId']:
+                break
+        else:
+            yemeksepeti_order_data['cancelled_orders'].append(
+            {"orderId": order_detail['code'], 'price': order_detail['price']['totalNet']})
+        return
+
+    yemeksepeti_order_data['orders_id'].append(order_detail['code'])
 
-    return result_data
 
+    price = float(order_detail['price']['totalNet'])
+    yemeksepeti_order_data['total_price'] += price
 
+    address = order_detail.get('delivery',{}).get('address',{})
+    if address:
+        yemeksepeti_order_data['order_price_coordinate'].append(
+            [price, address.get('latitude'),
+             address.get('longitude')])
 
-def get_yemeksepeti_data(Yemeksepeti, yemeksepeti_unit_id, now_time, gmt_timezone, old_yemeksepeti_order_data: Dict[str, Any] = None):
+
+def yemeksepeti_result(yemeksepeti_order_data: Dict[str, Any]) -> Dict[str, Any]:
+    if yemeksepeti_order_data['orders_id'] or yemeksepeti_order_data['cancelled_orders']:
+        return {'orders': yemeksepeti_order_data}
+    return {}
+
+
+def get_yemeksepeti_data(Yemeksepeti, yemeksepeti_unit_id, now_time, gmt_timezone, old_yemeksepeti_order_data: Dict[str, Any] = None, record: Optional[Callable[[str, Any], None]] = None):
     if yemeksepeti_unit_id:
-        yemeksepeti_result = {}
         orders_accepted = Yemeksepeti.get("/orders/ids", params={"status": "accepted", "vendorId": yemeksepeti_unit_id})
         orders_cancelled = Yemeksepeti.get("/orders/ids", params={"status": "cancelled", "vendorId": yemeksepeti_unit_id})
         orders = {
@@ -67,169 +180,207 @@ def get_yemeksepeti_data(Yemeksepeti, yemeksepeti_unit_id, now_time, gmt_timezon
         }
 
         total_order = orders['count']
-        print(old_yemeksepeti_order_data)
-        oysd = old_yemeksepeti_order_data.get("orders", {})
-        yemeksepeti_order_data = {
-            "cancelled_orders": oysd.get('cancelled_orders', []),
-            "total_price": oysd.get('total_price', 0),
-            "order_price_coordinate": oysd.get('order_price_coordinate', []),
-            "orders_id": oysd.get('orders_id', [])
+        yemeksepeti_order_data = new_yemeksepeti_order_data(old_yemeksepeti_order_data)
+        order_details = []
 
-        }
-        print(yemeksepeti_order_data)
-        
         if total_order:
 
             order_list = orders['orders']
-            for order in order_list:
-                order_detail = Yemeksepeti.get(f"/orders/{order}")['order']
-
-                if order_detail['code'] in yemeksepeti_order_data['orders_id']:
-                    continue
-
-                created_at_str = order_detail['createdAt']
-                created_at_utc = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
-                created_at_local = created_at_utc.astimezone(gmt_timezone)
-
-                if created_at_local.date() != now_time.date():
-                    continue
-
-                if order_detail['status'] == "cancelled":
-                    if not len(yemeksepeti_order_data['cancelled_orders']):
-                        yemeksepeti_order_data['cancelled_orders'].append(
-                            {"orderId": order_detail['code'], 'price': order_detail['price']['totalNet']})
-                        continue
-                    for cancelled_order in yemeksepeti_order_data['cancelled_orders']:
-                        if order_detail['code'] == cancelled_order['orderId']:
-                            break
-                    else:
-                        yemeksepeti_order_data['cancelled_orders'].append(
-                        {"orderId": order_detail['code'], 'price': order_detail['price']['totalNet']})
-                    continue
-
-                yemeksepeti_order_data['orders_id'].append(order_detail['code'])
-
-
-                price = float(order_detail['price']['totalNet'])
-                yemeksepeti_order_data['total_price'] += price
+            # Details are fetched concurrently and folded in as they complete
+            for order, order_detail in Yemeksepeti.get_order_details(order_list):
+                order_details.append(order_detail)
+                fold_yemeksepeti_order(yemeksepeti_order_data, order_detail, now_time, gmt_timezone)
 
-                address = order_detail.get('delivery',{}).get('address',{})
-                if address:
-                    yemeksepeti_order_data['order_price_coordinate'].append(
-                        [price, address.get('latitude'),
-                         address.get('longitude')])
+        if record:
+            record("yemeksepeti", order_details)
 
-                yemeksepeti_result['orders'] = yemeksepeti_order_data
+        return yemeksepeti_result(yemeksepeti_order_data)
 
-        return yemeksepeti_result
 
-
-def get_trendyol_data(trendyol_clients, trendyol_supplier_id, trendyol_unit_id, now, gmt_timezone):
+def day_bounds_ms(now, gmt_timezone) -> Tuple[int, int]:
     start_of_day = datetime.combine(now.date(), time(0, 0), tzinfo=gmt_timezone)
     start_date_epochmille = int(start_of_day.timestamp() * 1000)
     end_of_day = start_of_day + timedelta(days=1)
     end_date_epochmille = int(end_of_day.timestamp() * 1000)
+    return start_date_epochmille, end_date_epochmille
+
+
+def aggregate_trendyol_orders(packages: List[Dict[str, Any]], start_date_epochmille: int, end_date_epochmille: int) -> Dict[str, Any]:
+    trendyol_order_data = {"total_order": 0,
+                           "store_pickup_order": 0,
+                           "total_price": 0,
+                           "late_orders": [],
+                           "cancelled_orders": [],
+                           "order_price_coordinate": []
+                           }
+
+    for package in packages:
+        if not start_date_epochmille <= package['packageCreationDate'] or not package['packageCreationDate'] < end_date_epochmille:
+            continue
+
+
+        trendyol_order_data['total_order'] += 1
+        trendyol_order_data['total_price'] += package['totalPrice']
+        if package['storePickupSelected']:
+            trendyol_order_data['store_pickup_order'] += 1
+
+        if (package['packageStatus'] == "Cancelled" or package['packageStatus'] == "UnSupplied") and not package[
+            'cancelInfo']:
+            trendyol_order_data['cancelled_orders'].append(
+                {"reason": package['cancelInfo'], "orderId": package['orderId'],
+                 "totalPrice": package['totalPrice']})
+
+        if package['packageStatus'] == "Delivered" and package['packageCreationDate'] < package[
+            'packageModificationDate'] - 3600 * 1000:
+            trendyol_order_data['late_orders'].append(
+                {"orderId": package['orderId'],
+                 "late_time": int(
+                     (package['packageModificationDate'] - package['packageCreationDate']) / 60 / 1000)})
+        trendyol_order_data['order_price_coordinate'].append(
+            [package['totalPrice'], package['address']['latitude'], package['address']['longitude']])
+    return trendyol_order_data
+
+
+def aggregate_trendyol_part(part: str, response: List[Any], now, gmt_timezone) -> Dict[str, Any]:
+    """
+    Turns the raw list of one Trendyol endpoint into its part of the trendyol section.
+    """
+    if part == "orders":
+        trendyol_order_data = aggregate_trendyol_orders(response, *day_bounds_ms(now, gmt_timezone))
+        return {'orders': trendyol_order_data} if trendyol_order_data['total_order'] else {}
+    return {part: response} if response else {}
+
+
+def get_trendyol_data(trendyol_clients, trendyol_supplier_id, trendyol_unit_id, now, gmt_timezone, parts: Iterable[str] = TRENDYOL_PARTS, record: Optional[Callable[[str, Any], None]] = None):
+    start_date_epochmille, end_date_epochmille = day_bounds_ms(now, gmt_timezone)
 
     if trendyol_unit_id:
         trendyol_result = {}
 
         Trendyol = trendyol_clients[trendyol_supplier_id]
-        response = Trendyol.get_all_paginated(
-            url=f"https://api.tgoapis.com/integrator/review/meal/suppliers/{trendyol_supplier_id}/stores/{trendyol_unit_id}/reviews/filter",
-            params={
-                "startDate": start_date_epochmille,
-                "endDate": end_date_epochmille
-            }
-        )
-        if response:
-            trendyol_result['reviews'] = response
-
-        response = Trendyol.get_all_paginated(
-            url=f"https://api.tgoapis.com/integrator/claim/meal/suppliers/{trendyol_supplier_id}/claims",
-            params={
-                "storeId": trendyol_unit_id,
-                "createdStartDate": start_date_epochmille,
-                "createdEndDate": end_date_epochmille
-            }
-        )
-        if response:
-            trendyol_result['claims'] = response
-
         FOUR_HOURS_MS = 4 * 3600 * 1000
+        requests_by_part = {
+            "reviews": (
+                f"{Trendyol.base_url}/integrator/review/meal/suppliers/{trendyol_supplier_id}/stores/{trendyol_unit_id}/reviews/filter",
+                {
+                    "startDate": start_date_epochmille,
+                    "endDate": end_date_epochmille
+                }
+            ),
+            "claims": (
+                f"{Trendyol.base_url}/integrator/claim/meal/suppliers/{trendyol_supplier_id}/claims",
+                {
+                    "storeId": trendyol_unit_id,
+                    "createdStartDate": start_date_epochmille,
+                    "createdEndDate": end_date_epochmille
+                }
+            ),
+            "orders": (
+                f"{Trendyol.base_url}/integrator/order/meal/suppliers/{trendyol_supplier_id}/packages",
+                {
+                    "packageModificationStartDate": start_date_epochmille - FOUR_HOURS_MS,
+                    "packageModificationEndDate": end_date_epochmille + FOUR_HOURS_MS,
+                    "storeId": trendyol_unit_id,
+
+                }
+            ),
+        }
 
-        response = Trendyol.get_all_paginated(
+        for part in parts:
+            url, params = requests_by_part[part]
+            response = Trendyol.get_all_paginated(url=url, params=params, item_key=TRENDYOL_ITEM_KEY)
+            if record:
+                record(f"trendyol.{part}", response)
+            trendyol_result.update(aggregate_trendyol_part(part, response, now, gmt_timezone))
 
-            url=f"https://api.tgoapis.com/integrator/order/meal/suppliers/{trendyol_supplier_id}/packages",
-            params={
-                "packageModificationStartDate": start_date_epochmille - FOUR_HOURS_MS,
-                "packageModificationEndDate": end_date_epochmille + FOUR_HOURS_MS,
-                "storeId": trendyol_unit_id,
+        return trendyol_result
 
-            }
-        )
-        trendyol_order_data = {"total_order": 0,
-                               "store_pickup_order": 0,
-                               "total_price": 0,
-                               "late_orders": [],
-                               "cancelled_orders": [],
-                               "order_price_coordinate": []
-                               }
-
-        for package in response:
-            if not start_date_epochmille <= package['packageCreationDate'] or not package['packageCreationDate'] < end_date_epochmille:
-                continue
-
-
-            trendyol_order_data['total_order'] += 1
-            trendyol_order_data['total_price'] += package['totalPrice']
-            if package['storePickupSelected']:
-                trendyol_order_data['store_pickup_order'] += 1
-
-            if (package['packageStatus'] == "Cancelled" or package['packageStatus'] == "UnSupplied") and not package[
-                'cancelInfo']:
-                trendyol_order_data['cancelled_orders'].append(
-                    {"reason": package['cancelInfo'], "orderId": package['orderId'],
-                     "totalPrice": package['totalPrice']})
-
-            if package['packageStatus'] == "Delivered" and package['packageCreationDate'] < package[
-                'packageModificationDate'] - 3600 * 1000:
-                trendyol_order_data['late_orders'].append(
-                    {"orderId": package['orderId'],
-                     "late_time": int(
-                         (package['packageModificationDate'] - package['packageCreationDate']) / 60 / 1000)})
-            trendyol_order_data['order_price_coordinate'].append(
-                [package['totalPrice'], package['address']['latitude'], package['address']['longitude']])
-        if trendyol_order_data['total_order']:
-            trendyol_result['orders'] = trendyol_order_data
 
-        return trendyol_result
+DODOIS_ENDPOINTS = [
+    ("finances/sales/units", "salesStatistics", "result", "from", "to"),
+    ("production/orders-handover-statistics", "ordersHandoverStatistics", "ordersHandoverStatistics", "from", "to"),
+    ("delivery/statistics", "unitsStatistics", "unitsStatistics", "from", "to"),
+    ("orders/clients-statistics", "clientStatistics", "clientStatistics", "fromDate", "toDate")
+]
+DODOIS_WEEK_AGO_KEY = "finances/sales/units?weekAgo"
+# Today's salesStatistics per time-of-day slot ('HHMM'), so the runs of next week read week-over-week at the same time
+DODOIS_SNAPSHOT_FIELD = "dodois_snapshots"
 
 
-def get_dodois_data(DodoIS, unit_id ,now):
+def snapshot_slot(now) -> str:
+    """
+    Time-of-day slot of DODOIS_SNAPSHOT_MINUTES (15 by default), e.g. 14:37 -> '1430'.
+    """
+    slot_minutes = int(os.getenv("DODOIS_SNAPSHOT_MINUTES", 15))
+    minute = now.hour * 60 + now.minute
+    minute -= minute % slot_minutes
+    return f"{minute // 60:02d}{minute % 60:02d}"
 
-    start_date = now.strftime("%Y-%m-%d")
-    end_date = (now + timedelta(days=1)).strftime("%Y-%m-%d")
 
-    dodois_result = {}
-    endpoints = [
-        ("finances/sales/units", "salesStatistics", "result", "from", "to"),
-        ("production/orders-handover-statistics", "ordersHandoverStatistics", "ordersHandoverStatistics", "from", "to"),
-        ("delivery/statistics", "unitsStatistics", "unitsStatistics", "from", "to"),
-        ("orders/clients-statistics", "clientStatistics", "clientStatistics", "fromDate", "toDate")
-    ]
-
-    for endpoint, key, response_key, from_param_name, to_param_name in endpoints:
-        common_params = {from_param_name: start_date, to_param_name: end_date, "units": unit_id}
+def dodois_snapshot(dodois_section: Dict[str, Any], now) -> Dict[str, Any]:
+    """
+    $set path of today's salesStatistics snapshot in the slot of now; empty without sales.
+    """
+    sales = (dodois_section or {}).get("salesStatistics")
+    return {f"{DODOIS_SNAPSHOT_FIELD}.{snapshot_slot(now)}": sales} if sales else {}
 
-        response = DodoIS._request(endpoint=endpoint, params=common_params)
+
+def stored_week_ago_sales(week_ago_unit_data: Dict[str, Any] = None) -> Any:
+    return ((week_ago_unit_data or {}).get("dodois") or {}).get("salesStatistics")
+
+
+def aggregate_dodois_data(responses: Dict[str, Any], week_ago_unit_data: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Builds the dodois section from the raw endpoint responses.
+    """
+    dodois_result = {}
+    for endpoint, key, response_key, from_param_name, to_param_name in DODOIS_ENDPOINTS:
+        response = responses.get(endpoint) or {}
         if response.get(response_key):
             dodois_result[key] = response[response_key]
 
-    params = {"from": (now - timedelta(days=7)).strftime("%Y-%m-%d"),
-              "to": (now - timedelta(days=7)).strftime("%Y-%m-%dT%H:%M:%S"), "units": unit_id}
+    # A week-ago response was requested for today (cut at the same time of day) or because history is missing;
+    # otherwise week-over-week comes from the stored Daily_Stats document of the completed day
+    if DODOIS_WEEK_AGO_KEY in responses:
+        response = responses[DODOIS_WEEK_AGO_KEY] or {}
+        if response.get("result"):
+            dodois_result["salesStatisticsWeekAgo"] = response["result"]
+    else:
+        stored_week_ago = stored_week_ago_sales(week_ago_unit_data)
+        if stored_week_ago:
+            dodois_result["salesStatisticsWeekAgo"] = stored_week_ago
+
+    return dodois_result
+
 
-    response = DodoIS._request(endpoint="finances/sales/units", params=params)
-    if response.get("result"):
-        dodois_result["salesStatisticsWeekAgo"] = response["result"]
+def get_dodois_data(DodoIS, unit_id ,now, week_ago_unit_data: Dict[str, Any] = None, record: Optional[Callable[[str, Any], None]] = None):
+
+    start_date = now.strftime("%Y-%m-%d")
+    end_date = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    responses = {}
+    for endpoint, key, response_key, from_param_name, to_param_name in DODOIS_ENDPOINTS:
+        common_params = {from_param_name: start_date, to_param_name: end_date, "units": unit_id}
 
-    return dodois_result
\ No newline at end of file
+        responses[endpoint] = DodoIS._request(endpoint=endpoint, params=common_params)
+
+    week_ago = now - timedelta(days=7)
+    if now.date() == datetime.now(now.tzinfo).date():
+        # Today is not over, so the week-ago day is cut at the same time of day: the snapshot stored a week ago
+        # in the same slot stands in for the response, the API is only asked if there is none
+        snapshot = ((week_ago_unit_data or {}).get(DODOIS_SNAPSHOT_FIELD) or {}).get(snapshot_slot(now))
+        if snapshot:
+            responses[DODOIS_WEEK_AGO_KEY] = {"result": snapshot}
+        else:
+            params = {"from": week_ago.strftime("%Y-%m-%d"),
+                      "to": week_ago.strftime("%Y-%m-%dT%H:%M:%S"), "units": unit_id}
+            responses[DODOIS_WEEK_AGO_KEY] = DodoIS._request(endpoint="finances/sales/units", params=params)
+    elif not stored_week_ago_sales(week_ago_unit_data):
+        params = {"from": week_ago.strftime("%Y-%m-%d"),
+                  "to": (week_ago + timedelta(days=1)).strftime("%Y-%m-%d"), "units": unit_id}
+        responses[DODOIS_WEEK_AGO_KEY] = DodoIS._request(endpoint="finances/sales/units", params=params)
+
+    if record:
+        record("dodois", responses)
+
+    return aggregate_dodois_data(responses, week_ago_unit_data)
@@ -1,45 +1,132 @@
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Optional
+
 from dotenv import load_dotenv
 load_dotenv("data/.env")
 
-from DodoIS.DodoISData import *
-from ApiClients.yemeksepeti_client import *
-from ApiClients.trendyol_client import *
+PROVIDERS = ("dodois", "trendyol", "yemeksepeti")
+
+
+class LazyClient:
+    """
+    Proxy that builds the wrapped client on first attribute access.
+    Client modules are only imported and authenticated when a run really uses the provider.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                    logging.info(f"Initializing {self._name} Client is Completed")
+        return self._client
+
+    def __getattr__(self, item):
+        return getattr(self._get(), item)
+
+
+class LazyTrendyolClients(Mapping):
+    """
+    supplier_id -> TrendyolClient, every client is built on first lookup.
+    """
+
+    def __init__(self, regions_by_supplier: Dict[str, str], max_workers: Optional[int] = None):
+        self._regions_by_supplier = regions_by_supplier
+        self._clients = {supplier_id: LazyClient(f"Trendyol {region}",
+                                                 lambda region=region: build_trendyol_client(region, max_workers))
+                         for supplier_id, region in regions_by_supplier.items()}
+
+    def __getitem__(self, supplier_id):
+        return self._clients[supplier_id]
+
+    def __iter__(self):
+        return iter(self._clients)
 
-def initialization():
+    def __len__(self):
+        return len(self._clients)
 
-    yemeksepeti_client = POSMiddlewareClient(
-        base_url=f"https://integration-middleware-tr.me.restaurant-partners.com/v2/chains/{os.getenv('YEMEKSEPETI_CHAINID')}/",
+
+def build_yemeksepeti_client(max_workers: Optional[int] = None):
+    from ApiClients.adaptive import get_tuner
+    from ApiClients.yemeksepeti_client import POSMiddlewareClient
+
+    root_url = os.getenv("YEMEKSEPETI_BASE_URL", "https://integration-middleware-tr.me.restaurant-partners.com/v2")
+    return POSMiddlewareClient(
+        base_url=f"{root_url}/chains/{os.getenv('YEMEKSEPETI_CHAINID')}/",
         username=os.getenv("YEMEKSEPETI_USERNAME"),
-        password=os.getenv("YEMEKSEPETI_PASSWORD")
+        password=os.getenv("YEMEKSEPETI_PASSWORD"),
+        max_workers=max_workers or int(os.getenv("YEMEKSEPETI_MAX_WORKERS", 8)),
+        tuner=get_tuner(),
+        login_url=f"{root_url}/login",
+        server_error_wait=float(os.getenv("YEMEKSEPETI_SERVER_ERROR_WAIT", 1800))
+    )
+
+
+def build_trendyol_client(region: str, max_workers: Optional[int] = None):
+    from ApiClients.adaptive import get_tuner
+    from ApiClients.trendyol_client import TrendyolClient
+
+    return TrendyolClient(
+        api_key=os.getenv(f"TRENDYOL_API_KEY_{region}"),
+        api_secret=os.getenv(f"TRENDYOL_API_SECRET_{region}"),
+        agent_name=os.getenv(f"TRENDYOL_AGENT_MAIL_{region}"),
+        agent_mail=os.getenv(f"TRENDYOL_AGENT_NAME_{region}"),
+        tuner=get_tuner(),
+        max_concurrency=max_workers or int(os.getenv("TRENDYOL_MAX_CONCURRENCY", 8)),
+        base_url=os.getenv("TRENDYOL_BASE_URL")
     )
-    logging.info(f"Initializing Yemeksepeti Client is Completed")
 
-    trendyol_clients = trendyol_initialization()
 
-    logging.info(f"Initialized Trendyol clients for regions: {os.getenv('REGIONS')}")
+def build_dodois_client(max_workers: Optional[int] = None, run_seconds: Optional[float] = None):
+    from ApiClients.adaptive import get_tuner
+    from DodoIS.DodoISData import DodoISAuth, DodoISClient
 
-    auth = DodoISAuth(env_path="data/.env")
-    dodois_client = DodoISClient(auth=auth)
+    auth = DodoISAuth(env_path=os.getenv("DODOIS_ENV_PATH", "data/.env"), token_url=os.getenv("DODOIS_TOKEN_URL"),
+                      min_token_lifetime=run_seconds)
+    return DodoISClient(auth=auth, max_parallelism=max_workers or int(os.getenv("DODOIS_MAX_PARALLELISM", 8)),
+                        tuner=get_tuner(),
+                        base_url=os.getenv("DODOIS_BASE_URL"))
 
-    logging.info(f"Initializing DodoIS Client is Completed")
+
+def initialization(providers: Optional[Iterable[str]] = None, max_workers: Optional[int] = None,
+                   run_seconds: Optional[float] = None):
+    """
+    Returns (yemeksepeti_client, trendyol_clients, dodois_client) for the requested providers,
+    None for the others. Clients are lazy: no import, auth or network call happens until first use.
+    max_workers overrides the requests every client runs at once; with 1 all requests run in the calling thread.
+    run_seconds is the expected run length: a shared DodoIS token is only reused if it outlives the run.
+    """
+    providers = set(PROVIDERS if providers is None else providers)
+
+    yemeksepeti_client = LazyClient("Yemeksepeti", lambda: build_yemeksepeti_client(max_workers)) \
+        if "yemeksepeti" in providers else None
+
+    trendyol_clients = trendyol_initialization(max_workers) if "trendyol" in providers else None
+    if trendyol_clients is not None:
+        logging.info(f"Initialized Trendyol clients for regions: {os.getenv('REGIONS')}")
+
+    dodois_client = LazyClient("DodoIS", lambda: build_dodois_client(max_workers, run_seconds)) \
+        if "dodois" in providers else None
 
     return yemeksepeti_client, trendyol_clients, dodois_client
 
 
 
-def trendyol_initialization():
-    trendyol_clients = {}
+def trendyol_initialization(max_workers: Optional[int] = None):
+    regions_by_supplier = {}
     for region in os.getenv("REGIONS").split(","):
-        trendyol_client = TrendyolClient(
-            api_key=os.getenv(f"TRENDYOL_API_KEY_{region}"),
-            api_secret=os.getenv(f"TRENDYOL_API_SECRET_{region}"),
-            agent_name=os.getenv(f"TRENDYOL_AGENT_MAIL_{region}"),
-            agent_mail=os.getenv(f"TRENDYOL_AGENT_NAME_{region}")
-        )
-
         supplier_id = os.getenv(f"TRENDYOL_SUPPLIER_ID_{region}")
         if not supplier_id:
             raise EnvironmentError(f"Missing TRENDYOL_SUPPLIER_ID for region {region}")
-        trendyol_clients[supplier_id] = trendyol_client
+        regions_by_supplier[supplier_id] = region
 
-    return trendyol_clients
\ No newline at end of file
+    return LazyTrendyolClients(regions_by_supplier, max_workers)
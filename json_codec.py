@@ -0,0 +1,64 @@
+"""
+Fast JSON decoding for API responses.
+
+Uses orjson or msgspec when installed and falls back to the standard library.
+JSON_DECODER=orjson|msgspec|json forces a backend.
+"""
+import json
+import logging
+import os
+from typing import Any, Callable, Dict
+
+__all__ = ["loads", "backend", "decode_response"]
+
+
+def _orjson_loads() -> Callable[[bytes], Any]:
+    import orjson
+    return orjson.loads
+
+
+def _msgspec_loads() -> Callable[[bytes], Any]:
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+
+def _stdlib_loads() -> Callable[[bytes], Any]:
+    return json.loads
+
+
+BACKENDS: Dict[str, Callable[[], Callable[[bytes], Any]]] = {
+    "orjson": _orjson_loads,
+    "msgspec": _msgspec_loads,
+    "json": _stdlib_loads,
+}
+
+
+def _select_backend():
+    requested = os.getenv("JSON_DECODER")
+    order = [requested] if requested else list(BACKENDS)
+    for name in order:
+        if name not in BACKENDS:
+            logging.warning(f"Unknown JSON_DECODER '{name}', using the standard library")
+            break
+        try:
+            return name, BACKENDS[name]()
+        except ImportError:
+            logging.warning(f"JSON decoder '{name}' is not installed")
+    return "json", _stdlib_loads()
+
+
+backend, loads = _select_backend()
+
+
+def decode_response(response) -> Any:
+    """
+    Drop-in replacement for response.json() decoding the raw body bytes directly.
+    Raises ValueError on invalid JSON, like requests does.
+    """
+    if backend == "json":
+        return response.json()
+    try:
+        return loads(response.content)
+    except Exception as exc:
+        # msgspec.DecodeError is not a ValueError
+        raise ValueError(str(exc)) from exc
@@ -0,0 +1,347 @@
+"""
+Local fake of the provider APIs used by the collector, for load and soak tests.
+
+Serves the Yemeksepeti middleware (/v2/login, /v2/chains/<chain>/orders/ids, /orders/<id>),
+the Trendyol meal integrator endpoints (reviews, claims, packages) and the DodoIS token and
+statistics endpoints. Data is generated deterministically from the store id and the day, so
+expected aggregates can be computed without the server (see expected_* functions).
+Latency, 204/429/5xx rates, volumes and the maximum page size are configurable.
+
+    python loadtest/fake_providers.py --port 8900 --latency-ms 50 --rate-429 0.02
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+GMT_TIMEZONE = timezone(timedelta(hours=3))
+DAY_MS = 24 * 3600 * 1000
+FOUR_HOURS_MS = 4 * 3600 * 1000
+
+
+class FakeConfig:
+    """
+    Volumes are per store and day. Rates are probabilities per data request; logins never fail.
+    """
+
+    def __init__(self,
+                 latency_ms: float = 20,
+                 jitter_ms: float = 10,
+                 rate_204: float = 0.0,
+                 rate_429: float = 0.0,
+                 rate_5xx: float = 0.0,
+                 trendyol_orders: int = 60,
+                 reviews: int = 5,
+                 claims: int = 2,
+                 yemeksepeti_orders: int = 30,
+                 max_page_size: int = 200):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_204 = rate_204
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.trendyol_orders = trendyol_orders
+        self.reviews = reviews
+        self.claims = claims
+        self.yemeksepeti_orders = yemeksepeti_orders
+        self.max_page_size = max_page_size
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _rng(*parts: Any) -> random.Random:
+    return random.Random(zlib.crc32(":".join(map(str, parts)).encode()))
+
+
+def day_start_ms(day: datetime) -> int:
+    return int(datetime.combine(day.date(), datetime.min.time(), tzinfo=GMT_TIMEZONE).timestamp() * 1000)
+
+
+# Trendyol
+
+def trendyol_packages(config: FakeConfig, store_id: str, start_ms: int) -> List[Dict[str, Any]]:
+    """
+    Packages modified within [start - 4h, end + 4h) of the day starting at start_ms;
+    about a tenth of them were created outside the day and must be filtered out.
+    """
+    rng = _rng("trendyol.orders", store_id, start_ms)
+    packages = []
+    for i in range(config.trendyol_orders):
+        created = start_ms + rng.randint(-FOUR_HOURS_MS // 2, DAY_MS + FOUR_HOURS_MS // 2 - 1) \
+            if rng.random() < 0.1 else start_ms + rng.randint(0, DAY_MS - 1)
+        status = rng.choice(["Delivered", "Delivered", "Delivered", "Cancelled", "UnSupplied", "Picking"])
+        packages.append({
+            "id": f"{store_id}-{start_ms}-{i}",
+            "orderId": f"{store_id}{start_ms // 1000}{i}",
+            "packageCreationDate": created,
+            "packageModificationDate": created + rng.randint(0, 2 * 3600 * 1000),
+            "packageStatus": status,
+            "totalPrice": round(rng.uniform(100, 900), 2),
+            "storePickupSelected": rng.random() < 0.1,
+            "cancelInfo": None,
+            "address": {"latitude": str(round(rng.uniform(36, 38), 6)),
+                        "longitude": str(round(rng.uniform(27, 36), 6))},
+        })
+    return packages
+
+
+def trendyol_list(config: FakeConfig, part: str, store_id: str, start_ms: int) -> List[Dict[str, Any]]:
+    count = config.reviews if part == "reviews" else config.claims
+    rng = _rng(f"trendyol.{part}", store_id, start_ms)
+    return [{"id": f"{store_id}-{part}-{i}", "rate": rng.randint(1, 5), "createdDate": start_ms + rng.randint(0, DAY_MS - 1)}
+            for i in range(count)]
+
+
+def expected_trendyol_orders(config: FakeConfig, store_id: str, start_ms: int) -> Tuple[int, float]:
+    """
+    (total_order, total_price) the collector must compute for the day.
+    """
+    in_day = [package for package in trendyol_packages(config, store_id, start_ms)
+              if start_ms <= package["packageCreationDate"] < start_ms + DAY_MS]
+    return len(in_day), sum(package["totalPrice"] for package in in_day)
+
+
+# Yemeksepeti
+
+def yemeksepeti_order_ids(config: FakeConfig, vendor_id: str, day: str, status: str) -> List[str]:
+    rng = _rng("yemeksepeti", vendor_id, day)
+    cancelled = int(config.yemeksepeti_orders * 0.1)
+    count = cancelled if status == "cancelled" else config.yemeksepeti_orders - cancelled
+    prefix = "c" if status == "cancelled" else "a"
+    return [f"{vendor_id}.{day}.{prefix}{i}.{rng.randint(1000, 9999)}" for i in range(count)]
+
+
+def yemeksepeti_order(order_id: str) -> Dict[str, Any]:
+    vendor_id, day, number, _ = order_id.split(".")
+    rng = _rng("yemeksepeti.order", order_id)
+    created = datetime.fromisoformat(day).replace(tzinfo=GMT_TIMEZONE) + timedelta(seconds=rng.randint(0, 86399))
+    return {
+        "code": order_id,
+        "status": "cancelled" if number.startswith("c") else "accepted",
+        "createdAt": created.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "price": {"totalNet": f"{rng.uniform(80, 700):.2f}"},
+        "delivery": {"address": {"latitude": round(rng.uniform(36, 38), 6),
+                                 "longitude": round(rng.uniform(27, 36), 6)}},
+    }
+
+
+def expected_yemeksepeti_orders(config: FakeConfig, vendor_id: str, day: str) -> Tuple[int, int, float]:
+    """
+    (accepted orders, cancelled orders, total price of accepted orders) of the day.
+    """
+    accepted = yemeksepeti_order_ids(config, vendor_id, day, "accepted")
+    cancelled = yemeksepeti_order_ids(config, vendor_id, day, "cancelled")
+    return len(accepted), len(cancelled), sum(float(yemeksepeti_order(order_id)["price"]["totalNet"])
+                                              for order_id in accepted)
+
+
+# DodoIS
+
+DODOIS_RESPONSES = {
+    "finances/sales/units": "result",
+    "production/orders-handover-statistics": "ordersHandoverStatistics",
+    "delivery/statistics": "unitsStatistics",
+    "orders/clients-statistics": "clientStatistics",
+}
+
+
+def dodois_statistics(endpoint: str, unit_id: str, date_from: str) -> List[Dict[str, Any]]:
+    rng = _rng("dodois", endpoint, unit_id, date_from)
+    return [{"unitId": unit_id, "from": date_from, "value": round(rng.uniform(1000, 90000), 2),
+             "count": rng.randint(10, 900)}]
+
+
+class FakeProviderServer:
+    """
+    Threaded HTTP server with all fake providers. Counts requests by route and status.
+    """
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeProviderServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-providers", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, route: str, status: int, latency: float) -> None:
+        with self._lock:
+            by_status = self.stats.setdefault(route, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+            self.latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": {route: dict(by_status) for route, by_status in self.stats.items()},
+                    "total": len(self.latencies)}
+
+    def _handler(self):
+        server = self
+        config = self.config
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+                payload = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _fault(self, provider: str) -> Optional[int]:
+                roll = random.random()
+                if roll < config.rate_429:
+                    return 429
+                roll -= config.rate_429
+                if roll < config.rate_5xx:
+                    return 503
+                roll -= config.rate_5xx
+                if provider == "yemeksepeti" and roll < config.rate_204:
+                    return 204
+                return None
+
+            def _handle(self, method: str) -> None:
+                started = time.monotonic()
+                url = urlsplit(self.path)
+                path = re.sub(r"/+", "/", url.path)
+                params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+                time.sleep(max(delay, 0) / 1000)
+
+                route, status, body, headers = self._route(method, path, params)
+                self._reply(status, body, headers)
+                server._count(route, status, time.monotonic() - started)
+
+            def _route(self, method: str, path: str, params: Dict[str, str]):
+                if method == "POST" and path.endswith("/login"):
+                    return "yemeksepeti.login", 200, {"access_token": "fake-yemeksepeti", "expiresIn": 3600}, None
+                if method == "POST" and path.endswith("/connect/token"):
+                    return "dodois.token", 200, {"access_token": "fake-dodois", "refresh_token": "fake-refresh"}, None
+
+                provider, route = self._data_route(path)
+                if route is None:
+                    return "unknown", 404, {"error": f"Unknown path {path}"}, None
+                fault = self._fault(provider)
+                if fault == 429:
+                    return route, 429, {"error": "Too many requests"}, {"Retry-After": "1"}
+                if fault is not None:
+                    return route, fault, None if fault == 204 else {"error": "Unavailable"}, None
+                return route, 200, self._data(route, path, params), None
+
+            @staticmethod
+            def _data_route(path: str) -> Tuple[str, Optional[str]]:
+                if path.endswith("/orders/ids"):
+                    return "yemeksepeti", "yemeksepeti.orders_ids"
+                if re.search(r"/chains/[^/]+/orders/[^/]+$", path):
+                    return "yemeksepeti", "yemeksepeti.order"
+                if path.endswith("/reviews/filter"):
+                    return "trendyol", "trendyol.reviews"
+                if path.endswith("/claims"):
+                    return "trendyol", "trendyol.claims"
+                if path.endswith("/packages"):
+                    return "trendyol", "trendyol.orders"
+                for endpoint in DODOIS_RESPONSES:
+                    if path.endswith(f"/{endpoint}"):
+                        return "dodois", f"dodois.{endpoint}"
+                return "", None
+
+            @staticmethod
+            def _page(items: List[Any], params: Dict[str, str]) -> Dict[str, Any]:
+                size = max(1, min(int(params.get("size", 50)), config.max_page_size))
+                page = int(params.get("page", 0))
+                return {"page": page, "size": size, "totalPages": math.ceil(len(items) / size),
+                        "totalElements": len(items), "content": items[page * size:(page + 1) * size]}
+
+            def _data(self, route: str, path: str, params: Dict[str, str]) -> Any:
+                if route == "yemeksepeti.orders_ids":
+                    day = datetime.now(GMT_TIMEZONE).date().isoformat()
+                    orders = yemeksepeti_order_ids(config, params.get("vendorId", ""), day, params.get("status", ""))
+                    return {"count": len(orders), "orders": orders}
+                if route == "yemeksepeti.order":
+                    return {"order": yemeksepeti_order(path.rsplit("/", 1)[1])}
+                if route == "trendyol.orders":
+                    start_ms = int(params["packageModificationStartDate"]) + FOUR_HOURS_MS
+                    return self._page(trendyol_packages(config, params["storeId"], start_ms), params)
+                if route == "trendyol.claims":
+                    start_ms = int(params["createdStartDate"])
+                    return self._page(trendyol_list(config, "claims", params["storeId"], start_ms), params)
+                if route == "trendyol.reviews":
+                    store_id = path.split("/stores/")[1].split("/")[0]
+                    return self._page(trendyol_list(config, "reviews", store_id, int(params["startDate"])), params)
+                endpoint = route.split(".", 1)[1]
+                date_from = params.get("from") or params.get("fromDate")
+                return {DODOIS_RESPONSES[endpoint]: dodois_statistics(endpoint, params.get("units", ""), date_from)}
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                logging.debug(f"fake-providers: {format % args}")
+
+        return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--rate-204", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--trendyol-orders", type=int, default=60)
+    parser.add_argument("--yemeksepeti-orders", type=int, default=30)
+    parser.add_argument("--max-page-size", type=int, default=200)
+    args = parser.parse_args()
+
+    fake = FakeProviderServer(FakeConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                         rate_204=args.rate_204, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                                         trendyol_orders=args.trendyol_orders,
+                                         yemeksepeti_orders=args.yemeksepeti_orders,
+                                         max_page_size=args.max_page_size),
+                              host=args.host, port=args.port)
+    logging.info(f"Fake providers listening on {fake.url}")
+    fake.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,303 @@
+"""
+Load and soak test of the collector against the local fake providers.
+
+Generates a regions.json of any size, starts loadtest/fake_providers.py in-process, points all
+clients at it and runs the collection:
+  --mode get_data  calls get_updated_data per unit on a thread pool, no Mongo needed;
+  --mode main      runs main.py for today in a subprocess against MONGO_URI and reads Daily_Stats back.
+Every round reports throughput, unit latency percentiles, memory and the units whose aggregates
+differ from what the fake data implies. --rounds > 1 repeats the run to watch memory over time.
+
+    python loadtest/load_test.py --units 600 --workers 16 --rate-429 0.02 --rounds 3 --report data/loadtest.json
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest.fake_providers import (GMT_TIMEZONE, FakeConfig, FakeProviderServer, day_start_ms,  # noqa: E402
+                                     dodois_statistics, expected_trendyol_orders, expected_yemeksepeti_orders)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def generate_regions(units: int, divisions: int) -> Dict[str, Any]:
+    per_division = max(1, -(-units // divisions))
+    config = {"divisions": []}
+    for d in range(divisions):
+        division_units = []
+        for u in range(d * per_division, min(units, (d + 1) * per_division)):
+            division_units.append({
+                "dodois_name": f"Load-{u}",
+                "dodois_unit_id": f"{u:032x}",
+                "yemeksepeti_pos_id": f"ys{u:05d}",
+                "yemeksepeti_platform_id": f"ys{u:05d}",
+                "trendyol_id": str(100000 + u),
+            })
+        config["divisions"].append({"region_name": f"Region{d}", "franchise": f"Franchise{d % 3}",
+                                    "trendyol_supplier_id": str(900000 + d), "units": division_units})
+    return config
+
+
+def provider_env(base_url: str, workdir: str, divisions: int) -> Dict[str, str]:
+    """
+    Environment pointing every client at the fake server; local state goes to workdir.
+    """
+    env_path = os.path.join(workdir, ".env")
+    open(env_path, "a").close()
+    env = {
+        "REGIONS_PATH": os.path.join(workdir, "regions.json"),
+        "REGIONS": ",".join(f"R{d}" for d in range(divisions)),
+        "TRENDYOL_BASE_URL": base_url,
+        "DODOIS_BASE_URL": f"{base_url}/dodopizza/tr/",
+        "DODOIS_TOKEN_URL": f"{base_url}/connect/token",
+        "DODOIS_ENV_PATH": env_path,
+        "CLIENT_ID": "load", "CLIENT_SECRET": "load", "REFRESH_TOKEN": "load",
+        "YEMEKSEPETI_BASE_URL": f"{base_url}/v2",
+        "YEMEKSEPETI_CHAINID": "load", "YEMEKSEPETI_USERNAME": "load", "YEMEKSEPETI_PASSWORD": "load",
+        "YEMEKSEPETI_SERVER_ERROR_WAIT": "1",
+        "ADAPTIVE_TUNING_PATH": os.path.join(workdir, "tuning.json"),
+        "WRITE_SPOOL_PATH": os.path.join(workdir, "spool.sqlite3"),
+        "RUN_STATE_PATH": os.path.join(workdir, "run_state.json"),
+    }
+    for d in range(divisions):
+        env.update({f"TRENDYOL_SUPPLIER_ID_R{d}": str(900000 + d), f"TRENDYOL_API_KEY_R{d}": "load",
+                    f"TRENDYOL_API_SECRET_R{d}": "load", f"TRENDYOL_AGENT_MAIL_R{d}": "load",
+                    f"TRENDYOL_AGENT_NAME_R{d}": "load"})
+    return env
+
+
+def check_unit(config: FakeConfig, unit: Dict[str, Any], document: Optional[Dict[str, Any]], now: datetime,
+               sections: List[str]) -> List[str]:
+    """
+    Differences between a collected document and the aggregates the fake data implies.
+    """
+    if not document:
+        return ["document missing"]
+    problems = []
+    day = now.date().isoformat()
+
+    if "trendyol.orders" in sections:
+        total, price = expected_trendyol_orders(config, unit["trendyol_id"], day_start_ms(now))
+        orders = (document.get("trendyol") or {}).get("orders") or {}
+        if orders.get("total_order", 0) != total or abs(orders.get("total_price", 0) - price) > 0.01:
+            problems.append(f"trendyol.orders {orders.get('total_order')}/{orders.get('total_price')} != {total}/{price:.2f}")
+    for part, expected in (("reviews", config.reviews), ("claims", config.claims)):
+        if f"trendyol.{part}" in sections:
+            found = len((document.get("trendyol") or {}).get(part) or [])
+            if found != expected:
+                problems.append(f"trendyol.{part} {found} != {expected}")
+
+    if "yemeksepeti" in sections:
+        accepted, cancelled, price = expected_yemeksepeti_orders(config, unit["yemeksepeti_pos_id"], day)
+        orders = (document.get("yemeksepeti") or {}).get("orders") or {}
+        found = (len(orders.get("orders_id", [])), len(orders.get("cancelled_orders", [])))
+        if found != (accepted, cancelled) or abs(orders.get("total_price", 0) - price) > 0.01:
+            problems.append(f"yemeksepeti {found}/{orders.get('total_price')} != {(accepted, cancelled)}/{price:.2f}")
+
+    if "dodois" in sections:
+        expected = dodois_statistics("finances/sales/units", unit["dodois_unit_id"], day)
+        if (document.get("dodois") or {}).get("salesStatistics") != expected:
+            problems.append("dodois.salesStatistics differs")
+    return problems
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1], 4)}
+
+
+def peak_rss_mb(who: int) -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def run_get_data_round(units: List[Dict[str, Any]], clients, sections: List[str], workers: int,
+                       config: FakeConfig) -> Dict[str, Any]:
+    from collector import GMT_TIMEZONE as COLLECTOR_TIMEZONE
+    from get_data import get_updated_data
+
+    Yemeksepeti, trendyol_clients, DodoIS = clients
+    now = datetime.now(COLLECTOR_TIMEZONE)
+    latencies: List[float] = []
+    errors: Dict[str, str] = {}
+    mismatches: Dict[str, List[str]] = {}
+
+    def collect(unit: Dict[str, Any]):
+        started = time.monotonic()
+        result = get_updated_data(now, COLLECTOR_TIMEZONE, Yemeksepeti, trendyol_clients, DodoIS,
+                                  units=[unit], sections=sections)
+        return time.monotonic() - started, result[unit["dodois_unit_id"]]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(collect, unit): unit for unit in units}
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                latency, document = future.result()
+            except Exception as exc:
+                errors[unit["dodois_unit_id"]] = repr(exc)
+                continue
+            latencies.append(latency)
+            problems = check_unit(config, unit, document, now, sections)
+            if problems:
+                mismatches[unit["dodois_unit_id"]] = problems
+    return {"latencies": latencies, "errors": errors, "mismatches": mismatches}
+
+
+def run_main_round(units: List[Dict[str, Any]], env: Dict[str, str], sections: List[str],
+                   config: FakeConfig) -> Dict[str, Any]:
+    from db.mongo import MongoAPI
+
+    now = datetime.now(GMT_TIMEZONE)
+    command = [sys.executable, os.path.join(ROOT, "main.py"), "--start", "0", "--end", "1",
+               "--sections", ",".join(sections)]
+    completed = subprocess.run(command, cwd=ROOT, env={**os.environ, **env})
+    errors = {} if completed.returncode == 0 else {"main.py": f"exit code {completed.returncode}"}
+
+    mongo = MongoAPI(collection_name="Daily_Stats")
+    mismatches = {}
+    for unit in units:
+        document = mongo.find_by_date_and_unit(now.date().isoformat(), unit["dodois_unit_id"])
+        problems = check_unit(config, unit, document, now, sections)
+        if problems:
+            mismatches[unit["dodois_unit_id"]] = problems
+    try:
+        with open(env["RUN_STATE_PATH"], encoding="utf-8") as f:
+            run = json.load(f)
+    except (OSError, ValueError):
+        run = {}
+    return {"latencies": [], "errors": errors, "mismatches": mismatches, "run": run.get("metrics")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--units", type=int, default=120, help="Stores in the generated regions.json")
+    parser.add_argument("--divisions", type=int, default=10)
+    parser.add_argument("--mode", choices=("get_data", "main"), default="get_data")
+    parser.add_argument("--workers", type=int, default=8, help="Units collected at once in get_data mode")
+    parser.add_argument("--rounds", type=int, default=1, help="Repeated runs for a soak test")
+    parser.add_argument("--sections", default="dodois,trendyol,yemeksepeti")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--rate-204", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--trendyol-orders", type=int, default=60)
+    parser.add_argument("--yemeksepeti-orders", type=int, default=30)
+    parser.add_argument("--reviews", type=int, default=5)
+    parser.add_argument("--claims", type=int, default=2)
+    parser.add_argument("--max-page-size", type=int, default=200)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace the Python heap peak, slows the run")
+    parser.add_argument("--report", default=None, help="JSON report path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    config = FakeConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_204=args.rate_204,
+                        rate_429=args.rate_429, rate_5xx=args.rate_5xx, trendyol_orders=args.trendyol_orders,
+                        reviews=args.reviews, claims=args.claims, yemeksepeti_orders=args.yemeksepeti_orders,
+                        max_page_size=args.max_page_size)
+    fake = FakeProviderServer(config).start()
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    env = provider_env(fake.url, workdir, args.divisions)
+    with open(env["REGIONS_PATH"], "w", encoding="utf-8") as f:
+        json.dump(generate_regions(args.units, args.divisions), f)
+    # Must be set before the client modules read their configuration
+    os.environ.update(env)
+
+    from get_data import parse_sections
+    from initialization import initialization
+    from unit_registry import UnitRegistry
+
+    sections = list(parse_sections(args.sections))
+    units = UnitRegistry(env["REGIONS_PATH"]).units
+    clients = initialization({section.split(".")[0] for section in sections}) if args.mode == "get_data" else None
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    rounds = []
+    for number in range(args.rounds):
+        requests_before = fake.snapshot()["total"]
+        started = time.monotonic()
+        if args.mode == "get_data":
+            result = run_get_data_round(units, clients, sections, args.workers, config)
+        else:
+            result = run_main_round(units, env, sections, config)
+        elapsed = time.monotonic() - started
+        requests = fake.snapshot()["total"] - requests_before
+
+        round_report = {
+            "round": number + 1,
+            "elapsed": round(elapsed, 3),
+            "units_per_second": round(len(units) / elapsed, 2),
+            "requests_per_second": round(requests / elapsed, 2),
+            "unit_latency": percentiles(result["latencies"]),
+            "errors": len(result["errors"]),
+            "mismatched_units": len(result["mismatches"]),
+            "peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN if args.mode == "main" else resource.RUSAGE_SELF)
+            if resource else None,
+        }
+        if args.tracemalloc:
+            round_report["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.reset_peak()
+        if result.get("run"):
+            round_report["collector_metrics"] = result["run"]
+        round_report["error_samples"] = dict(list(result["errors"].items())[:5])
+        round_report["mismatch_samples"] = dict(list(result["mismatches"].items())[:5])
+        rounds.append(round_report)
+        print(json.dumps({key: value for key, value in round_report.items() if not key.endswith("_samples")}))
+
+    fake.stop()
+    if args.mode == "get_data":
+        from ApiClients.adaptive import get_tuner
+
+        tuner = get_tuner()
+        if tuner:
+            tuner.save()
+    try:
+        with open(env["ADAPTIVE_TUNING_PATH"], encoding="utf-8") as f:
+            tuning = json.load(f)
+    except (OSError, ValueError):
+        tuning = {}
+    report = {
+        "started_at": datetime.now(GMT_TIMEZONE).isoformat(),
+        "mode": args.mode,
+        "units": len(units),
+        "sections": sections,
+        "fake_config": config.as_dict(),
+        "rounds": rounds,
+        "server": {**fake.snapshot(), "latency": percentiles(fake.latencies)},
+        "tuning": tuning,
+        "workdir": workdir,
+    }
+    if args.report:
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    failed = any(round_report["errors"] or round_report["mismatched_units"] for round_report in rounds)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
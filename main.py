@@ -1,54 +1,59 @@
-from pickletools import uint1
-
-from db.mongo import MongoAPI
-from get_data import get_updated_data
-from datetime import datetime,timedelta,timezone
-from initialization import initialization
-import json
-
-with open("data/regions.json") as f:
-    regions_data = json.load(f)
-
-
+import argparse
+import logging
+import os
+
+from collector import run_collection
+from get_data import parse_sections
+from profiling import Profiler
+from sharded_runner import run_sharded
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Collect provider statistics into Daily_Stats")
+    parser.add_argument("--start", type=int, default=0, help="First day offset, 0 - today")
+    parser.add_argument("--end", type=int, default=2, help="Day offset to stop before")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("COLLECTOR_WORKERS", 1)),
+                        help="Worker processes on this box")
+    parser.add_argument("--shard-index", type=int, default=int(os.getenv("SHARD_INDEX", 0)),
+                        help="Index of this box when several boxes share the units")
+    parser.add_argument("--shard-count", type=int, default=int(os.getenv("SHARD_COUNT", 1)),
+                        help="Number of boxes sharing the units")
+    parser.add_argument("--shard-by", choices=("division", "unit"), default=os.getenv("SHARD_BY", "division"),
+                        help="Split whole divisions or hash-shard single units")
+    parser.add_argument("--sections", default=os.getenv("COLLECTOR_SECTIONS"),
+                        help="Comma separated sections to refresh, e.g. 'trendyol.reviews' or 'dodois,trendyol'. "
+                             "All sections by default")
+    parser.add_argument("--archive", action="store_true", default=os.getenv("RAW_ARCHIVE") == "1",
+                        help="Keep raw provider responses for reprocess.py")
+    parser.add_argument("--budget", type=float,
+                        default=float(os.getenv("COLLECTOR_BUDGET")) if os.getenv("COLLECTOR_BUDGET") else None,
+                        help="Seconds after which no new task starts; the rest is deferred to the next run")
+    parser.add_argument("--task-workers", type=int, default=int(os.getenv("COLLECTOR_TASK_WORKERS", 8)),
+                        help="Provider tasks running at once in every worker process")
+    parser.add_argument("--profile", action="store_true", default=os.getenv("COLLECTOR_PROFILE") == "1",
+                        help="Profile memory per stage and CPU per provider function; the report goes to PROFILE_DIR")
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    Yemeksepeti, trendyol_clients, DodoIS  = initialization()
-    mongo = MongoAPI(collection_name="Daily_Stats")
-
-    start_date_range = 0
-    end_date_range = 2
-    if start_date_range > 2:
-        Yemeksepeti = None
-
-    gmt_timezone = timezone(timedelta(hours=3))
-    now = datetime.now(gmt_timezone)
-
-    for i in range(start_date_range,end_date_range):
-
-        now_date = now - timedelta(days=i)
-        file_date = now_date.date().strftime("%Y-%m-%d")
-
-
-        old_data_by_unit = {}
-        for region in regions_data['divisions']:
-            for unit in region['units']:
-                old_data_by_unit[unit['dodois_unit_id']] =  mongo.find_by_date_and_unit(file_date, unit['dodois_unit_id'])
-
-        new_data = get_updated_data(now_date,
-                                    gmt_timezone,
-                                    Yemeksepeti,
-                                    trendyol_clients,
-                                    DodoIS,
-                                    old_data_by_unit)
-
-        for unit in new_data.keys():
-            data = new_data[unit]
-            data.update({
-                "date" : file_date,
-                "update_date" : now.strftime("%Y-%m-%d:%H:%M:%S"),
-                "unit" : unit})
-
-            if not mongo.create_json(data):
-                mongo.update_by_date_and_unit(file_date, unit, data)
-
+    args = parse_args()
+    sections = list(parse_sections(args.sections))
+
+    if args.workers == 1 and args.shard_count == 1:
+        run_collection(args.start, args.end, sections=sections, archive=args.archive,
+                       budget_seconds=args.budget, task_workers=args.task_workers,
+                       profiler=Profiler() if args.profile else None)
+    else:
+        result = run_sharded(args.start, args.end,
+                             workers=args.workers,
+                             shard_index=args.shard_index,
+                             shard_count=args.shard_count,
+                             shard_by=args.shard_by,
+                             sections=sections,
+                             archive=args.archive,
+                             budget_seconds=args.budget,
+                             task_workers=args.task_workers,
+                             profile=args.profile)
+        if result["failed_shards"]:
+            logging.error(f"Shards failed: {result['failed_shards']}")
+            raise SystemExit(1)
@@ -0,0 +1,171 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Provider function behind every section task
+PROVIDER_FUNCTIONS = {
+    "dodois": "get_dodois_data",
+    "trendyol": "get_trendyol_data",
+    "yemeksepeti": "get_yemeksepeti_data",
+}
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _mb(size: int) -> float:
+    return round(size / 2 ** 20, 3)
+
+
+class Profiler:
+    """
+    Profiling mode of a collector run, written as a report directory:
+        <PROFILE_DIR>/<timestamp>-<label>/report.json
+        <PROFILE_DIR>/<timestamp>-<label>/<provider function>.pstats / .txt
+
+    stage() takes a tracemalloc snapshot at the end of every stage with the top allocation
+    sites and their growth since the previous stage. task() wraps a section task with its own
+    cProfile, merged per provider function, and records the peak allocation of the task, so
+    the report has the peak of every unit. Peaks are only attributable while tasks run one
+    at a time, so the collector runs a single task worker in profiling mode.
+
+    cProfile only sees the thread that enabled it, so the clients also run their request
+    fan-out (Yemeksepeti order details, DodoIS pagination) inline in profiling mode;
+    otherwise that work would be missing from the provider functions.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None, label: str = "run", frames: int = 10, top: int = 20):
+        self.path = os.path.join(base_dir or os.getenv("PROFILE_DIR", "data/profiles"),
+                                 f"{datetime.now():%Y%m%d-%H%M%S}-{label}")
+        self.label = label
+        self.top = top
+        self.stages: List[Dict[str, Any]] = []
+        self.units: Dict[str, Dict[str, Any]] = {}
+        self.functions: Dict[str, Dict[str, Any]] = {}
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._lock = threading.Lock()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._stage_peak = 0
+        self._started = time.monotonic()
+        self._started_at = datetime.now().isoformat()
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start(frames)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        tracemalloc.reset_peak()
+        self._stage_peak = 0
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+            if self._previous is None:
+                top = snapshot.statistics("lineno")
+            else:
+                top = snapshot.compare_to(self._previous, "lineno")
+            self._previous = snapshot
+            self.stages.append({
+                "stage": name,
+                "seconds": round(time.monotonic() - started, 3),
+                "current_mb": _mb(current),
+                "peak_mb": _mb(max(peak, self._stage_peak)),
+                "top": [{
+                    "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+                    "count": stat.count,
+                } for stat in top[:self.top]],
+            })
+
+    def task(self, section: str, unit_id: str, run: Callable[[], Any]) -> Callable[[], Any]:
+        function = PROVIDER_FUNCTIONS[section.split(".")[0]]
+
+        def profiled() -> Any:
+            profile = cProfile.Profile()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            started = time.monotonic()
+            profile.enable()
+            try:
+                return run()
+            finally:
+                profile.disable()
+                seconds = time.monotonic() - started
+                current, peak = tracemalloc.get_traced_memory()
+                self._record(function, profile, section, unit_id, seconds, peak - before, current - before)
+                self._stage_peak = max(self._stage_peak, peak)
+
+        return profiled
+
+    def _record(self, function: str, profile: cProfile.Profile, section: str, unit_id: str,
+                seconds: float, peak: int, retained: int) -> None:
+        with self._lock:
+            if function in self._stats:
+                self._stats[function].add(profile)
+            else:
+                self._stats[function] = pstats.Stats(profile)
+            calls = self.functions.setdefault(function, {"calls": 0, "seconds": 0.0})
+            calls["calls"] += 1
+            calls["seconds"] += seconds
+
+            unit = self.units.setdefault(unit_id, {"peak_mb": 0.0, "retained_mb": 0.0, "seconds": 0.0, "sections": {}})
+            unit["peak_mb"] = max(unit["peak_mb"], _mb(peak))
+            unit["retained_mb"] = round(unit["retained_mb"] + _mb(retained), 3)
+            unit["seconds"] = round(unit["seconds"] + seconds, 3)
+            unit["sections"][section] = _mb(peak)
+
+    def _function_report(self, function: str) -> Dict[str, Any]:
+        stats = self._stats[function]
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            "calls": self.functions[function]["calls"],
+            "seconds": round(self.functions[function]["seconds"], 3),
+            "top_cumulative": [{
+                "function": f"{filename}:{lineno}({name})",
+                "calls": calls,
+                "own_seconds": round(own, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            } for (filename, lineno, name), (_, calls, own, cumulative, _) in rows[:self.top]],
+        }
+
+    def write_report(self, metrics: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Writes the report directory and returns its path.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        for function, stats in self._stats.items():
+            stats.dump_stats(os.path.join(self.path, f"{function}.pstats"))
+            text = io.StringIO()
+            stats.stream = text
+            stats.sort_stats("cumulative").print_stats(40)
+            with open(os.path.join(self.path, f"{function}.txt"), "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+
+        report = {
+            "label": self.label,
+            "started_at": self._started_at,
+            "elapsed": round(time.monotonic() - self._started, 3),
+            "metrics": metrics,
+            "stages": self.stages,
+            "functions": {function: self._function_report(function) for function in self._stats},
+            "units": dict(sorted(self.units.items(), key=lambda item: item[1]["peak_mb"], reverse=True)),
+        }
+        with open(os.path.join(self.path, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        if self._owns_tracing:
+            tracemalloc.stop()
+        return self.path
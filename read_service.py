@@ -0,0 +1,293 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_cls
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from urllib.error import URLError
+from urllib.parse import parse_qs, unquote, urlsplit
+from urllib.request import Request, urlopen
+
+from pymongo.errors import PyMongoError
+
+from db.mongo import MongoAPI
+
+FIELD_NAME = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+MAX_RANGE_DAYS = 93
+MAX_FIELDS = 50
+
+
+class ReadServiceError(Exception):
+    """Raised on an invalid read request; status is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+    Every entry remembers the date span it covers, so run events drop only the entries they touch.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[3]
+
+    def set(self, key: Hashable, value: Any, date_from: str, date_to: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, date_from, date_to, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, dates: Optional[Iterable[str]] = None) -> int:
+        """
+        Drops the entries covering any of the dates, or all entries if dates is None.
+        """
+        with self._lock:
+            if dates is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            dates = sorted(set(dates))
+            stale = [key for key, (_, date_from, date_to, _) in self._entries.items()
+                     if any(date_from <= date <= date_to for date in dates)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def parse_date(value: Optional[str], name: str) -> str:
+    try:
+        return date_cls.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ReadServiceError(f"'{name}' must be a date in YYYY-MM-DD format")
+
+
+def projection(fields: Optional[str]) -> Optional[Dict[str, int]]:
+    """
+    Mongo projection of a comma separated field list, e.g. 'dodois.salesStatistics,trendyol'.
+    date and unit are always returned, so the rows stay identifiable.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if len(names) > MAX_FIELDS:
+        raise ReadServiceError(f"At most {MAX_FIELDS} fields can be requested")
+    for name in names:
+        if not FIELD_NAME.match(name):
+            raise ReadServiceError(f"Invalid field name '{name}'")
+    return {"date": 1, "unit": 1, **{name: 1 for name in names}}
+
+
+class DailyStatsReader:
+    """
+    Cached reads of Daily_Stats documents by unit and date, and by region or franchise over a date range.
+    """
+
+    def __init__(self, mongo: Optional[MongoAPI] = None, cache: Optional[TTLCache] = None):
+        self.mongo = mongo or MongoAPI(collection_name="Daily_Stats")
+        self.cache = cache or TTLCache(maxsize=int(os.getenv("READ_CACHE_SIZE", 1024)),
+                                       ttl=float(os.getenv("READ_CACHE_TTL", 300)))
+
+    def ensure_indexes(self) -> None:
+        for key in ("region_name", "franchise"):
+            self.mongo.ensure_index([(key, 1), ("date", 1)])
+
+    def _cached(self, key: Hashable, date_from: str, date_to: str,
+                load: Callable[[], Optional[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        found, value = self.cache.get(key)
+        if found:
+            return value
+        documents = load()
+        if documents is None:
+            # Errors are never cached
+            raise ReadServiceError("Daily_Stats is not available", status=503)
+        self.cache.set(key, documents, date_from, date_to)
+        return documents
+
+    def unit_day(self, unit: str, date: str, fields: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        date = parse_date(date, "date")
+        fields_projection = projection(fields)
+        documents = self._cached(("unit", unit, date, fields), date, date,
+                                 lambda: self.mongo.find_many({"date": date, "unit": unit},
+                                                              {"_id": 0, **(fields_projection or {})}, limit=1))
+        return documents[0] if documents else None
+
+    def group_range(self, key: str, value: str, date_from: str, date_to: str,
+                    fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Documents of all units of a region_name or franchise in [date_from, date_to], by date and unit.
+        """
+        date_from = parse_date(date_from, "from")
+        date_to = parse_date(date_to, "to")
+        if date_to < date_from:
+            raise ReadServiceError("'to' is before 'from'")
+        if (date_cls.fromisoformat(date_to) - date_cls.fromisoformat(date_from)).days >= MAX_RANGE_DAYS:
+            raise ReadServiceError(f"Date ranges are limited to {MAX_RANGE_DAYS} days")
+        fields_projection = projection(fields)
+        query = {key: value, "date": {"$gte": date_from, "$lte": date_to}}
+        return self._cached((key, value, date_from, date_to, fields), date_from, date_to,
+                            lambda: self.mongo.find_many(query, {"_id": 0, **(fields_projection or {})},
+                                                         sort=[("date", 1), ("unit", 1)]))
+
+
+ROUTES = [
+    (re.compile(r"^/units/([^/]+)/days/([^/]+)$"), "unit_day"),
+    (re.compile(r"^/regions/([^/]+)/days$"), "region_name"),
+    (re.compile(r"^/franchises/([^/]+)/days$"), "franchise"),
+]
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_handler(reader: DailyStatsReader, token: Optional[str] = None):
+    """
+    With a token every endpoint but /health requires 'Authorization: Bearer <token>'.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _authorized(self) -> bool:
+            if not token:
+                return True
+            return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+        def _reply(self, status: int, body: Any) -> None:
+            payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if url.path == "/health":
+                    return self._reply(200, {"status": "ok", "cache": reader.cache.stats()})
+                if not self._authorized():
+                    return self._reply(401, {"error": "Invalid token"})
+                for pattern, route in ROUTES:
+                    match = pattern.match(url.path)
+                    if not match:
+                        continue
+                    args = [unquote(group) for group in match.groups()]
+                    if route == "unit_day":
+                        document = reader.unit_day(*args, fields=params.get("fields"))
+                        if document is None:
+                            return self._reply(404, {"error": "Document not found"})
+                        return self._reply(200, document)
+                    return self._reply(200, reader.group_range(route, args[0], params.get("from"), params.get("to"),
+                                                               fields=params.get("fields")))
+                return self._reply(404, {"error": "Unknown endpoint"})
+            except ReadServiceError as exc:
+                return self._reply(exc.status, {"error": str(exc)})
+            except PyMongoError as exc:
+                logging.error(f"Read failed: {exc}")
+                return self._reply(503, {"error": "Daily_Stats is not available"})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/events/run-completed":
+                return self._reply(404, {"error": "Unknown endpoint"})
+            if not self._authorized():
+                return self._reply(401, {"error": "Invalid token"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                event = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": "Event must be a JSON object"})
+            dates = event.get("dates") if isinstance(event, dict) else None
+            dropped = reader.cache.invalidate(dates or None)
+            logging.info(f"Run completed for {dates or 'all dates'}, {dropped} cached reads dropped")
+            return self._reply(200, {"invalidated": dropped})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} {format % args}")
+
+    return Handler
+
+
+def notify_run_completed(dates: List[str], url: Optional[str] = None) -> bool:
+    """
+    Tells the read service (READ_SERVICE_URL) that Daily_Stats changed for the dates.
+    Best effort: the collection never fails because the service is down.
+    """
+    url = url or os.getenv("READ_SERVICE_URL")
+    if not url:
+        return False
+    headers = {"Content-Type": "application/json"}
+    if os.getenv("READ_SERVICE_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.getenv('READ_SERVICE_TOKEN')}"
+    request = Request(f"{url.rstrip('/')}/events/run-completed", method="POST", headers=headers,
+                      data=json.dumps({"dates": dates}).encode("utf-8"))
+    try:
+        with urlopen(request, timeout=5):
+            return True
+    except (URLError, OSError) as exc:
+        logging.warning(f"Read service was not notified: {exc}")
+        return False
+
+
+def serve(host: str, port: int) -> None:
+    """
+    Serves the reads on host:port. Any address but loopback requires READ_SERVICE_TOKEN.
+    """
+    token = os.getenv("READ_SERVICE_TOKEN")
+    if not token and not is_loopback(host):
+        raise EnvironmentError(f"READ_SERVICE_TOKEN is required to listen on {host}")
+    reader = DailyStatsReader()
+    reader.ensure_indexes()
+    server = ThreadingHTTPServer((host, port), make_handler(reader, token))
+    logging.info(f"Read service listening on {host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Cached read API over Daily_Stats")
+    parser.add_argument("--host", default=os.getenv("READ_SERVICE_HOST", "127.0.0.1"),
+                        help="Address to listen on; anything but loopback requires READ_SERVICE_TOKEN")
+    parser.add_argument("--port", type=int, default=int(os.getenv("READ_SERVICE_PORT", 8080)))
+    args = parser.parse_args()
+
+    serve(args.host, args.port)
@@ -0,0 +1,130 @@
+import argparse
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date as date_cls, datetime, time as time_cls
+from typing import Any, Dict, Iterable, List, Optional
+
+from collector import GMT_TIMEZONE, merge_update, section_update
+from db.mongo import MongoAPI
+from db.raw_archive import RawArchive
+from db.rollups import RollupEngine
+from get_data import (aggregate_dodois_data, aggregate_trendyol_part, fold_yemeksepeti_order,
+                      new_yemeksepeti_order_data, parse_sections, yemeksepeti_result)
+from read_service import notify_run_completed
+from unit_registry import get_registry
+
+
+def rebuild_sections(records: Dict[str, List[Dict[str, Any]]],
+                     day: datetime,
+                     sections: Iterable[str],
+                     week_ago_doc: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Rebuilds the document sections from archived raw responses.
+    DodoIS and Trendyol responses cover the whole day, so the latest one wins;
+    Yemeksepeti only returns recent orders, so the order details of all runs are folded together.
+    Sections without archived responses are left out.
+    """
+    result: Dict[str, Any] = {}
+    for section in sections:
+        section_records = records.get(section)
+        if not section_records:
+            continue
+        latest = section_records[-1]["payload"]
+
+        if section == "dodois":
+            result["dodois"] = aggregate_dodois_data(latest, week_ago_doc)
+        elif section.startswith("trendyol."):
+            part = section.split(".")[1]
+            result.setdefault("trendyol", {}).update(aggregate_trendyol_part(part, latest, day, GMT_TIMEZONE))
+        elif section == "yemeksepeti":
+            yemeksepeti_order_data = new_yemeksepeti_order_data()
+            for record in section_records:
+                for order_detail in record["payload"]:
+                    fold_yemeksepeti_order(yemeksepeti_order_data, order_detail, day, GMT_TIMEZONE)
+            result["yemeksepeti"] = yemeksepeti_result(yemeksepeti_order_data)
+    return result
+
+
+def _reprocess_unit(date: str, unit_id: str, sections: List[str]) -> bool:
+    """
+    Worker entry point: rebuilds one Daily_Stats document from the archive, without network calls to providers.
+    """
+    archive = RawArchive()
+    mongo = MongoAPI(collection_name="Daily_Stats")
+    rollups = RollupEngine(MongoAPI(collection_name="Rollup_Stats"))
+
+    records = archive.records(date, unit_id)
+    available = [section for section in sections if records.get(section)]
+    if not available:
+        return False
+
+    day = datetime.combine(date_cls.fromisoformat(date), time_cls(0, 0), tzinfo=GMT_TIMEZONE)
+    week_ago_date = date_cls.fromordinal(day.date().toordinal() - 7).isoformat()
+    week_ago_doc = mongo.find_by_date_and_unit(week_ago_date, unit_id) if "dodois" in available else None
+    old_doc = mongo.find_by_date_and_unit(date, unit_id)
+
+    data = rebuild_sections(records, day, available, week_ago_doc)
+    unit = get_registry().by_unit_id(unit_id) or {}
+    data.update({
+        "name": unit.get('dodois_name', (old_doc or {}).get("name")),
+        "date": date,
+        "unit": unit_id,
+        "region_name": unit.get('region_name', (old_doc or {}).get("region_name")),
+        "franchise": unit.get('franchise', (old_doc or {}).get("franchise")),
+        "trendyol_id": unit.get('trendyol_id', (old_doc or {}).get("trendyol_id")),
+        "yemeksepeti_id": unit.get('yemeksepeti_pos_id', (old_doc or {}).get("yemeksepeti_id")),
+        "update_date": datetime.now(GMT_TIMEZONE).strftime("%Y-%m-%d:%H:%M:%S"),
+    })
+
+    set_fields, unset_fields = section_update(data, available, old_doc)
+    if not mongo.upsert_by_date_and_unit(date, unit_id, set_fields, unset_fields):
+        return False
+    rollups.apply(old_doc, merge_update(old_doc, set_fields, unset_fields))
+    return True
+
+
+def reprocess(from_date: str, to_date: str, workers: int = 1, sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Rebuilds Daily_Stats for archived dates in [from_date, to_date].
+    Dates run in order, so week-ago values are already rebuilt; the units of a date run in parallel.
+    """
+    started = time.monotonic()
+    sections = list(parse_sections(sections))
+    archive = RawArchive()
+    metrics = {"dates": [], "units": 0, "written": 0, "failed": 0}
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for date in archive.dates():
+            if not from_date <= date <= to_date:
+                continue
+            futures = {executor.submit(_reprocess_unit, date, unit_id, sections): unit_id
+                       for unit_id in archive.units(date)}
+            for future in as_completed(futures):
+                metrics["units"] += 1
+                try:
+                    written = future.result()
+                except Exception as exc:
+                    logging.error(f"Reprocessing {date} {futures[future]} failed: {exc}")
+                    written = False
+                metrics["written" if written else "failed"] += 1
+            metrics["dates"].append(date)
+
+    if metrics["written"]:
+        notify_run_completed(metrics["dates"])
+    metrics["elapsed"] = round(time.monotonic() - started, 3)
+    logging.info(f"Reprocessing finished: {metrics}")
+    return metrics
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild Daily_Stats from the raw response archive")
+    parser.add_argument("--from", dest="from_date", required=True, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="to_date", required=True, help="Last date, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sections", default=None, help="Comma separated sections to rebuild, all by default")
+    args = parser.parse_args()
+
+    reprocess(args.from_date, args.to_date, workers=args.workers, sections=args.sections)
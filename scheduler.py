@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+# Today first, then yesterday, older days last
+DAY_WEIGHTS = (1.0, 0.5, 0.25)
+# Revenue and orders before claims and reviews
+SECTION_WEIGHTS = {
+    "dodois": 1.0,
+    "trendyol.orders": 1.0,
+    "yemeksepeti": 1.0,
+    "trendyol.claims": 0.4,
+    "trendyol.reviews": 0.3,
+}
+# Work deferred or failed in the previous run goes before equal work of this one
+DEFERRED_BOOST = 2.0
+
+
+def task_priority(day_offset: int, section: str, unit_weight: float = 1.0, deferred: bool = False) -> float:
+    """
+    Value of refreshing one section of one unit for one day; higher runs first.
+    unit_weight is the optional 'priority_weight' of the unit in regions.json.
+    """
+    day_weight = DAY_WEIGHTS[min(day_offset, len(DAY_WEIGHTS) - 1)]
+    priority = day_weight * SECTION_WEIGHTS.get(section, 0.5) * unit_weight
+    return priority * DEFERRED_BOOST if deferred else priority
+
+
+class Task:
+    def __init__(self, key: Hashable, priority: float, run: Callable[[], Any]):
+        self.key = key
+        self.priority = priority
+        self.run = run
+
+
+class PriorityScheduler:
+    """
+    Runs tasks highest priority first on a thread pool within a global time budget.
+
+    No task is started once the budget is spent; tasks already running are allowed to
+    finish. Whatever was not started is returned as deferred, in priority order.
+    """
+
+    def __init__(self, budget_seconds: Optional[float] = None, workers: int = 8):
+        self.budget_seconds = budget_seconds
+        self.workers = workers
+
+    def run(self,
+            tasks: Iterable[Task],
+            on_done: Optional[Callable[[Task, Any, Optional[BaseException]], None]] = None) -> Dict[str, Any]:
+        """
+        on_done(task, result, error) is called in the calling thread as tasks complete.
+        Returns {"completed": [...keys], "failed": [...keys], "deferred": [...keys], "elapsed": seconds}.
+        """
+        started = time.monotonic()
+        deadline = None if self.budget_seconds is None else started + self.budget_seconds
+        counter = itertools.count()
+        heap = [(-task.priority, next(counter), task) for task in tasks]
+        heapq.heapify(heap)
+
+        completed: List[Hashable] = []
+        failed: List[Hashable] = []
+        deferred: List[Hashable] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running: Dict[Any, Task] = {}
+            while heap or running:
+                # Checked even if every worker is busy: with tasks left after the deadline wait() would not block
+                if heap and deadline is not None and time.monotonic() >= deadline:
+                    deferred.extend(heapq.heappop(heap)[2].key for _ in range(len(heap)))
+                while heap and len(running) < self.workers:
+                    task = heapq.heappop(heap)[2]
+                    running[executor.submit(task.run)] = task
+
+                if not running:
+                    break
+
+                timeout = None if deadline is None or not heap else max(deadline - time.monotonic(), 0)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logging.error(f"Task {task.key} failed: {error}")
+                        failed.append(task.key)
+                    else:
+                        completed.append(task.key)
+                    if on_done:
+                        on_done(task, None if error else future.result(), error)
+
+        elapsed = round(time.monotonic() - started, 3)
+        if deferred:
+            logging.warning(f"Time budget of {self.budget_seconds}s spent, {len(deferred)} tasks deferred")
+        return {"completed": completed, "failed": failed, "deferred": deferred, "elapsed": elapsed}
+
+
+class RunState:
+    """
+    Small JSON file with the last run record, so the next cycle can pick up deferred work.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("RUN_STATE_PATH", "data/run_state.json")
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def deferred_keys(self) -> Set[tuple]:
+        run = self.load()
+        return {tuple(key) for key in run.get("deferred", []) + run.get("failed", [])}
+
+    def save(self, run: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
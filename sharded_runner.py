@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from unit_registry import get_registry
+
+
+def _run_shard(start_date_range: int, end_date_range: int, index: int, count: int, shard_by: str,
+               sections: Optional[List[str]], archive: bool,
+               budget_seconds: Optional[float], task_workers: int, profile: bool) -> Dict[str, Any]:
+    """
+    Worker entry point. Runs in a fresh process, so clients and the Mongo connection are its own.
+    The DodoIS token is shared through the .env file: only the first worker refreshes it (see DodoISAuth).
+    """
+    from collector import run_collection
+    from profiling import Profiler
+
+    units = get_registry().shard(index, count, by=shard_by)
+    if not units:
+        return {"dates": [], "units": 0, "written": 0, "unchanged": 0, "tasks": 0, "failed_tasks": 0,
+                "deferred": 0, "spool_pending": 0, "elapsed": 0}
+    return run_collection(start_date_range, end_date_range, units=units, sections=sections, archive=archive,
+                          budget_seconds=budget_seconds,
+                          task_workers=task_workers,
+                          run_state_path=_shard_path(os.getenv("RUN_STATE_PATH", "data/run_state.json"), index, count),
+                          profiler=Profiler(label=f"shard-{index}-of-{count}") if profile else None)
+
+
+def _shard_path(path: str, index: int, count: int) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index}-of-{count}{ext}"
+
+
+def _drain_spool() -> int:
+    """
+    Flushes the whole spool before the shards start. Shards only flush the updates of their own
+    units, so updates of units that moved off this box or left regions.json are flushed here.
+    """
+    from db.mongo import MongoAPI
+    from db.rollups import RollupEngine
+    from db.spool import WriteSpool
+
+    spool = WriteSpool(MongoAPI(collection_name="Daily_Stats"), RollupEngine(MongoAPI(collection_name="Rollup_Stats")))
+    spool.drain()
+    return spool.close()
+
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counters = ("units", "written", "unchanged", "tasks", "failed_tasks", "deferred", "spool_pending")
+    merged = {"dates": [], **{name: 0 for name in counters}, "max_shard_elapsed": 0}
+    for result in results:
+        for date in result["dates"]:
+            if date not in merged["dates"]:
+                merged["dates"].append(date)
+        for name in counters:
+            merged[name] += result[name]
+        merged["max_shard_elapsed"] = max(merged["max_shard_elapsed"], result["elapsed"])
+    return merged
+
+
+def run_sharded(start_date_range: int,
+                end_date_range: int,
+                workers: int = 1,
+                shard_index: int = 0,
+                shard_count: int = 1,
+                shard_by: str = "division",
+                sections: Optional[List[str]] = None,
+                archive: bool = False,
+                budget_seconds: Optional[float] = None,
+                task_workers: int = 8,
+                profile: bool = False) -> Dict[str, Any]:
+    """
+    Splits this box's shard into `workers` process shards and merges their results.
+
+    Box shard i of n with w workers owns the global shards i*w .. i*w+w-1 out of n*w,
+    so every box must be started with the same worker count.
+    With profile=True every shard writes its own profile report.
+    """
+    started = time.monotonic()
+    _drain_spool()
+    total_shards = shard_count * workers
+    shards = [shard_index * workers + worker for worker in range(workers)]
+
+    results: List[Dict[str, Any]] = []
+    failed: List[int] = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(_run_shard, start_date_range, end_date_range, shard, total_shards, shard_by,
+                            sections, archive, budget_seconds, task_workers, profile): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                logging.error(f"Shard {shard}/{total_shards} failed: {exc}")
+                failed.append(shard)
+                continue
+            logging.info(f"Shard {shard}/{total_shards} finished: {result}")
+            results.append(result)
+
+    merged = merge_results(results)
+    merged["failed_shards"] = sorted(failed)
+    merged["elapsed"] = round(time.monotonic() - started, 3)
+    logging.info(f"Sharded collection finished: {merged}")
+    return merged
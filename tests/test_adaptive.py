@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from ApiClients.adaptive import AdaptiveController, AdaptiveTuner, count_items, endpoint_key
+from ApiClients.trendyol_client import TrendyolClient
+from ApiClients.yemeksepeti_client import POSMiddlewareClient
+
+
+@pytest.mark.parametrize("path, key", [
+    ("/orders/ids", "yemeksepeti:/orders/ids"),
+    ("/orders/123", "yemeksepeti:/orders/{id}"),
+    ("/orders/ABCXYZ", "yemeksepeti:/orders/{id}"),
+    ("/orders/ABC/items", "yemeksepeti:other"),
+    ("/vendors/ABC", "yemeksepeti:other"),
+])
+def test_yemeksepeti_paths_fold_on_routes(path, key):
+    assert endpoint_key("yemeksepeti", path, POSMiddlewareClient.ROUTES) == key
+
+
+def test_trendyol_paths_fold_on_routes_behind_a_base_path():
+    path = "/proxy/integrator/review/meal/suppliers/abc/stores/XYZ/reviews/filter"
+    assert endpoint_key("trendyol", path, TrendyolClient.ROUTES) == \
+        "trendyol:/integrator/review/meal/suppliers/{id}/stores/{id}/reviews/filter"
+    assert endpoint_key("trendyol", "/integrator/order/meal/suppliers/12/packages", TrendyolClient.ROUTES) == \
+        "trendyol:/integrator/order/meal/suppliers/{id}/packages"
+
+
+def test_paths_without_routes_are_their_own_key():
+    assert endpoint_key("dodois", "finances/sales/units") == "dodois:/finances/sales/units"
+
+
+def test_count_items():
+    assert count_items([1, 2]) == 2
+    assert count_items({"page": 0, "content": [1, 2, 3]}) == 3
+    assert count_items({"count": 3}) is None
+    assert count_items("text") is None
+
+
+def controller(**overrides):
+    settings = dict(endpoint="e", page_size=100, concurrency=2, min_page_size=10, max_page_size=400,
+                    max_concurrency=4, target_latency=1.0)
+    settings.update(overrides)
+    return AdaptiveController(**settings)
+
+
+def test_fast_full_pages_grow_concurrency_and_page_size():
+    tuned = controller()
+    for _ in range(2):
+        tuned.observe(0.1, 200, items=100, page_size=100)
+    assert tuned.concurrency == 3
+    assert tuned.page_size == 150
+    for _ in range(10):
+        tuned.observe(0.1, 200, items=100, page_size=100)
+    assert tuned.concurrency == 4
+
+
+def test_throttling_halves_concurrency_and_network_errors_shrink_pages():
+    tuned = controller(concurrency=4)
+    tuned.observe(0.1, 429)
+    assert tuned.concurrency == 2 and tuned.throttled == 1 and tuned.page_size == 100
+    tuned.observe(5.0, None)
+    assert tuned.concurrency == 1 and tuned.page_size == 50
+    tuned.observe(0.1, 503)
+    assert tuned.concurrency == 1
+
+
+def test_slow_responses_shrink_pages_to_the_minimum():
+    tuned = controller(page_size=12)
+    for _ in range(5):
+        tuned.observe(3.0, 200, items=12, page_size=12)
+    assert tuned.page_size == 10
+    assert tuned.concurrency == 2
+
+
+def test_saved_settings_are_clamped_to_the_bounds():
+    tuned = controller(state={"page_size": 5000, "concurrency": 0, "latency": 0.5})
+    assert tuned.page_size == 400 and tuned.concurrency == 1 and tuned.latency == 0.5
+
+
+def test_tuner_merges_its_endpoints_into_the_file(tmp_path):
+    path = tmp_path / "tuning.json"
+    path.write_text(json.dumps({"other:/x": {"page_size": 7}}), encoding="utf-8")
+    tuner = AdaptiveTuner(str(path))
+    tuned = tuner.controller("dodois:/a", page_size=100, concurrency=2)
+    assert tuner.controller("dodois:/a") is tuned
+    tuned.observe(0.1, 429)
+    tuner.save()
+
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["other:/x"] == {"page_size": 7}
+    assert saved["dodois:/a"]["concurrency"] == 1
+    assert AdaptiveTuner(str(path)).controller("dodois:/a", concurrency=2).concurrency == 1
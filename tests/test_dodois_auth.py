@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+from dotenv import dotenv_values
+from requests.exceptions import HTTPError
+
+from DodoIS.DodoISData import APIError, AuthError, DodoISAuth, DodoISClient
+
+
+class FakeTokenServer:
+    """Token endpoint rotating the refresh token: a used refresh token is rejected."""
+
+    def __init__(self, refresh_token):
+        self.valid = refresh_token
+        self.refreshes = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, data, timeout):
+        time.sleep(0.05)
+        with self.lock:
+            if data["refresh_token"] != self.valid:
+                return FakeResponse(400, {})
+            self.refreshes += 1
+            self.valid = f"refresh-{self.refreshes}"
+            return FakeResponse(200, {"access_token": f"access-{self.refreshes}",
+                                      "refresh_token": self.valid, "expires_in": 3600})
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Client Error")
+
+    def json(self):
+        return self.body
+
+
+def make_auth(env_path, server):
+    auth = DodoISAuth(env_path=str(env_path), client_id="id", client_secret="secret", refresh_token="refresh-0")
+    auth.session.post = server.post
+    return auth
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text("REFRESH_TOKEN='refresh-0'\n", encoding="utf-8")
+    return path
+
+
+def test_concurrent_clients_refresh_once(env_path):
+    server = FakeTokenServer("refresh-0")
+    clients = [make_auth(env_path, server) for _ in range(4)]
+    errors = []
+
+    def authenticate(auth):
+        try:
+            auth.get_headers()
+        except AuthError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=authenticate, args=(auth,)) for auth in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert server.refreshes == 1
+    assert {auth.access_token for auth in clients} == {"access-1"}
+    stored = dotenv_values(env_path)
+    assert stored["REFRESH_TOKEN"] == "refresh-1"
+    assert stored["ACCESS_TOKEN"] == "access-1"
+
+
+def test_expiring_stored_token_is_refreshed_with_the_stored_refresh_token(env_path):
+    server = FakeTokenServer("refresh-7")
+    env_path.write_text(f"REFRESH_TOKEN='refresh-7'\nACCESS_TOKEN='old'\n"
+                        f"ACCESS_TOKEN_EXPIRES_AT='{int(time.time()) + 60}'\n", encoding="utf-8")
+    auth = make_auth(env_path, server)
+
+    assert auth.get_headers()["Authorization"] == "Bearer access-1"
+    assert server.refreshes == 1
+    assert dotenv_values(env_path)["REFRESH_TOKEN"] == "refresh-1"
+
+
+def test_rejected_refresh_raises(env_path):
+    server = FakeTokenServer("another")
+    with pytest.raises(AuthError):
+        make_auth(env_path, server).get_headers()
+
+
+def test_stored_token_must_outlive_the_run(env_path):
+    server = FakeTokenServer("refresh-0")
+    env_path.write_text(f"REFRESH_TOKEN='refresh-0'\nACCESS_TOKEN='shared'\n"
+                        f"ACCESS_TOKEN_EXPIRES_AT='{int(time.time()) + 1800}'\n", encoding="utf-8")
+    assert make_auth(env_path, server).get_headers()["Authorization"] == "Bearer shared"
+
+    auth = DodoISAuth(env_path=str(env_path), client_id="id", client_secret="secret", min_token_lifetime=3600)
+    auth.session.post = server.post
+    assert auth.get_headers()["Authorization"] == "Bearer access-1"
+
+
+class FakeApiResponse:
+    def __init__(self, status_code, body=b'{"result": [1]}'):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+
+def test_rejected_token_is_renewed_once_and_the_request_retried(env_path):
+    server = FakeTokenServer("refresh-0")
+    env_path.write_text(f"REFRESH_TOKEN='refresh-0'\nACCESS_TOKEN='revoked'\n"
+                        f"ACCESS_TOKEN_EXPIRES_AT='{int(time.time()) + 3600}'\n", encoding="utf-8")
+    auth = make_auth(env_path, server)
+    client = DodoISClient(auth, base_url="http://dodois/")
+    sent = []
+
+    def get(url, headers, params, timeout):
+        sent.append(headers["Authorization"])
+        return FakeApiResponse(401 if headers["Authorization"] == "Bearer revoked" else 200)
+
+    client.session.get = get
+    assert client._request("finances/sales/units", {}) == {"result": [1]}
+    assert sent == ["Bearer revoked", "Bearer access-1"]
+    assert dotenv_values(env_path)["ACCESS_TOKEN"] == "access-1"
+
+
+def test_token_rejected_after_renewal_fails(env_path):
+    auth = make_auth(env_path, FakeTokenServer("refresh-0"))
+    client = DodoISClient(auth, base_url="http://dodois/")
+    client.session.get = lambda url, headers, params, timeout: FakeApiResponse(401)
+    with pytest.raises(APIError):
+        client._request("finances/sales/units", {})
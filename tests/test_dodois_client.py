@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from DodoIS.DodoISData import DodoISClient
+
+split_date_range = DodoISClient.split_date_range
+
+
+def test_split_date_range_into_equal_parts():
+    assert split_date_range("2025-07-21", "2025-07-22", 4) == [
+        ("2025-07-21T00:00:00", "2025-07-21T06:00:00"),
+        ("2025-07-21T06:00:00", "2025-07-21T12:00:00"),
+        ("2025-07-21T12:00:00", "2025-07-21T18:00:00"),
+        ("2025-07-21T18:00:00", "2025-07-22T00:00:00"),
+    ]
+
+
+@pytest.mark.parametrize("from_date, to_date, parts", [
+    ("2025-07-21", "2025-07-22", 1),
+    ("2025-07-21", "2025-07-22", 0),
+    ("2025-07-22", "2025-07-21", 4),
+    ("2025-07-21", "2025-07-21", 4),
+])
+def test_split_date_range_keeps_single_or_empty_ranges(from_date, to_date, parts):
+    assert split_date_range(from_date, to_date, parts) == [(from_date, to_date)]
+
+
+def test_split_date_range_is_contiguous_and_drops_empty_parts():
+    intervals = split_date_range("2025-07-21T00:00:00", "2025-07-21T00:00:03", 8)
+    assert intervals[0][0] == "2025-07-21T00:00:00"
+    assert intervals[-1][1] == "2025-07-21T00:00:03"
+    for (_, end), (start, _) in zip(intervals, intervals[1:]):
+        assert end == start
+    assert all(start != end for start, end in intervals)
+    assert len(intervals) <= 3
+
+
+class FakeAuth:
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+
+    def get_headers(self):
+        return {}
+
+
+class PagedClient(DodoISClient):
+    """Serves records 0..total-1 spread evenly over 2025-07-21, bounds included on both ends."""
+
+    def __init__(self, total, page_size):
+        super().__init__(FakeAuth(), default_page_size=page_size, max_parallelism=4)
+        self.total = total
+        self.requests = []
+
+    def _request(self, endpoint, params):
+        self.requests.append(params)
+        start = datetime.fromisoformat(params["fromDate"])
+        end = datetime.fromisoformat(params["toDate"])
+        step = timedelta(days=1) / self.total
+        records = [{"id": i} for i in range(self.total) if start <= datetime(2025, 7, 21) + i * step <= end]
+        page = records[params["skip"]:params["skip"] + params["take"]]
+        return {"items": page, "isEndOfListReached": params["skip"] + params["take"] >= len(records)}
+
+
+@pytest.mark.parametrize("parallelism, mode", [(1, "interval"), (4, "interval"), (4, "skip"), (3, "skip")])
+def test_fetch_paginated_returns_every_record_once_in_order(parallelism, mode):
+    client = PagedClient(total=24, page_size=5)
+    records = client.fetch_paginated("staff/shifts", [1], "2025-07-21", "2025-07-22",
+                                     parallelism=parallelism, mode=mode)
+    assert [record["id"] for record in records] == list(range(24))
+
+
+def test_fetch_paginated_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        PagedClient(total=2, page_size=5).fetch_paginated("x", [1], "2025-07-21", "2025-07-22",
+                                                          parallelism=2, mode="cursor")
+
+
+class HtmlResponse:
+    """A 200 response of a proxy error page."""
+    status_code = 200
+    headers = {}
+    content = b"<html>Gateway</html>"
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        import requests
+        raise requests.exceptions.JSONDecodeError("Expecting value", self.content.decode(), 0)
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_non_json_body_raises_api_error(monkeypatch, backend):
+    import json_codec
+    from DodoIS.DodoISData import APIError
+    pytest.importorskip(backend)
+    monkeypatch.setattr(json_codec, "backend", backend)
+    monkeypatch.setattr(json_codec, "loads", json_codec.BACKENDS[backend]())
+    client = DodoISClient(FakeAuth(), base_url="http://dodois/")
+    client.session.get = lambda url, headers, params, timeout: HtmlResponse()
+    with pytest.raises(APIError):
+        client._request("finances/sales/units", {})
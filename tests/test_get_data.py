@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+
+from db.rollups import unit_metrics
+from get_data import (DODOIS_SNAPSHOT_FIELD, DODOIS_WEEK_AGO_KEY, aggregate_dodois_data, dodois_snapshot,
+                      fold_yemeksepeti_order, get_dodois_data, new_yemeksepeti_order_data, parse_sections,
+                      snapshot_slot)
+
+GMT_TIMEZONE = timezone(timedelta(hours=3))
+
+
+class FakeDodoIS:
+    def __init__(self):
+        self.calls = []
+
+    def _request(self, endpoint, params):
+        self.calls.append((endpoint, params))
+        if endpoint == "finances/sales/units":
+            return {"result": [{"sales": 1 if "T" in params["to"] else 2}]}
+        return {}
+
+
+def order_detail(code, status="accepted", created_at="2025-07-21T09:00:00Z", total=10.0):
+    return {"code": code, "status": status, "createdAt": created_at, "price": {"totalNet": total},
+            "delivery": {"address": {"latitude": 41.0, "longitude": 29.0}}}
+
+
+def test_parse_sections():
+    assert parse_sections("trendyol") == ("trendyol.reviews", "trendyol.claims", "trendyol.orders")
+    assert parse_sections(["yemeksepeti", "dodois"]) == ("dodois", "yemeksepeti")
+
+
+def test_folding_orders_does_not_change_the_stored_document():
+    now = datetime(2025, 7, 21, 15, tzinfo=GMT_TIMEZONE)
+    stored = {"orders": {"orders_id": ["a"], "total_price": 10.0, "cancelled_orders": [],
+                         "order_price_coordinate": [[10.0, 41.0, 29.0]]}}
+    old_doc = {"yemeksepeti": stored}
+
+    data = new_yemeksepeti_order_data(stored)
+    fold_yemeksepeti_order(data, order_detail("b", status="cancelled"), now, GMT_TIMEZONE)
+    fold_yemeksepeti_order(data, order_detail("c", total=5.0), now, GMT_TIMEZONE)
+
+    assert stored["orders"] == {"orders_id": ["a"], "total_price": 10.0, "cancelled_orders": [],
+                                "order_price_coordinate": [[10.0, 41.0, 29.0]]}
+    assert data["orders_id"] == ["a", "c"]
+    assert data["cancelled_orders"] == [{"orderId": "b", "price": 10.0}]
+    assert unit_metrics(old_doc) != unit_metrics({"yemeksepeti": {"orders": data}})
+
+
+def test_fold_skips_counted_orders_and_other_days():
+    now = datetime(2025, 7, 21, 15, tzinfo=GMT_TIMEZONE)
+    data = new_yemeksepeti_order_data({"orders": {"orders_id": ["a"], "total_price": 10.0}})
+    fold_yemeksepeti_order(data, order_detail("a"), now, GMT_TIMEZONE)
+    # 22:00 UTC on the 20th is already the 21st in GMT+3, 21:00 UTC on the 21st is the 22nd
+    fold_yemeksepeti_order(data, order_detail("b", created_at="2025-07-20T22:00:00Z"), now, GMT_TIMEZONE)
+    fold_yemeksepeti_order(data, order_detail("c", created_at="2025-07-21T21:00:00Z"), now, GMT_TIMEZONE)
+    assert data["orders_id"] == ["a", "b"]
+    assert data["total_price"] == 20.0
+
+
+def test_week_ago_of_today_is_cut_at_the_same_time_of_day():
+    dodois = FakeDodoIS()
+    now = datetime.now(GMT_TIMEZONE)
+    stored = {"dodois": {"salesStatistics": [{"sales": 3}]}}
+    result = get_dodois_data(dodois, "u1", now, stored)
+
+    endpoint, params = dodois.calls[-1]
+    assert endpoint == "finances/sales/units"
+    assert params["to"] == (now - timedelta(days=7)).strftime("%Y-%m-%dT%H:%M:%S")
+    assert result["salesStatisticsWeekAgo"] == [{"sales": 1}]
+
+
+def test_week_ago_of_completed_day_comes_from_stored_document():
+    dodois = FakeDodoIS()
+    now = datetime.now(GMT_TIMEZONE) - timedelta(days=1)
+    stored = {"dodois": {"salesStatistics": [{"sales": 3}]}}
+    result = get_dodois_data(dodois, "u1", now, stored)
+
+    assert len(dodois.calls) == 4
+    assert result["salesStatisticsWeekAgo"] == [{"sales": 3}]
+
+
+def test_week_ago_of_completed_day_falls_back_to_the_whole_day_from_the_api():
+    now = datetime.now(GMT_TIMEZONE) - timedelta(days=1)
+    week_ago = now - timedelta(days=7)
+    for stored in (None, {"dodois": {}}, {"dodois": None, "trendyol": {}}):
+        dodois = FakeDodoIS()
+        result = get_dodois_data(dodois, "u1", now, stored)
+        assert dodois.calls[-1][1]["from"] == week_ago.strftime("%Y-%m-%d")
+        assert dodois.calls[-1][1]["to"] == (week_ago + timedelta(days=1)).strftime("%Y-%m-%d")
+        assert result["salesStatisticsWeekAgo"] == [{"sales": 2}]
+
+
+def test_requested_week_ago_response_wins_over_stored_document():
+    stored = {"dodois": {"salesStatistics": [{"sales": 3}]}}
+    assert aggregate_dodois_data({DODOIS_WEEK_AGO_KEY: {"result": [{"sales": 1}]}}, stored) == \
+        {"salesStatisticsWeekAgo": [{"sales": 1}]}
+    assert aggregate_dodois_data({DODOIS_WEEK_AGO_KEY: {"result": []}}, stored) == {}
+    assert aggregate_dodois_data({}, stored) == {"salesStatisticsWeekAgo": [{"sales": 3}]}
+
+
+def test_snapshot_slots(monkeypatch):
+    assert snapshot_slot(datetime(2025, 7, 21, 14, 37)) == "1430"
+    assert snapshot_slot(datetime(2025, 7, 21, 0, 5)) == "0000"
+    monkeypatch.setenv("DODOIS_SNAPSHOT_MINUTES", "60")
+    assert snapshot_slot(datetime(2025, 7, 21, 23, 59)) == "2300"
+
+
+def test_dodois_snapshot_path():
+    now = datetime(2025, 7, 21, 14, 37)
+    assert dodois_snapshot({"salesStatistics": [{"sales": 1}]}, now) == \
+        {f"{DODOIS_SNAPSHOT_FIELD}.1430": [{"sales": 1}]}
+    assert dodois_snapshot({}, now) == {}
+    assert dodois_snapshot(None, now) == {}
+
+
+def test_week_ago_of_today_comes_from_the_snapshot_of_the_same_slot():
+    dodois = FakeDodoIS()
+    now = datetime.now(GMT_TIMEZONE)
+    stored = {"dodois": {"salesStatistics": [{"sales": 3}]},
+              DODOIS_SNAPSHOT_FIELD: {snapshot_slot(now): [{"sales": 9}]}}
+    result = get_dodois_data(dodois, "u1", now, stored)
+
+    assert len(dodois.calls) == 4
+    assert result["salesStatisticsWeekAgo"] == [{"sales": 9}]
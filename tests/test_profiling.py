@@ -0,0 +1,52 @@
+import json
+import os
+import threading
+
+from ApiClients.yemeksepeti_client import POSMiddlewareClient
+from profiling import Profiler
+
+
+class FakeOrders(POSMiddlewareClient):
+    def __init__(self, max_workers):
+        super().__init__("http://orders/", "user", "password", max_workers=max_workers)
+        self.threads = set()
+
+    def _ensure_token(self):
+        pass
+
+    def get(self, path, params=None):
+        self.threads.add(threading.get_ident())
+        return {"order": {"code": path.rsplit("/", 1)[1], "payload": [0] * 1000}}
+
+
+def test_single_worker_fetches_order_details_in_the_calling_thread():
+    client = FakeOrders(max_workers=1)
+    details = list(client.get_order_details(["a", "b", "c"]))
+    assert [order_id for order_id, _ in details] == ["a", "b", "c"]
+    assert client.threads == {threading.get_ident()}
+
+    pooled = FakeOrders(max_workers=3)
+    assert sorted(order_id for order_id, _ in pooled.get_order_details(["a", "b", "c"])) == ["a", "b", "c"]
+
+
+def test_report_has_stages_functions_and_units(tmp_path):
+    profiler = Profiler(base_dir=str(tmp_path), label="test")
+    client = FakeOrders(max_workers=1)
+    with profiler.stage("collect"):
+        task = profiler.task("yemeksepeti", "u1", lambda: list(client.get_order_details(["a", "b"])))
+        assert len(task()) == 2
+        profiler.task("trendyol.orders", "u2", lambda: None)()
+    path = profiler.write_report({"units": 2})
+
+    with open(os.path.join(path, "report.json"), encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["metrics"] == {"units": 2}
+    assert [stage["stage"] for stage in report["stages"]] == ["collect"]
+    assert set(report["functions"]) == {"get_yemeksepeti_data", "get_trendyol_data"}
+    assert report["functions"]["get_yemeksepeti_data"]["calls"] == 1
+    profiled = [row["function"] for row in report["functions"]["get_yemeksepeti_data"]["top_cumulative"]]
+    assert any(function.endswith("(get)") for function in profiled)
+    assert set(report["units"]) == {"u1", "u2"}
+    assert set(report["units"]["u1"]["sections"]) == {"yemeksepeti"}
+    assert os.path.exists(os.path.join(path, "get_yemeksepeti_data.pstats"))
+    assert os.path.exists(os.path.join(path, "get_trendyol_data.txt"))
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import read_service
+from read_service import (DailyStatsReader, ReadServiceError, TTLCache, is_loopback, make_handler,
+                          notify_run_completed, projection)
+
+
+class FakeMongo:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find_many(self, query, projection=None, sort=None, limit=0):
+        self.queries.append(query)
+        if self.documents is None:
+            return None
+        return [dict(document) for document in self.documents]
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1, "2025-07-21", "2025-07-21")
+    cache.set("b", 2, "2025-07-21", "2025-07-21")
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3, "2025-07-21", "2025-07-21")
+    assert cache.get("b") == (False, None)
+    time.sleep(0.06)
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_cache_invalidates_entries_covering_the_dates():
+    cache = TTLCache()
+    cache.set("day", 1, "2025-07-21", "2025-07-21")
+    cache.set("range", 2, "2025-07-01", "2025-07-31")
+    cache.set("other", 3, "2025-06-01", "2025-06-30")
+    assert cache.invalidate(["2025-07-21"]) == 2
+    assert cache.get("other") == (True, 3)
+    assert cache.invalidate() == 1
+
+
+def test_projection_validates_field_names():
+    assert projection(None) is None
+    assert projection("dodois.salesStatistics, trendyol") == {"date": 1, "unit": 1, "dodois.salesStatistics": 1,
+                                                              "trendyol": 1}
+    with pytest.raises(ReadServiceError):
+        projection("$where")
+
+
+def test_reader_caches_results_but_not_errors():
+    mongo = FakeMongo([{"date": "2025-07-21", "unit": "u1"}])
+    reader = DailyStatsReader(mongo, TTLCache())
+    assert reader.unit_day("u1", "2025-07-21") == {"date": "2025-07-21", "unit": "u1"}
+    reader.unit_day("u1", "2025-07-21")
+    assert len(mongo.queries) == 1
+
+    mongo.documents = None
+    with pytest.raises(ReadServiceError) as error:
+        reader.group_range("region_name", "Istanbul", "2025-07-01", "2025-07-02")
+    assert error.value.status == 503
+    with pytest.raises(ReadServiceError):
+        reader.group_range("region_name", "Istanbul", "2025-07-02", "2025-07-01")
+    with pytest.raises(ReadServiceError):
+        reader.group_range("region_name", "Istanbul", "2025-01-01", "2025-07-01")
+
+
+def test_is_loopback():
+    assert is_loopback("127.0.0.1") and is_loopback("::1") and is_loopback("localhost")
+    assert not is_loopback("0.0.0.0") and not is_loopback("10.0.0.5") and not is_loopback("example.com")
+
+
+def test_serve_refuses_public_address_without_token(monkeypatch):
+    monkeypatch.delenv("READ_SERVICE_TOKEN", raising=False)
+    with pytest.raises(EnvironmentError):
+        read_service.serve("0.0.0.0", 0)
+
+
+@pytest.fixture
+def service():
+    reader = DailyStatsReader(FakeMongo([{"date": "2025-07-21", "unit": "u1"}]), TTLCache())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(reader, "secret"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", reader
+    server.shutdown()
+    server.server_close()
+
+
+def call(url, token=None, data=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    request = Request(url, data=data, headers=headers, method="POST" if data is not None else "GET")
+    try:
+        with urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_reads_and_events_require_the_token(service):
+    url, reader = service
+    assert call(f"{url}/health")[0] == 200
+    assert call(f"{url}/units/u1/days/2025-07-21")[0] == 401
+    assert call(f"{url}/units/u1/days/2025-07-21", token="wrong")[0] == 401
+    assert call(f"{url}/units/u1/days/2025-07-21", token="secret") == (200, {"date": "2025-07-21", "unit": "u1"})
+    assert call(f"{url}/events/run-completed", data=b"{}")[0] == 401
+    assert reader.cache.stats()["entries"] == 1
+
+
+def test_notify_run_completed_invalidates_the_dates(service, monkeypatch):
+    url, reader = service
+    call(f"{url}/units/u1/days/2025-07-21", token="secret")
+    monkeypatch.setenv("READ_SERVICE_TOKEN", "secret")
+    assert notify_run_completed(["2025-07-21"], url) is True
+    assert reader.cache.stats()["entries"] == 0
+    assert notify_run_completed(["2025-07-21"], "http://127.0.0.1:9") is False
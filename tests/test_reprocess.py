@@ -0,0 +1,113 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from db.raw_archive import RawArchive
+from get_data import DODOIS_WEEK_AGO_KEY
+from reprocess import rebuild_sections
+
+GMT_TIMEZONE = timezone(timedelta(hours=3))
+DAY = datetime(2025, 7, 21, tzinfo=GMT_TIMEZONE)
+
+
+def record(fetched_at, section, payload):
+    return {"fetched_at": fetched_at, "section": section, "payload": payload}
+
+
+def order_detail(code, status="accepted", created_at="2025-07-21T09:00:00Z", total=10.0):
+    return {"code": code, "status": status, "createdAt": created_at, "price": {"totalNet": total},
+            "delivery": {"address": {"latitude": 41.0, "longitude": 29.0}}}
+
+
+def package(order_id, created_at, total):
+    created_ms = int(created_at.timestamp() * 1000)
+    return {"orderId": order_id, "packageCreationDate": created_ms, "packageModificationDate": created_ms,
+            "totalPrice": total, "storePickupSelected": False, "packageStatus": "Delivered", "cancelInfo": None,
+            "address": {"latitude": 41.0, "longitude": 29.0}}
+
+
+def test_archive_appends_are_read_back_as_one_stream(tmp_path):
+    archive = RawArchive(str(tmp_path), "gzip")
+    archive.append("2025-07-21", "unit-1", "trendyol.orders", [{"orderId": 1}])
+    archive.append("2025-07-21", "unit-1", "trendyol.reviews", [])
+    archive.append("2025-07-21", "unit-1", "trendyol.orders", [{"orderId": 1}, {"orderId": 2}])
+    archive.append("2025-07-21", "unit-2", "dodois", {"finances/sales/units": {"result": []}})
+
+    path = tmp_path / "2025-07-21" / "trendyol" / "unit-1.jsonl.gz"
+    assert path.read_bytes().count(b"\x1f\x8b\x08") == 3
+
+    records = list(archive.read("2025-07-21", "trendyol", "unit-1"))
+    assert [r["section"] for r in records] == ["trendyol.orders", "trendyol.reviews", "trendyol.orders"]
+    assert records[2]["payload"] == [{"orderId": 1}, {"orderId": 2}]
+    assert archive.dates() == ["2025-07-21"]
+    assert archive.units("2025-07-21") == ["unit-1", "unit-2"]
+
+
+def test_archive_records_are_ordered_by_fetched_at(tmp_path):
+    archive = RawArchive(str(tmp_path), "gzip")
+    path = tmp_path / "2025-07-21" / "yemeksepeti" / "unit-1.jsonl.gz"
+    path.parent.mkdir(parents=True)
+    # Two processes may append out of order
+    with open(path, "ab") as f:
+        for fetched_at, codes in (("2025-07-21T10:00:00+00:00", ["b"]), ("2025-07-21T09:00:00+00:00", ["a"])):
+            line = json.dumps(record(fetched_at, "yemeksepeti", codes)) + "\n"
+            f.write(gzip.compress(line.encode("utf-8")))
+
+    records = archive.records("2025-07-21", "unit-1")
+    assert list(records) == ["yemeksepeti"]
+    assert [r["payload"] for r in records["yemeksepeti"]] == [["a"], ["b"]]
+    assert archive.records("2025-07-22", "unit-1") == {}
+
+
+def test_rebuild_takes_the_latest_run_for_whole_day_sections_and_folds_yemeksepeti():
+    records = {
+        "dodois": [
+            record("2025-07-21T08:00:00+00:00", "dodois", {
+                "finances/sales/units": {"result": [{"sales": 1}]},
+                DODOIS_WEEK_AGO_KEY: {"result": [{"sales": 5}]},
+            }),
+            record("2025-07-21T12:00:00+00:00", "dodois", {
+                "finances/sales/units": {"result": [{"sales": 3}]},
+                "delivery/statistics": {"unitsStatistics": [{"orders": 2}]},
+                DODOIS_WEEK_AGO_KEY: {"result": [{"sales": 7}]},
+            }),
+        ],
+        "trendyol.orders": [
+            record("2025-07-21T08:00:00+00:00", "trendyol.orders",
+                   [package(1, DAY + timedelta(hours=10), 100)]),
+            record("2025-07-21T12:00:00+00:00", "trendyol.orders",
+                   [package(1, DAY + timedelta(hours=10), 100), package(2, DAY + timedelta(hours=14), 50),
+                    package(3, DAY - timedelta(hours=1), 999)]),
+        ],
+        "yemeksepeti": [
+            # Yemeksepeti only returns recent orders: 'a' is missing from the later run
+            record("2025-07-21T08:00:00+00:00", "yemeksepeti", [order_detail("a", total=10.0)]),
+            record("2025-07-21T12:00:00+00:00", "yemeksepeti",
+                   [order_detail("b", total=5.0), order_detail("c", status="cancelled", total=7.0),
+                    order_detail("d", created_at="2025-07-20T09:00:00Z")]),
+        ],
+    }
+    week_ago_doc = {"dodois": {"salesStatistics": [{"sales": 99}]}}
+
+    result = rebuild_sections(records, DAY, ["dodois", "trendyol.orders", "trendyol.claims", "yemeksepeti"],
+                              week_ago_doc)
+
+    assert result["dodois"] == {"salesStatistics": [{"sales": 3}], "unitsStatistics": [{"orders": 2}],
+                                "salesStatisticsWeekAgo": [{"sales": 7}]}
+    orders = result["trendyol"]["orders"]
+    assert (orders["total_order"], orders["total_price"]) == (2, 150)
+    assert "claims" not in result["trendyol"]
+    yemeksepeti = result["yemeksepeti"]["orders"]
+    assert yemeksepeti["orders_id"] == ["a", "b"]
+    assert yemeksepeti["total_price"] == 15.0
+    assert yemeksepeti["cancelled_orders"] == [{"orderId": "c", "price": 7.0}]
+
+
+def test_rebuild_uses_the_stored_week_ago_without_an_archived_response():
+    records = {"dodois": [record("2025-07-21T12:00:00+00:00", "dodois",
+                                 {"finances/sales/units": {"result": [{"sales": 3}]}})]}
+    week_ago_doc = {"dodois": {"salesStatistics": [{"sales": 99}]}}
+
+    result = rebuild_sections(records, DAY, ["dodois", "yemeksepeti"], week_ago_doc)
+
+    assert result == {"dodois": {"salesStatistics": [{"sales": 3}], "salesStatisticsWeekAgo": [{"sales": 99}]}}
@@ -0,0 +1,97 @@
+from db.rollups import RollupEngine, iso_week, unit_metrics
+
+
+class FakeMongo:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.calls = []
+
+    def upsert_pipeline(self, query, pipeline):
+        self.calls.append((query, pipeline))
+        return self.ok
+
+
+def unit_doc(yemeksepeti_orders=None, sales=None, trendyol_orders=None):
+    doc = {"date": "2025-07-21", "unit": "u1", "region_name": "Istanbul", "franchise": "F1"}
+    if sales is not None:
+        doc["dodois"] = {"salesStatistics": sales}
+    if trendyol_orders is not None:
+        doc["trendyol"] = {"orders": trendyol_orders}
+    if yemeksepeti_orders is not None:
+        doc["yemeksepeti"] = {"orders": yemeksepeti_orders}
+    return doc
+
+
+def test_iso_week():
+    assert iso_week("2025-07-21") == "2025-W30"
+    assert iso_week("2025-01-01") == "2025-W01"
+
+
+def test_unit_metrics_of_empty_document():
+    assert unit_metrics(None) == {}
+    assert unit_metrics({}) == {}
+
+
+def test_unit_metrics_sums_sales_and_counts_orders():
+    doc = unit_doc(
+        sales=[{"sales": 100, "orders": 3, "unitName": "x", "flag": True}, {"sales": 50.5, "orders": 1}],
+        trendyol_orders={"total_order": 2, "total_price": 80, "store_pickup_order": 1,
+                         "late_orders": [{"orderId": 1}], "cancelled_orders": []},
+        yemeksepeti_orders={"orders_id": ["a", "b"], "total_price": 40.0,
+                            "cancelled_orders": [{"orderId": "c", "price": 10}]},
+    )
+    assert unit_metrics(doc) == {
+        "dodois_sales": 150.5,
+        "dodois_orders": 4,
+        "trendyol_total_order": 2,
+        "trendyol_total_price": 80,
+        "trendyol_store_pickup_order": 1,
+        "trendyol_late_orders": 1,
+        "trendyol_cancelled_orders": 0,
+        "yemeksepeti_total_order": 2,
+        "yemeksepeti_total_price": 40.0,
+        "yemeksepeti_cancelled_orders": 1,
+    }
+
+
+def test_apply_skips_unchanged_document():
+    mongo = FakeMongo()
+    doc = unit_doc(yemeksepeti_orders={"orders_id": ["a"], "total_price": 10, "cancelled_orders": []})
+    assert RollupEngine(mongo).apply(doc, dict(doc)) is False
+    assert mongo.calls == []
+
+
+def test_apply_updates_daily_weekly_and_unit_rollups():
+    mongo = FakeMongo()
+    old = unit_doc(yemeksepeti_orders={"orders_id": ["a"], "total_price": 10, "cancelled_orders": []})
+    new = unit_doc(yemeksepeti_orders={"orders_id": ["a"], "total_price": 10,
+                                       "cancelled_orders": [{"orderId": "b", "price": 5}]})
+    assert RollupEngine(mongo).apply(old, new) is True
+
+    queries = [query for query, _ in mongo.calls]
+    assert queries == [
+        {"period": "2025-07-21", "scope": "region_name", "key": "Istanbul"},
+        {"period": "2025-W30", "scope": "region_name", "key": "Istanbul"},
+        {"period": "2025-07-21", "scope": "franchise", "key": "F1"},
+        {"period": "2025-W30", "scope": "franchise", "key": "F1"},
+        {"period": "2025-W30", "scope": "unit", "key": "u1"},
+    ]
+    daily_contribution = mongo.calls[0][1][0]["$set"]
+    assert daily_contribution == {"contributions.u1": {"$literal": unit_metrics(new)}}
+    weekly_contribution = mongo.calls[1][1][0]["$set"]
+    assert list(weekly_contribution) == ["contributions.2025-07-21:u1"]
+
+
+def test_apply_without_old_document_always_writes():
+    mongo = FakeMongo()
+    assert RollupEngine(mongo).apply(None, unit_doc()) is True
+    # A document without a region still updates its franchise and unit rollups
+    mongo = FakeMongo()
+    doc = unit_doc()
+    doc.pop("region_name")
+    RollupEngine(mongo).apply(None, doc)
+    assert [query["scope"] for query, _ in mongo.calls] == ["franchise", "franchise", "unit"]
+
+
+def test_apply_reports_failed_update():
+    assert RollupEngine(FakeMongo(ok=False)).apply(None, unit_doc()) is False
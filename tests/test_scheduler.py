@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import DEFERRED_BOOST, PriorityScheduler, RunState, Task, task_priority
+
+
+def test_task_priority_orders_days_sections_and_units():
+    assert task_priority(0, "dodois") > task_priority(1, "dodois") > task_priority(2, "dodois")
+    assert task_priority(5, "dodois") == task_priority(2, "dodois")
+    assert task_priority(0, "trendyol.orders") > task_priority(0, "trendyol.claims") > task_priority(0, "trendyol.reviews")
+    assert task_priority(0, "dodois", unit_weight=2.0) == 2 * task_priority(0, "dodois")
+    assert task_priority(1, "trendyol.reviews", deferred=True) == DEFERRED_BOOST * task_priority(1, "trendyol.reviews")
+
+
+def test_tasks_run_highest_priority_first():
+    order = []
+    tasks = [Task(key, priority, lambda key=key: order.append(key) or key)
+             for key, priority in [("low", 0.1), ("high", 1.0), ("mid", 0.5)]]
+    results = []
+    result = PriorityScheduler(workers=1).run(tasks, lambda task, value, error: results.append((task.key, value)))
+
+    assert order == ["high", "mid", "low"]
+    assert results == [("high", "high"), ("mid", "mid"), ("low", "low")]
+    assert result["completed"] == ["high", "mid", "low"]
+    assert result["failed"] == [] and result["deferred"] == []
+
+
+def test_failed_tasks_are_reported_to_on_done():
+    def fail():
+        raise RuntimeError("boom")
+
+    errors = []
+    result = PriorityScheduler(workers=2).run([Task("bad", 1, fail), Task("good", 0.5, lambda: 1)],
+                                              lambda task, value, error: errors.append((task.key, value, error)))
+    assert result["failed"] == ["bad"]
+    assert result["completed"] == ["good"]
+    bad = next(item for item in errors if item[0] == "bad")
+    assert bad[1] is None and isinstance(bad[2], RuntimeError)
+
+
+def test_no_task_starts_after_the_budget():
+    tasks = [Task(i, 10 - i, lambda: time.sleep(0.2)) for i in range(6)]
+    result = PriorityScheduler(budget_seconds=0.1, workers=2).run(tasks)
+
+    assert sorted(result["completed"]) == [0, 1]
+    assert result["deferred"] == [2, 3, 4, 5]
+
+
+def test_busy_workers_after_the_deadline_do_not_spin(monkeypatch):
+    calls = []
+    real_wait = scheduler.wait
+
+    def counting_wait(*args, **kwargs):
+        calls.append(kwargs.get("timeout"))
+        return real_wait(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler, "wait", counting_wait)
+    release = threading.Event()
+    tasks = [Task(i, 10 - i, lambda: release.wait(0.5)) for i in range(4)]
+    result = PriorityScheduler(budget_seconds=0.05, workers=2).run(tasks)
+
+    assert result["deferred"] == [2, 3]
+    assert len(calls) <= 4
+    assert calls[-1] is None
+
+
+def test_run_state_round_trip(tmp_path):
+    state = RunState(str(tmp_path / "state" / "run_state.json"))
+    assert state.load() == {} and state.deferred_keys() == set()
+    state.save({"deferred": [["2025-07-21", "u1", "dodois"]], "failed": [["2025-07-21", "u2", "yemeksepeti"]]})
+    assert state.deferred_keys() == {("2025-07-21", "u1", "dodois"), ("2025-07-21", "u2", "yemeksepeti")}
+
+
+def test_broken_run_state_is_ignored(tmp_path):
+    path = tmp_path / "run_state.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert RunState(str(path)).deferred_keys() == set()
@@ -0,0 +1,106 @@
+from collector import content_hash, is_touch_only, merge_update, section_update
+
+
+def new_data(**sections):
+    return {"name": "Unit 1", "date": "2025-07-21", "unit": "u1", "region_name": "Istanbul",
+            "update_date": "2025-07-21:12:00:00", **sections}
+
+
+def stored(**sections):
+    doc = {"_id": "object-id", "name": "Unit 1", "date": "2025-07-21", "unit": "u1", "region_name": "Istanbul",
+           "update_date": "2025-07-21:11:00:00", "content_hash": {}}
+    for section, value in sections.items():
+        doc[section] = value
+        doc["content_hash"][section] = content_hash(value)
+    return doc
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_new_document_gets_all_fields_and_hashes():
+    data = new_data(dodois={"salesStatistics": [1]})
+    set_fields, unset_fields = section_update(data, ["dodois"])
+
+    assert unset_fields == []
+    assert set_fields["dodois"] == {"salesStatistics": [1]}
+    assert set_fields["content_hash.dodois"] == content_hash({"salesStatistics": [1]})
+    assert set_fields["name"] == "Unit 1"
+    assert set_fields["update_date"] == set_fields["last_checked"] == "2025-07-21:12:00:00"
+
+
+def test_unchanged_sections_only_touch_last_checked():
+    old = stored(dodois={"salesStatistics": [1]})
+    set_fields, unset_fields = section_update(new_data(dodois={"salesStatistics": [1]}), ["dodois"], old)
+
+    assert set_fields == {"last_checked": "2025-07-21:12:00:00"}
+    assert is_touch_only(set_fields, unset_fields)
+
+
+def test_only_changed_sections_are_sent():
+    old = stored(dodois={"salesStatistics": [1]}, yemeksepeti={"orders": {"orders_id": ["a"]}})
+    data = new_data(dodois={"salesStatistics": [1]}, yemeksepeti={"orders": {"orders_id": ["a", "b"]}})
+    set_fields, unset_fields = section_update(data, ["dodois", "yemeksepeti"], old)
+
+    assert set(set_fields) == {"yemeksepeti", "content_hash.yemeksepeti", "update_date", "last_checked"}
+    assert unset_fields == []
+    assert not is_touch_only(set_fields, unset_fields)
+
+
+def test_empty_refreshed_section_is_unset_and_others_are_left_alone():
+    old = stored(**{"dodois": {"salesStatistics": [1]}})
+    old["trendyol"] = {"reviews": [1], "orders": {"total_order": 1}}
+    old["content_hash"]["trendyol"] = {"reviews": content_hash([1])}
+    data = new_data(trendyol={})
+    set_fields, unset_fields = section_update(data, ["trendyol.reviews"], old)
+
+    assert unset_fields == ["trendyol.reviews", "content_hash.trendyol.reviews"]
+    assert "dodois" not in set_fields and "trendyol" not in set_fields
+    assert set_fields["update_date"] == "2025-07-21:12:00:00"
+
+    merged = merge_update(old, set_fields, unset_fields)
+    assert merged["trendyol"] == {"orders": {"total_order": 1}}
+    assert merged["dodois"] == {"salesStatistics": [1]}
+    assert merged["content_hash"]["trendyol"] == {}
+
+
+def test_missing_section_without_stored_value_is_not_unset():
+    set_fields, unset_fields = section_update(new_data(), ["yemeksepeti"], stored())
+    assert unset_fields == []
+    assert is_touch_only(set_fields, unset_fields)
+
+
+def test_changed_unit_fields_are_sent():
+    old = stored()
+    data = new_data()
+    data["region_name"] = "Ankara"
+    set_fields, _ = section_update(data, [], old)
+    assert set_fields["region_name"] == "Ankara"
+    assert "name" not in set_fields
+
+
+def test_merge_update_applies_dotted_paths_to_a_copy():
+    old = stored(dodois={"salesStatistics": [1]})
+    set_fields = {"trendyol.orders": {"total_order": 2}, "content_hash.trendyol.orders": "h", "last_checked": "t"}
+    merged = merge_update(old, set_fields, ["dodois", "missing.path"])
+
+    assert merged["trendyol"] == {"orders": {"total_order": 2}}
+    assert merged["content_hash"]["trendyol"] == {"orders": "h"}
+    assert "dodois" not in merged and "_id" not in merged
+    assert old["dodois"] == {"salesStatistics": [1]} and "trendyol" not in old
+    assert merge_update(None, {"a.b": 1}, []) == {"a": {"b": 1}}
+
+
+def test_snapshot_paths_are_compared_with_the_stored_value():
+    old = stored(dodois={"salesStatistics": [1]})
+    old["dodois_snapshots"] = {"1430": [1]}
+    data = new_data(dodois={"salesStatistics": [1]})
+    data["dodois_snapshots.1430"] = [1]
+    assert is_touch_only(*section_update(data, ["dodois"], old))
+
+    data["dodois_snapshots.1445"] = [1]
+    set_fields, _ = section_update(data, ["dodois"], old)
+    assert set(set_fields) == {"dodois_snapshots.1445", "update_date", "last_checked"}
+    assert merge_update(old, set_fields, [])["dodois_snapshots"] == {"1430": [1], "1445": [1]}
@@ -0,0 +1,235 @@
+import threading
+import time
+
+import pytest
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from collector import _preload
+from db.spool import SpoolFlushError, WriteSpool
+
+
+class FakeMongo:
+    def __init__(self, documents=None):
+        self.ok = True
+        self.documents = documents or []
+        self.written = []
+
+    def bulk_upsert_by_date_and_unit(self, operations):
+        if not self.ok:
+            return False
+        self.written.extend(operations)
+        return True
+
+    def find_by_date_and_unit(self, date, unit):
+        if not self.ok:
+            return None
+        document = {"date": date, "unit": unit}
+        for written_date, written_unit, set_fields, _ in self.written:
+            if (written_date, written_unit) == (date, unit):
+                document.update(set_fields)
+        return document
+
+    def find_many(self, query, projection=None, sort=None, limit=0):
+        if self.documents is None:
+            return None
+        if isinstance(self.documents, Exception):
+            raise self.documents
+        return [document for document in self.documents
+                if document["date"] in query["date"]["$in"] and document["unit"] in query["unit"]["$in"]]
+
+
+class FakeRollups:
+    def __init__(self):
+        self.applied = []
+
+    def apply(self, old_doc, new_doc):
+        self.applied.append(new_doc)
+        return True
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / "spool.sqlite3")
+
+
+def test_updates_are_flushed_in_order_with_rollups(spool_path):
+    mongo, rollups = FakeMongo(), FakeRollups()
+    spool = WriteSpool(mongo, rollups, path=spool_path, batch_size=2)
+    spool.append("2025-07-21", "u1", {"a": 1}, [])
+    spool.append("2025-07-21", "u2", {"a": 2}, ["b"], rollup_doc={"unit": "u2"})
+    spool.append("2025-07-21", "u1", {"a": 3}, [])
+
+    assert spool.pending() == 3
+    assert spool.flush() == 3
+    assert mongo.written == [("2025-07-21", "u1", {"a": 1}, []), ("2025-07-21", "u2", {"a": 2}, ["b"]),
+                             ("2025-07-21", "u1", {"a": 3}, [])]
+    assert rollups.applied == [{"unit": "u2"}]
+    assert spool.close() == 0
+
+
+def test_rollups_of_updates_without_the_stored_document_follow_the_written_one(spool_path):
+    mongo, rollups = FakeMongo(), FakeRollups()
+    spool = WriteSpool(mongo, rollups, path=spool_path)
+    spool.append("2025-07-21", "u1", {"trendyol": {"orders": {"total_order": 2}}}, [], rollup_stored=True)
+
+    assert spool.flush() == 1
+    assert rollups.applied == [{"date": "2025-07-21", "unit": "u1", "trendyol": {"orders": {"total_order": 2}}}]
+    spool.close()
+
+
+def bulk_write_error(index, code, errmsg):
+    return BulkWriteError({"writeErrors": [{"index": index, "code": code, "errmsg": errmsg}],
+                           "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0, "nMatched": index,
+                           "nModified": index, "nRemoved": 0, "upserted": []})
+
+
+def test_permanent_write_error_moves_the_row_to_dead_letter(spool_path):
+    mongo, rollups = FakeMongo(), FakeRollups()
+    write = mongo.bulk_upsert_by_date_and_unit
+
+    def write_until_null_trendyol(operations):
+        for index, (_, unit, set_fields, _) in enumerate(operations):
+            if unit == "izmir-8" and "trendyol.orders" in set_fields:
+                write(operations[:index])
+                raise bulk_write_error(index, 28, "Cannot create field 'orders' in element {trendyol: null}")
+        return write(operations)
+
+    mongo.bulk_upsert_by_date_and_unit = write_until_null_trendyol
+    spool = WriteSpool(mongo, rollups, path=spool_path)
+    spool.append("2025-07-21", "u1", {"a": 1}, [], rollup_doc={"unit": "u1"})
+    spool.append("2025-07-21", "izmir-8", {"trendyol.orders": {"total_order": 1}}, [], rollup_doc={"unit": "izmir-8"})
+    spool.append("2025-07-21", "u2", {"a": 2}, [])
+
+    assert spool.flush() == 3
+    assert [unit for _, unit, _, _ in mongo.written] == ["u1", "u2"]
+    assert rollups.applied == [{"unit": "u1"}]
+    assert spool.pending() == 0
+    assert spool.dead_letters() == [{"date": "2025-07-21", "unit": "izmir-8",
+                                     "update": {"set": {"trendyol.orders": {"total_order": 1}}, "unset": []},
+                                     "error": "Cannot create field 'orders' in element {trendyol: null}"}]
+    spool.close()
+
+
+def test_duplicate_key_on_upsert_is_retried(spool_path):
+    mongo = FakeMongo()
+
+    def racing_upsert(operations):
+        raise bulk_write_error(0, 11000, "E11000 duplicate key error")
+
+    mongo.bulk_upsert_by_date_and_unit = racing_upsert
+    spool = WriteSpool(mongo, path=spool_path)
+    spool.append("2025-07-21", "u1", {"a": 1}, [])
+    with pytest.raises(SpoolFlushError):
+        spool.flush_batch()
+    assert spool.pending() == 1 and spool.dead_letters() == []
+    spool.close()
+
+
+def test_rejected_batch_stays_for_the_next_run(spool_path):
+    mongo = FakeMongo()
+    mongo.ok = False
+    spool = WriteSpool(mongo, path=spool_path)
+    spool.append("2025-07-21", "u1", {"a": 1}, [])
+    with pytest.raises(SpoolFlushError):
+        spool.flush()
+    assert spool.drain() == 1
+    assert spool.close() == 1
+
+    mongo.ok = True
+    spool = WriteSpool(mongo, path=spool_path)
+    assert spool.drain() == 0
+    assert mongo.written == [("2025-07-21", "u1", {"a": 1}, [])]
+    spool.close()
+
+
+def test_spools_sharing_a_file_flush_only_their_units(spool_path):
+    writer = WriteSpool(FakeMongo(), path=spool_path)
+    for unit in ("u1", "u2", "u3"):
+        writer.append("2025-07-21", unit, {"unit": unit}, [])
+    writer.close()
+
+    first, second = FakeMongo(), FakeMongo()
+    first_spool = WriteSpool(first, path=spool_path, units=["u1", "u3"])
+    second_spool = WriteSpool(second, path=spool_path, units=["u2"])
+    assert first_spool.pending() == 2 and second_spool.pending() == 1
+    assert first_spool.drain() == 0
+    assert [unit for _, unit, _, _ in first.written] == ["u1", "u3"]
+    assert second_spool.pending() == 1
+    assert second_spool.close() == 1
+    first_spool.close()
+
+    everything = WriteSpool(FakeMongo(), path=spool_path)
+    assert everything.pending() == 1
+    everything.close()
+
+
+def test_pending_updates_of_a_date(spool_path):
+    spool = WriteSpool(FakeMongo(), path=spool_path, units=["u1"])
+    spool.append("2025-07-21", "u1", {"a": 1}, [])
+    spool.append("2025-07-20", "u1", {"a": 2}, [])
+    spool.append("2025-07-21", "u1", {"a": 3}, ["b"])
+    spool.append("2025-07-21", "u2", {"a": 4}, [])
+
+    assert spool.pending_updates("2025-07-21") == {"u1": [({"a": 1}, []), ({"a": 3}, ["b"])]}
+    spool.close()
+
+
+def test_background_flusher_drains_on_close(spool_path):
+    mongo = FakeMongo()
+    spool = WriteSpool(mongo, path=spool_path).start()
+    for i in range(5):
+        spool.append("2025-07-21", f"u{i}", {"a": i}, [])
+    assert spool.close(timeout=10) == 0
+    assert len(mongo.written) == 5
+
+
+def test_preload_applies_spooled_updates_on_top_of_stored_documents(spool_path):
+    units = [{"dodois_unit_id": "u1"}, {"dodois_unit_id": "u2"}]
+    stored = {"date": "2025-07-21", "unit": "u1", "yemeksepeti": {"orders": {"orders_id": ["a"]}}}
+    week_ago = {"date": "2025-07-14", "unit": "u1", "dodois": {}}
+    mongo = FakeMongo([stored, week_ago])
+    spool = WriteSpool(mongo, path=spool_path)
+    spool.append("2025-07-21", "u1", {"yemeksepeti": {"orders": {"orders_id": ["a", "b"]}}}, [])
+    spool.append("2025-07-21", "u2", {"name": "Unit 2"}, [])
+
+    old, week, sections = _preload(mongo, spool, units, "2025-07-21", "2025-07-14", ("dodois", "yemeksepeti"))
+    assert old["u1"]["yemeksepeti"] == {"orders": {"orders_id": ["a", "b"]}}
+    assert old["u2"] == {"name": "Unit 2"}
+    assert week == {"u1": week_ago}
+    assert sections == ("dodois", "yemeksepeti")
+    assert stored["yemeksepeti"] == {"orders": {"orders_id": ["a"]}}
+    spool.close()
+
+
+@pytest.mark.parametrize("documents", [None, ConnectionFailure("down")])
+def test_preload_without_mongo_skips_yemeksepeti(spool_path, documents):
+    spool = WriteSpool(FakeMongo(), path=spool_path)
+    mongo = FakeMongo()
+    mongo.documents = documents
+    old, week, sections = _preload(mongo, spool, [{"dodois_unit_id": "u1"}], "2025-07-21", "2025-07-14",
+                                   ("dodois", "yemeksepeti"))
+    assert (old, week, sections) == (None, {}, ("dodois",))
+    spool.close()
+
+
+def test_close_returns_within_its_timeout_while_a_batch_hangs(spool_path):
+    release = threading.Event()
+    mongo = FakeMongo()
+    write = mongo.bulk_upsert_by_date_and_unit
+
+    def hanging_write(operations):
+        release.wait(10)
+        return write(operations)
+
+    mongo.bulk_upsert_by_date_and_unit = hanging_write
+    spool = WriteSpool(mongo, path=spool_path, batch_size=1).start()
+    for i in range(3):
+        spool.append("2025-07-21", f"u{i}", {"a": i}, [])
+
+    started = time.monotonic()
+    assert spool.close(timeout=0.5) == 3
+    assert time.monotonic() - started < 2
+    release.set()
+    spool._thread.join(5)
+    # The flusher stopped after the batch in flight instead of draining the rest
+    assert len(mongo.written) == 1
@@ -0,0 +1,42 @@
+import pytest
+import requests
+
+import json_codec
+from ApiClients.trendyol_client import TrendyolAPIError, TrendyolClient
+
+
+class HtmlResponse:
+    """A 200 response of a proxy error page."""
+    status_code = 200
+    content = b"<html>Gateway</html>"
+    text = content.decode()
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        raise requests.exceptions.JSONDecodeError("Expecting value", self.text, 0)
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_non_json_body_raises_trendyol_api_error(monkeypatch, backend):
+    pytest.importorskip(backend)
+    monkeypatch.setattr(json_codec, "backend", backend)
+    monkeypatch.setattr(json_codec, "loads", json_codec.BACKENDS[backend]())
+    client = TrendyolClient("key", "secret", "agent", "agent@example.com")
+    client.session.request = lambda **kwargs: HtmlResponse()
+    with pytest.raises(TrendyolAPIError):
+        client.get(f"{client.base_url}/integrator/claim/meal/suppliers/1/claims")
+
+
+def test_decode_response_does_not_read_the_body_for_the_stdlib_backend(monkeypatch):
+    class JsonOnlyResponse:
+        @property
+        def content(self):
+            raise AssertionError("content was read")
+
+        def json(self):
+            return {"ok": True}
+
+    monkeypatch.setattr(json_codec, "backend", "json")
+    assert json_codec.decode_response(JsonOnlyResponse()) == {"ok": True}
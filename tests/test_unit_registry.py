@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+from unit_registry import UnitRegistry, UnitRegistryError
+
+
+def division(name, units, supplier="s1", franchise="F1"):
+    return {"region_name": name, "franchise": franchise, "trendyol_supplier_id": supplier, "units": units}
+
+
+def unit(unit_id, trendyol_id=None, pos_id=None):
+    return {"dodois_name": f"Unit {unit_id}", "dodois_unit_id": unit_id,
+            "trendyol_id": trendyol_id, "yemeksepeti_pos_id": pos_id}
+
+
+def write_regions(tmp_path, divisions):
+    path = tmp_path / "regions.json"
+    path.write_text(json.dumps({"divisions": divisions}), encoding="utf-8")
+    return str(path)
+
+
+def test_units_carry_division_fields_and_are_indexed(tmp_path):
+    registry = UnitRegistry(write_regions(tmp_path, [
+        division("Istanbul", [unit("u1", "t1", "p1"), unit("u2")]),
+        division("Ankara", [unit("u3", "t3")], supplier="s2", franchise="F2"),
+    ]))
+
+    assert [record["dodois_unit_id"] for record in registry.units] == ["u1", "u2", "u3"]
+    record = registry.by_unit_id("u3")
+    assert record["region_name"] == "Ankara"
+    assert record["trendyol_supplier_id"] == "s2"
+    assert record["division_index"] == 1
+    assert registry.by_trendyol_id("t1")["dodois_unit_id"] == "u1"
+    assert registry.by_yemeksepeti_id("p1")["dodois_unit_id"] == "u1"
+    assert registry.by_unit_id("missing") is None
+    assert [record["dodois_unit_id"] for record in registry.by_supplier_id("s1")] == ["u1", "u2"]
+    assert [record["dodois_unit_id"] for record in registry.by_franchise("F2")] == ["u3"]
+    assert set(registry.group_by("region_name")) == {"Istanbul", "Ankara"}
+    with pytest.raises(KeyError):
+        registry.group_by("dodois_name")
+
+
+@pytest.mark.parametrize("divisions, message", [
+    ([division("Istanbul", [unit("u1"), unit("u1")])], "Duplicate dodois_unit_id"),
+    ([division("Istanbul", [unit("u1", "t1"), unit("u2", "t1")])], "Duplicate trendyol_id"),
+    ([division("Istanbul", [{"dodois_unit_id": "u1", "trendyol_id": None, "yemeksepeti_pos_id": None}])],
+     "missing ['dodois_name']"),
+    ([division("Istanbul", [{"dodois_name": "Unit 1", "dodois_unit_id": "u1", "trendyol_id": None}])],
+     "missing ['yemeksepeti_pos_id']"),
+    ([{"region_name": "Istanbul", "units": []}], "missing ['franchise', 'trendyol_supplier_id']"),
+])
+def test_invalid_regions_are_rejected(tmp_path, divisions, message):
+    with pytest.raises(UnitRegistryError) as error:
+        UnitRegistry(write_regions(tmp_path, divisions))
+    assert message in str(error.value)
+
+
+def test_unreadable_regions_are_rejected(tmp_path):
+    with pytest.raises(UnitRegistryError):
+        UnitRegistry(str(tmp_path / "missing.json"))
+    path = tmp_path / "regions.json"
+    path.write_text("{}", encoding="utf-8")
+    with pytest.raises(UnitRegistryError):
+        UnitRegistry(str(path))
+
+
+def test_invalid_reload_keeps_previous_version(tmp_path):
+    path = write_regions(tmp_path, [division("Istanbul", [unit("u1")])])
+    registry = UnitRegistry(path)
+    assert registry.reload_if_changed() is False
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"divisions": [division("Istanbul", [unit("u1"), unit("u1")])]}, f)
+    os.utime(path, (0, 0))
+    assert registry.reload_if_changed() is False
+    assert [record["dodois_unit_id"] for record in registry.units] == ["u1"]
+
+    write_regions(tmp_path, [division("Istanbul", [unit("u1"), unit("u2")])])
+    os.utime(path, (1, 1))
+    assert registry.reload_if_changed() is True
+    assert len(registry.units) == 2
+
+
+def test_unit_shards_cover_all_units_once(tmp_path):
+    registry = UnitRegistry(write_regions(tmp_path, [
+        division("Istanbul", [unit(f"u{i}") for i in range(20)]),
+        division("Ankara", [unit(f"v{i}") for i in range(7)], supplier="s2"),
+    ]))
+    shards = [registry.shard(index, 3, by="unit") for index in range(3)]
+    ids = [record["dodois_unit_id"] for shard in shards for record in shard]
+    assert sorted(ids) == sorted(record["dodois_unit_id"] for record in registry.units)
+    assert shards == [registry.shard(index, 3, by="unit") for index in range(3)]
+
+
+def test_invalid_shard_arguments(tmp_path):
+    registry = UnitRegistry(write_regions(tmp_path, [division("Istanbul", [unit("u1")])]))
+    with pytest.raises(ValueError):
+        registry.shard(3, 3)
+    with pytest.raises(ValueError):
+        registry.shard(0, 2, by="franchise")
+
+
+def test_division_shards_are_balanced_by_unit_count(tmp_path):
+    sizes = [4, 4, 14, 7]
+    registry = UnitRegistry(write_regions(tmp_path, [
+        division(f"Region {i}", [unit(f"d{i}u{j}") for j in range(size)]) for i, size in enumerate(sizes)
+    ]))
+    shards = [registry.shard(index, 3) for index in range(3)]
+
+    assert sorted(len(shard) for shard in shards) == [7, 8, 14]
+    for shard in shards:
+        assert len({record["region_name"] for record in shard}) in (1, 2)
+    ids = [record["dodois_unit_id"] for shard in shards for record in shard]
+    assert sorted(ids) == sorted(record["dodois_unit_id"] for record in registry.units)
+    assert registry.shard(0, 1) == registry.units
+
+
+def test_units_without_a_provider_keep_null_ids(tmp_path):
+    registry = UnitRegistry(write_regions(tmp_path, [division("Izmir", [unit("u1")])]))
+    record = registry.by_unit_id("u1")
+    assert record["trendyol_id"] is None and record["yemeksepeti_pos_id"] is None
+    assert registry.by_trendyol_id(None) is None
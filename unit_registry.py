@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+DEFAULT_REGIONS_PATH = "data/regions.json"
+
+DIVISION_FIELDS = ("region_name", "franchise", "trendyol_supplier_id")
+UNIT_REQUIRED_FIELDS = ("dodois_name", "dodois_unit_id")
+# Provider ids every unit must list; null for a provider the unit is not on
+UNIT_PROVIDER_FIELDS = ("trendyol_id", "yemeksepeti_pos_id")
+UNIQUE_KEYS = ("dodois_unit_id", "trendyol_id", "yemeksepeti_pos_id")
+GROUP_KEYS = ("trendyol_supplier_id", "region_name", "franchise")
+
+
+class UnitRegistryError(Exception):
+    """Raised when regions.json is missing or invalid."""
+    pass
+
+
+class _Snapshot:
+    """
+    Immutable view of one regions.json version with all indexes built.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.divisions: List[Dict[str, Any]] = []
+        self.units: List[Dict[str, Any]] = []
+        self.unique: Dict[str, Dict[str, Dict[str, Any]]] = {key: {} for key in UNIQUE_KEYS}
+        self.groups: Dict[str, Dict[str, List[Dict[str, Any]]]] = {key: {} for key in GROUP_KEYS}
+
+        divisions = config.get("divisions")
+        if not isinstance(divisions, list):
+            raise UnitRegistryError("regions.json must contain a 'divisions' list")
+
+        for division_index, division in enumerate(divisions):
+            missing = [field for field in DIVISION_FIELDS if field not in division]
+            if missing:
+                raise UnitRegistryError(f"Division #{division_index} is missing {missing}")
+
+            division_units = []
+            for unit in division.get("units", []):
+                missing = [field for field in UNIT_REQUIRED_FIELDS if not unit.get(field)] + \
+                          [field for field in UNIT_PROVIDER_FIELDS if field not in unit]
+                if missing:
+                    raise UnitRegistryError(f"Unit in division '{division['region_name']}' is missing {missing}")
+
+                record = {
+                    **unit,
+                    **{field: division[field] for field in DIVISION_FIELDS},
+                    "division_index": division_index,
+                }
+                for key in UNIQUE_KEYS:
+                    value = record.get(key)
+                    if not value:
+                        continue
+                    if value in self.unique[key]:
+                        raise UnitRegistryError(f"Duplicate {key} '{value}' in regions.json")
+                    self.unique[key][value] = record
+                for key in GROUP_KEYS:
+                    self.groups[key].setdefault(record[key], []).append(record)
+
+                division_units.append(record)
+                self.units.append(record)
+
+            self.divisions.append({**{field: division[field] for field in DIVISION_FIELDS},
+                                   "units": division_units})
+
+
+class UnitRegistry:
+    """
+    Loads regions.json once and exposes O(1) lookups of units by provider ids and groups.
+
+    Unit records are the unit entries of regions.json extended with the fields of their
+    division (region_name, franchise, trendyol_supplier_id) and the division index.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("REGIONS_PATH", DEFAULT_REGIONS_PATH)
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._snapshot = self._load()
+
+    def _load(self) -> _Snapshot:
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise UnitRegistryError(f"Cannot read {self.path}: {exc}")
+
+        snapshot = _Snapshot(config)
+        self._mtime = mtime
+        logging.info(f"Unit registry loaded from {self.path}: "
+                     f"{len(snapshot.divisions)} divisions, {len(snapshot.units)} units")
+        return snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads regions.json if it was modified since the last load.
+        An invalid file is logged and the previous version stays active.
+        """
+        with self._lock:
+            try:
+                if os.path.getmtime(self.path) == self._mtime:
+                    return False
+                self._snapshot = self._load()
+                return True
+            except (OSError, UnitRegistryError) as exc:
+                logging.error(f"Unit registry reload failed, keeping previous version: {exc}")
+                return False
+
+    @property
+    def divisions(self) -> List[Dict[str, Any]]:
+        return self._snapshot.divisions
+
+    @property
+    def units(self) -> List[Dict[str, Any]]:
+        return self._snapshot.units
+
+    def by_unit_id(self, unit_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot.unique["dodois_unit_id"].get(unit_id)
+
+    def by_trendyol_id(self, trendyol_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot.unique["trendyol_id"].get(trendyol_id)
+
+    def by_yemeksepeti_id(self, pos_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot.unique["yemeksepeti_pos_id"].get(pos_id)
+
+    def by_supplier_id(self, supplier_id: str) -> List[Dict[str, Any]]:
+        return self._snapshot.groups["trendyol_supplier_id"].get(supplier_id, [])
+
+    def by_region(self, region_name: str) -> List[Dict[str, Any]]:
+        return self._snapshot.groups["region_name"].get(region_name, [])
+
+    def by_franchise(self, franchise: str) -> List[Dict[str, Any]]:
+        return self._snapshot.groups["franchise"].get(franchise, [])
+
+    def group_by(self, key: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Units grouped by one of trendyol_supplier_id, region_name or franchise.
+        """
+        if key not in self._snapshot.groups:
+            raise KeyError(f"Units can only be grouped by {GROUP_KEYS}")
+        return self._snapshot.groups[key]
+
+    def shard(self, index: int, count: int, by: str = "division") -> List[Dict[str, Any]]:
+        """
+        Units of shard `index` out of `count`.
+        by='division' keeps whole divisions together, balanced by unit count;
+        by='unit' hash-shards single units on a stable hash of the DodoIS unit id.
+        """
+        if not 0 <= index < count:
+            raise ValueError(f"Shard index {index} is out of range for {count} shards")
+        if by == "division":
+            shard_by_division = self._division_shards(count)
+            return [unit for unit in self.units if shard_by_division[unit["division_index"]] == index]
+        if by == "unit":
+            return [unit for unit in self.units
+                    if zlib.crc32(unit["dodois_unit_id"].encode()) % count == index]
+        raise ValueError(f"Unknown shard key: {by}")
+
+    def _division_shards(self, count: int) -> List[int]:
+        """
+        Shard of every division: the largest divisions first, each to the shard with the fewest units.
+        Ties go to the lower index, so every box computes the same split from the same regions.json.
+        """
+        sizes = [0] * count
+        shards = [0] * len(self.divisions)
+        order = sorted(range(len(self.divisions)), key=lambda i: (-len(self.divisions[i]["units"]), i))
+        for division_index in order:
+            shard = min(range(count), key=lambda i: (sizes[i], i))
+            shards[division_index] = shard
+            sizes[shard] += len(self.divisions[division_index]["units"])
+        return shards
+
+
+_registry: Optional[UnitRegistry] = None
+
+
+def get_registry() -> UnitRegistry:
+    """
+    Process-wide registry, loaded on first use.
+    """
+    global _registry
+    if _registry is None:
+        _registry = UnitRegistry()
+    return _registry